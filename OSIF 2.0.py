@@ -19,54 +19,29 @@ import tkMessageBox
 
 
 import matplotlib
-import pandas as pd
 from pathlib import Path
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 
 matplotlib.use('TkAgg')
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 # from matplotlib.backends.backend_tkagg import NavigationToolbar2TkAgg
 import numpy as np
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import matplotlib.gridspec as gridspec  # Allows for custom positioning of sub plots in matlibplot.
-import scipy.optimize
+
+# OSIF fitting engine (models, data loading and least squares), importable without Tk.
+import osif
+from osif.spectrum import import_xlsx_file  # noqa: F401  kept for scripts importing it from here
 
 # from default python modules
 import os
+import queue
 import re
+import threading
 import webbrowser
 import sys
 
 
-def import_xlsx_file(path):
-    """Read impedance data from an Excel file.
-
-    Parameters
-    ----------
-    path : str
-        Full path to the Excel file.
-
-    Returns
-    -------
-    tuple of lists
-        frequency, z_prime, z_double_prime, z_mod extracted from the file.
-    """
-    try:
-        df = pd.read_excel(path, engine="openpyxl")
-    except ImportError as exc:
-        raise ImportError(
-            "openpyxl is required to load Excel files. "
-            "Install it with 'pip install openpyxl' and try again."
-        ) from exc
-    if "-Z'' (Ω)" in df.columns:
-        df["Z'' (Ω)"] = -df.pop("-Z'' (Ω)")
-
-    freq = df.iloc[:, 1].tolist()
-    z_prime = df.iloc[:, 2].tolist()
-    z_double = df.iloc[:, 3].tolist()
-    z_mod = df.iloc[:, 4].tolist()
-    return freq, z_prime, z_double, z_mod
-
 # output pretty title, version info and citation prompt.
 print('\n\n\n#########################################################################')
 print('python version: ' + sys.version)
@@ -82,10 +57,18 @@ print(
     'To cite this code specifically, please cite the OSIF github page at: https://github.com/NREL/OSIF\n--------------------------\n\n\n')
 
 
+# Interval [ms] at which the GUI checks the fit worker for progress and finished fits.
+FIT_POLL_MS = 100
+
+# Interval [ms] at which Watch directory lists the data directory.
+WATCH_POLL_MS = int(osif.watch.POLL_INTERVAL * 1000)
+
+
 # Main program class which is called on in line 868-ish to run the program.
 class OSIF:
 
     def __init__(self, master):
+        self.master = master
         master.title("Open Source Impedance Fitter (OSIF) v1.25")
         master.grid()
         buttonFrame = Frame(master, pady=10, )
@@ -119,13 +102,27 @@ class OSIF:
         self.currentDataDir = Param()
         self.currentFileName = Tkinter.StringVar(master)
         self.model_selection = Tkinter.StringVar(master)
+        self.printData = Tkinter.BooleanVar(master, value=False)
+        self.fitProfile = Tkinter.StringVar(master, value='default')
+        self.kkCheck = Tkinter.StringVar(master, value='off')
+        self.timer = osif.telemetry.Timer()
+        # Fits run one after another on a worker thread; the Tk main loop only queues them and shows results.
+        self.fitJobs = queue.Queue()
+        self.fitResults = queue.Queue()
+        self.currentJob = None
+        self.fitStatus = Tkinter.StringVar(master, value='No fit running')
+        # Watch directory: fit every data file the potentiostat writes into the data directory (osif.watch)
+        self.watchDir = Tkinter.BooleanVar(master, value=False)
+        self.directoryPoller = None
         self.currentFile = NONE
         self.avgResPer = Param()
+        self.bootstrapSamples = Param()
         self.activeData = Data()
 
         entryFont = ("Calibri", '12')
         labelFont = ("Calibri", "12")
 
+        ciColumn = 6
         sdPerColumn = 5
         sdColumn = 4
         fitValueColumn = 3
@@ -138,6 +135,7 @@ class OSIF:
         Label(OutputFrame, text="Fit Values", font=labelFont).grid(row=1, column=fitValueColumn, sticky=W)
         Label(OutputFrame, text="Estimated SE", font=labelFont).grid(row=1, column=sdColumn, sticky=W)
         Label(OutputFrame, text="SE % of fit value", font=labelFont).grid(row=1, column=sdPerColumn, sticky=W)
+        Label(OutputFrame, text="Bootstrap 95% CI", font=labelFont).grid(row=1, column=ciColumn, sticky=W)
 
         ################################################
         ############ INPUT INITIAL VALUES ##############
@@ -203,6 +201,12 @@ class OSIF:
         self.frequencyRange.OE.grid(row=11, column=initValueColumn)
         self.frequencyRange.OE.insert(0, "1")
 
+        Label(InputFrame, text="Bootstrap samples:", font=labelFont).grid(row=12, column=varNameColumn, sticky=E)
+        Label(InputFrame, text="[0 = off]", font=labelFont).grid(row=12, column=nonFitUnitColumn, sticky=W)
+        self.bootstrapSamples.IE = Entry(InputFrame, width=10, font=entryFont)
+        self.bootstrapSamples.IE.grid(row=12, column=initValueColumn)
+        self.bootstrapSamples.IE.insert(0, "0")
+
         ################################################
         ########### OUTPUT VALUES FROM FIT #############
         ################################################
@@ -305,6 +309,17 @@ class OSIF:
         self.Theta.OESDP.insert(0, "---")
         self.Theta.OESDP.config(state='readonly')
 
+        ################################################
+        ######### OUTPUT BOOTSTRAP INTERVALS ###########
+        ################################################
+
+        for param, row in ((self.Rmem, 2), (self.Rcl, 3), (self.Qdl, 4), (self.Phi, 5), (self.Lwire, 6),
+                           (self.Theta, 7)):
+            param.OECI = Entry(OutputFrame, width=2 * ioBoxWidth + 4, font=entryFont)
+            param.OECI.grid(row=row, column=ciColumn, sticky=W)
+            param.OECI.insert(0, "---")
+            param.OECI.config(state='readonly')
+
         ################################################
         ########## OUTPUT AVG RES |Z| VALUE ############
         ################################################
@@ -337,6 +352,12 @@ class OSIF:
         self.simB = Button(buttonFrame, text="Simulate", command=self.PerformSim)
         self.simB.grid(row=0, column=4, sticky=W)
 
+        self.cancelB = Button(buttonFrame, text="Cancel Fit", command=self.CancelFit)
+        self.cancelB.grid(row=0, column=5, sticky=W)
+
+        self.simB = Button(buttonFrame, text="Load Fit", command=self.LoadFit)
+        self.simB.grid(row=0, column=6, sticky=W)
+
         self.simB = Button(OutputFrame, text="Save Model Data", command=self.SaveData)
         self.simB.grid(row=9, column=sdPerColumn - 2, columnspan=3, sticky=N)
 
@@ -353,28 +374,41 @@ class OSIF:
         self.fileSelectComboBox.config(font=entryFont)
 
         Label(buttonFrame, text="Select Circuit Model:", font=labelFont).grid(row=3, column=0, sticky=E)
-        self.eis_model = ["Transmission Line", "1-D Linear Diffusion", "1-D Spherical Diffusion"]
+        # the entry fields are those of the built-in parameter set; registered models that share it are listed too
+        self.eis_model = [name for name, model in osif.MODELS.items() if model.param_names == osif.PARAM_NAMES]
         self.model_selection.set(self.eis_model[0])
         self.fileSelectModelBox = OptionMenu(buttonFrame, self.model_selection, *self.eis_model)
         self.fileSelectModelBox.grid(row=3, column=1, sticky=EW, columnspan=2)
         self.fileSelectModelBox.config(font=entryFont)
         # self.fileSelectModelBox.pack()
 
-    def openModelInfo(self):
-        if self.model_selection.get() == self.eis_model[0]:
-            print(
-                "--------------------------\nThe model being used in this program is Eq. 2 from the opened Fuller paper.\nThe derivation can be found in their suplimentary information. If you would\nlike to use a different model, contact Jason Pfeilsticker.\n\n")
-            webbrowser.open("https://iopscience.iop.org/article/10.1149/2.0361506jes")
-        elif self.model_selection.get() == self.eis_model[1]:
-            print("1-D linear diffusion model selected.")
-            webbrowser.open("https://www.researchgate.net/publication/342833389_Handbook_of_Electrochemical_Impedance_Spectroscopy_DIFFUSION_IMPEDANCES")
-        elif self.model_selection.get() == self.eis_model[2]:
-            print("1-D spherical diffusion model selected.")
-            webbrowser.open("https://www.researchgate.net/publication/342833389_Handbook_of_Electrochemical_Impedance_Spectroscopy_DIFFUSION_IMPEDANCES")
+        Label(buttonFrame, text="Fit Profile:", font=labelFont).grid(row=2, column=3, sticky=E)
+        self.fitProfileBox = OptionMenu(buttonFrame, self.fitProfile, *osif.FIT_PROFILES)
+        self.fitProfileBox.grid(row=2, column=4, sticky=EW)
+        self.fitProfileBox.config(font=entryFont)
 
+        # Kramers-Kronig test of the chopped data before each fit (osif.kramers_kronig)
+        Label(buttonFrame, text="KK Check:", font=labelFont).grid(row=2, column=5, sticky=E)
+        self.kkCheckBox = OptionMenu(buttonFrame, self.kkCheck, 'off', *osif.KK_MODES)
+        self.kkCheckBox.grid(row=2, column=6, sticky=EW)
+        self.kkCheckBox.config(font=entryFont)
 
+        Checkbutton(buttonFrame, text="Print loaded data", variable=self.printData,
+                    font=labelFont).grid(row=3, column=3, columnspan=2, sticky=W)
 
+        Checkbutton(buttonFrame, text="Watch directory", variable=self.watchDir, command=self.ToggleWatch,
+                    font=labelFont).grid(row=3, column=5, columnspan=2, sticky=W)
 
+        Label(buttonFrame, textvariable=self.fitStatus, font=labelFont).grid(row=4, column=0, columnspan=6, sticky=W)
+
+        threading.Thread(target=self.RunFitJobs, daemon=True).start()
+        master.after(FIT_POLL_MS, self.PollFit)
+
+    def openModelInfo(self):
+        model = osif.resolve_model(self.model_selection.get())
+        print(model.info or model.name + " model selected.")
+        if model.reference:
+            webbrowser.open(model.reference)
 
     def openCitationInfo(self):
         print(
@@ -391,9 +425,13 @@ class OSIF:
         self.currentDataDir.IE.insert(0, newDir)
         self.currentDataDir.IE.config(state='readonly')
 
-        dirList = os.listdir(newDir)
-        dirList = [dataFile for dataFile in dirList if
-                   ('.txt' in dataFile) | ('.xls' in dataFile) | ('.xlsx' in dataFile)]
+        self.RefreshFileList()
+        print('Selected Data Directory: ' + self.currentDataDir.IE.get())
+        if self.watchDir.get():
+            self.ToggleWatch()
+
+    def RefreshFileList(self):
+        dirList = osif.list_data_files(self.currentDataDir.IE.get())
         self.fileSelectComboBox.configure(state='normal')  # Enable drop down
         menu = self.fileSelectComboBox.children['menu']
 
@@ -402,7 +440,39 @@ class OSIF:
         for file in dirList:
             # Add menu items.
             menu.add_command(label=file, command=lambda v=self.currentFileName, l=file: v.set(l))
-        print('Selected Data Directory: ' + self.currentDataDir.IE.get())
+
+    def ToggleWatch(self):
+        """Start or stop watching the data directory; new and changed files are queued like Fit does."""
+        self.directoryPoller = None
+        if not self.watchDir.get():
+            print('stopped watching the data directory')
+            return
+        if not os.path.isdir(self.currentDataDir.IE.get()):
+            tkMessageBox.showinfo("Error!", "Select a data directory to watch first")
+            self.watchDir.set(False)
+            return
+        self.directoryPoller = osif.DirectoryPoller(self.currentDataDir.IE.get())
+        print('watching ' + self.currentDataDir.IE.get() + ' for new data files')
+        self.master.after(WATCH_POLL_MS, self.PollDirectory, self.directoryPoller)
+
+    def PollDirectory(self, poller):
+        """Queue a fit of every file that is completely written; reschedules itself while watching."""
+        if poller is not self.directoryPoller:
+            return
+        try:
+            ready = poller.poll()
+        except OSError as e:
+            print('stopped watching the data directory: %s' % e)
+            self.watchDir.set(False)
+            self.directoryPoller = None
+            return
+        if ready:
+            self.RefreshFileList()
+            setup = self.ReadFitSettings()
+            if setup is not None:
+                for path in ready:
+                    self.QueueFit(os.path.basename(path), *setup)
+        self.master.after(WATCH_POLL_MS, self.PollDirectory, poller)
 
     def load_selected_file(self):
         if not self.currentFileName.get() or self.currentFileName.get() == '---':
@@ -418,67 +488,36 @@ class OSIF:
         self.activeData.rawZExperimentalComplex = []
         self.activeData.rawmodZExperimentalComplex = []
 
-        self.activeData.dataName = self.currentFileName.get()
-        self.activeData.dataNameNoExt = Path(self.activeData.dataName).stem
-
         file_path = os.path.join(self.currentDataDir.IE.get(), self.currentFileName.get())
 
         try:
-            if file_path.endswith('.txt'):
-                df = pd.read_csv(file_path, sep='\t', comment='#')
-                if "-Z'' (Ω)" in df.columns:
-                    df["Z'' (Ω)"] = -df.pop("-Z'' (Ω)")
-
-                self.activeData.rawFrequency = df.iloc[:, 1].to_numpy()
-                self.activeData.rawzPrime = df.iloc[:, 2].to_numpy()
-                self.activeData.rawZdoublePrime = df.iloc[:, 3].to_numpy()
-                self.activeData.rawzMod = df.iloc[:, 4].to_numpy()
-            else:
-                (self.activeData.rawFrequency,
-                 self.activeData.rawzPrime,
-                 self.activeData.rawZdoublePrime,
-                 self.activeData.rawzMod) = (
-                    np.array(v) for v in import_xlsx_file(file_path))
+            with self.timer.phase('load'):
+                spectrum = osif.load_spectrum(file_path)
         except Exception as e:
             tkMessageBox.showinfo('Error!', f'Failed to read data file: {e}')
             return
 
-        self.activeData.rawZExperimentalComplex = (
-            self.activeData.rawzPrime + 1j * self.activeData.rawZdoublePrime)
-        self.activeData.rawmodZExperimentalComplex = np.abs(self.activeData.rawZExperimentalComplex)
+        self.activeData.load(spectrum)
+        self.PrintLoadedData()
 
-        print('\n\tFrequency,\t\tRe(Z),\t\t\tIm(Z),\t\t\t\t|Z|')
-        for f, r, i, m in zip(self.activeData.rawFrequency, self.activeData.rawzPrime,
-                              self.activeData.rawZdoublePrime, self.activeData.rawzMod):
-            print(f, r, i, m)
-
-        self.activeData.rawFrequency = np.array(self.activeData.rawFrequency)
-        self.activeData.rawPhase = (180 / np.pi) * np.arctan(
-            self.activeData.rawZdoublePrime / self.activeData.rawzPrime)
+    def PrintLoadedData(self):
+        # printing every row is slow for long spectra, so it is off unless "Print loaded data" is ticked
+        if self.printData.get():
+            print('\n\tFrequency,\t\tRe(Z),\t\t\tIm(Z),\t\t\t\t|Z|')
+            for f, r, i, m in zip(self.activeData.rawFrequency, self.activeData.rawzPrime,
+                                  self.activeData.rawZdoublePrime, self.activeData.rawzMod):
+                print(f, r, i, m)
 
         print(len(self.activeData.rawPhase), len(self.activeData.rawzMod))
         print("===============================\ndone loading file\n==========================")
 
     def ChopFreq(self):
-        tempFreq = []
-        self.activeData.frequency = np.array([])
-        for freq in self.activeData.rawFrequency:
-            if (freq > float(self.frequencyRange.OE.get())) & (freq < float(self.frequencyRange.IE.get())):
-                tempFreq.append(freq)
-
         # chop the data to the frequency range specified in set up
-        self.activeData.frequency = np.array(tempFreq)
-        minIndex = self.activeData.rawFrequency.tolist().index(self.activeData.frequency[0])
-        maxIndex = self.activeData.rawFrequency.tolist().index(
-            self.activeData.frequency[self.activeData.frequency.shape[0] - 1])
-
-        self.activeData.zPrime = self.activeData.rawzPrime[minIndex:maxIndex + 1]
-        self.activeData.ZdoublePrime = self.activeData.rawZdoublePrime[minIndex:maxIndex + 1]
-        self.activeData.zMod = self.activeData.rawzMod[minIndex:maxIndex + 1]
-        self.activeData.modZExperimentalComplex = self.activeData.rawmodZExperimentalComplex[minIndex:maxIndex + 1]
-        self.activeData.phase = self.activeData.rawPhase[minIndex:maxIndex + 1]
+        with self.timer.phase('chop'):
+            self.activeData.chop(float(self.frequencyRange.OE.get()), float(self.frequencyRange.IE.get()))
 
     def PerformSim(self):
+        self.timer = osif.telemetry.Timer()
         self.load_selected_file()
         if len(self.activeData.rawzPrime) == 0:
             tkMessageBox.showinfo("Error!", "No data file loaded\nor data is in incorrect format")
@@ -506,215 +545,299 @@ class OSIF:
             self.avgResPer.AVGRESPER.config(state='readonly')
 
     def PerformFit(self):
-        self.load_selected_file()
-        print('\n\n\n\n' + 'Sample: ' + self.currentFileName.get() + '\n')
-        if len(self.activeData.rawzPrime) == 0:
+        """Queue a fit of the selected file with the current settings; see RunFitJobs."""
+        if not self.currentFileName.get() or self.currentFileName.get() in ('---', self.choices[0]):
             tkMessageBox.showinfo("Error!", "No data file loaded\nor data is in incorrect format")
             return
+        setup = self.ReadFitSettings()
+        if setup is not None:
+            self.QueueFit(self.currentFileName.get(), *setup)
 
+    def ReadFitSettings(self):
+        """The fit settings and catalyst loading from the entry fields, or None after reporting a bad entry."""
+        try:
+            settings = osif.FitSettings(model=self.model_selection.get(),
+                                        area=float(self.area.IE.get()),
+                                        lower=float(self.frequencyRange.OE.get()),
+                                        upper=float(self.frequencyRange.IE.get()),
+                                        init=dict(Lwire=float(self.Lwire.IE.get()),
+                                                  Rmem=float(self.Rmem.IE.get()),
+                                                  Rcl=float(self.Rcl.IE.get()),
+                                                  Qdl=float(self.Qdl.IE.get()),
+                                                  phi=float(self.Phi.IE.get()),
+                                                  theta=float(self.Theta.IE.get())),
+                                        profile=self.fitProfile.get(),
+                                        bootstrap=int(self.bootstrapSamples.IE.get()),
+                                        kk=None if self.kkCheck.get() == 'off' else self.kkCheck.get())
+            loading = float(self.loading.IE.get())
+        except ValueError as e:
+            tkMessageBox.showinfo("Error!", f"Invalid fit setting: {e}")
+            return None
+        return settings, loading
+
+    def QueueFit(self, fileName, settings, loading):
+        job = FitJob(fileName=fileName,
+                     path=os.path.join(self.currentDataDir.IE.get(), fileName),
+                     settings=settings, loading=loading)
+        self.fitJobs.put(job)
+        print('queued fit of ' + job.fileName)
+
+    def RunFitJobs(self):
+        """Worker thread: fit the queued jobs in order and hand the outcomes to PollFit.
+
+        Runs the same engine path as batch mode (load, chop, Rmem estimate, fit)
+        and never touches Tk widgets.
+        """
+        while True:
+            job = self.fitJobs.get()
+            self.currentJob = job
+            timer = osif.telemetry.Timer()
+            try:
+                with timer.phase('load'):
+                    spectrum = osif.load_spectrum(job.path)
+                # one Kramers-Kronig solve, for the screen and the printout
+                if job.settings.kk:
+                    with timer.phase('kk'):
+                        job.kk = job.settings.kk_test(spectrum)
+                with timer.phase('chop'):
+                    job.fitted = job.settings.window(spectrum, kk=job.kk)
+                outcome = osif.batch.fit_window(job.fitted, job.settings, timer, monitor=job.monitor)
+                if job.settings.bootstrap and not job.monitor.cancelled:
+                    # refits of resampled spectra, warm-started from the fit; in this process, because spawned
+                    # workers would import this script again and re-run its start-up (Tk, banner)
+                    job.stage = 'bootstrap'
+                    with timer.phase('bootstrap'):
+                        job.bootstrapResult = osif.bootstrap_fit(job.fitted, outcome,
+                                                                 job.settings.bootstrap,
+                                                                 method=job.settings.bootstrap_method, workers=1)
+            except Exception as e:  # reported on the main thread, including osif.FitCancelled
+                spectrum, outcome = None, e
+            self.currentJob = None
+            self.fitResults.put((job, spectrum, outcome, timer))
+
+    def PollFit(self):
+        """Show finished fits and the progress of the running one; reschedules itself."""
+        while True:
+            try:
+                job, spectrum, outcome, timer = self.fitResults.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(outcome, osif.FitCancelled):
+                print('fit of %s cancelled' % job.fileName)
+            elif isinstance(outcome, Exception):
+                tkMessageBox.showinfo('Error!', f'Fit of {job.fileName} failed: {outcome}')
+            else:
+                self.ShowFit(job, spectrum, outcome, timer)
+
+        job, queued = self.currentJob, self.fitJobs.qsize()
+        if job is not None and job.stage == 'bootstrap':
+            status = 'Bootstrapping %s: %d refits of resampled spectra' % (job.fileName, job.settings.bootstrap)
+        elif job is not None:
+            monitor = job.monitor
+            status = 'Fitting %s: iteration %d, %d evaluations, cost %.6e' % (job.fileName, monitor.iteration,
+                                                                                monitor.nfev, monitor.cost)
         else:
-            ### /float(self.area.IE.get())   Rmem
-            self.ChopFreq()
+            status = 'No fit running'
+        if queued:
+            status += ' (%d queued)' % queued
+        self.fitStatus.set(status)
+        self.master.after(FIT_POLL_MS, self.PollFit)
+
+    def CancelFit(self):
+        """Drop the queued fits and stop the running one at its next evaluation."""
+        dropped = 0
+        while True:
+            try:
+                self.fitJobs.get_nowait()
+            except queue.Empty:
+                break
+            dropped += 1
+        job = self.currentJob
+        if job is not None:
+            job.monitor.cancel()
+        print('cancelled %d queued fit(s)%s' % (dropped, ' and the running fit' if job is not None else ''))
+
+    def ShowFit(self, job, spectrum, fitResult, timer):
+        """Fill the output widgets and plots with a finished fit (main thread only)."""
+        area = job.settings.area
+        self.timer = timer
+        self.currentFileName.set(job.fileName)
+        self.model_selection.set(job.settings.model)
+        self.activeData.load(spectrum)
+        self.PrintLoadedData()
+        self.activeData.use(job.fitted)
+        print('\n\n\n\n' + 'Sample: ' + job.fileName + '\n')
+        if job.kk is not None:
+            kk = job.kk
+            print('#\tKramers-Kronig check (%s): RMS residual %.3f %% of |Z|, max %.3f %% at %g Hz, %d points > %g %%'
+                  % (job.settings.kk, kk.rms, kk.max_residual, kk.frequency[np.argmax(kk.residual)],
+                     np.sum(kk.outliers(job.settings.kk_threshold)), job.settings.kk_threshold))
+
+        # Update the GUI with the Rmem estimated from the (chopped) data in [ohm*cm^2]
+        self.Rmem.IE.delete(0, END)
+        self.Rmem.IE.insert(0, '%5.8f' % (osif.estimate_rmem(self.activeData.spectrum) * area))
+
+        self.fitJob = job
+        self.fitResult = fitResult
+        self.finalParams = fitResult.params
+
+        # estimated errors in parameters
+        self.standardDeviation = fitResult.standard_error
+        self.L2NormOfRes = fitResult.L2NormOfRes
+        self.resPercentData = fitResult.resPercentData
+
+        print('\nFit to: ' + self.activeData.dataNameNoExt)
+
+        self.percentSigma = fitResult.percent_sigma
+
+        self.fitOutPutString = '#\n#\n#\t\t\t\t\t\t\t   Fit values\t\t\t~std Error\t\t\t ~std Error %% of value\n#\n#\tRmem  [ohm*cm^2] \t\t  = %5.8f\t\t\t%.3e\t\t\t\t%8.2f\n#\tRcl   [ohm*cm^2] \t\t  = %5.8f\t\t\t%.3e\t\t\t\t%8.2f' \
+                               '\n#\tQdl   [F/(sec^phi)]  = %5.8f\t\t\t%.3e\t\t\t\t%8.2f\n#\tphi   [ ]  \t\t\t\t  = %5.8f\t\t\t%.3e\t\t\t\t%8.2f\n#\tLwire [H*cm^2] \t\t\t  = %.4e\t\t\t%.3e\t\t\t\t%8.2f' \
+                               '\n#\tphi   [ ]  \t\t\t\t  = %5.8f\t\t\t%.3e\t\t\t\t%8.2f\n#\n#\tQdl/mgpt = %5.6f\n#\tL2 norm of res = %10.8f [ohm*cm^2]' % \
+                               (float(self.finalParams[1]) * area,
+                                float(self.standardDeviation[1]) * area, self.percentSigma[1],
+                                float(self.finalParams[2]) * area,
+                                float(self.standardDeviation[2]) * area, self.percentSigma[2],
+                                float(self.finalParams[3]), float(self.standardDeviation[3]), self.percentSigma[3],
+                                float(self.finalParams[4]), float(self.standardDeviation[4]), self.percentSigma[4],
+                                float(self.finalParams[0]) * area,
+                                float(self.standardDeviation[0]) * area, self.percentSigma[0],
+                                float(self.finalParams[5]), float(self.standardDeviation[5]), self.percentSigma[5],
+                                float(self.finalParams[3]) / (area * job.loading),
+                                float(self.L2NormOfRes) * area)
+
+        print(self.fitOutPutString)
+        print('#\tprofile: %s, stopped by %s after %d evaluations, last 10%% of evaluations improved the cost by %.2e'
+              % (fitResult.profile, fitResult.termination, fitResult.nfev, fitResult.tail_improvement))
+        # evaluate the model once and derive every curve from the complex impedance
+        finalModel = self.funcModel(self.finalParams)
+        self.realFinalModel = finalModel.real
+        self.imagFinalModel = finalModel.imag
+        self.zModFinalModel, self.phaseFinalModel = osif.modulus_and_phase(finalModel)
+
+        self.AvgRealResPer = np.sum(abs(
+            np.array(abs(self.realFinalModel - self.activeData.zPrime)) / np.array(self.activeData.zPrime)) * 100) / \
+                             self.realFinalModel.shape[0]
+        self.AvgImagResPer = np.sum(abs(
+            np.array(abs(self.imagFinalModel - self.activeData.ZdoublePrime)) / np.array(
+                self.activeData.ZdoublePrime)) * 100) / \
+                             self.imagFinalModel.shape[0]
+        # print('\nAvgRealResPer = ' + str(self.AvgRealResPer) + '\nAvgImagResPer = ' + str(self.AvgImagResPer))
+
+        self.Lwire.OE.config(state='normal')
+        self.Lwire.OE.delete(0, END)
+        self.Lwire.OE.insert(0, '%5.8f' % (float(self.finalParams[0]) * area))
+        self.Lwire.OE.config(state='readonly')
 
-            # Estimate Rmem directly from the data.  When the imaginary
-            # component of the impedance is approximately zero, the real
-            # component corresponds to the membrane resistance.  The data
-            # arrays are chopped to the frequency range at this point, so we
-            # simply find the value of Z' where |Z''| is minimal.
-            idx_rmem = int(np.argmin(np.abs(self.activeData.ZdoublePrime)))
-            est_rmem = self.activeData.zPrime[idx_rmem]
+        self.Rmem.OE.config(state='normal')
+        self.Rmem.OE.delete(0, END)
+        self.Rmem.OE.insert(0, '%5.8f' % (float(self.finalParams[1]) * area))
+        self.Rmem.OE.config(state='readonly')
 
-            # Update the GUI with the estimated Rmem in [ohm*cm^2]
-            self.Rmem.IE.delete(0, END)
-            self.Rmem.IE.insert(0, '%5.8f' % (est_rmem * float(self.area.IE.get())))
+        self.Rcl.OE.config(state='normal')
+        self.Rcl.OE.delete(0, END)
+        self.Rcl.OE.insert(0, '%5.8f' % (self.finalParams[2] * area))
+        self.Rcl.OE.config(state='readonly')
 
-            params = [float(self.Lwire.IE.get()) / float(self.area.IE.get()),
-                      float(self.Rmem.IE.get()) / float(self.area.IE.get()),
-                      float(self.Rcl.IE.get()) / float(self.area.IE.get()),
-                      float(self.Qdl.IE.get()),
-                      float(self.Phi.IE.get()),
-                      float(self.Theta.IE.get())]
+        self.Qdl.OE.config(state='normal')
+        self.Qdl.OE.delete(0, END)
+        self.Qdl.OE.insert(0, '%5.8f' % self.finalParams[3])
+        self.Qdl.OE.config(state='readonly')
 
-            # Perform the fitting using least_squares with the TRF method and max function calls of 10000.
-            rmem_param = float(self.Rmem.IE.get()) / float(self.area.IE.get())
-            bounds_lower = (0, 0.9 * rmem_param, 0, 0, 0, 0)
-            bounds_upper = (1, 1.1 * rmem_param, np.inf, np.inf, 1, 1)
-
-            finalOutput = scipy.optimize.least_squares(self.funcCost, params,
-                                                       bounds=[bounds_lower, bounds_upper],
-                                                       max_nfev=50000, method='trf', xtol=1e-11,
-                                                       ftol=1e-11, gtol=1e-11, verbose=1)
-            self.finalParams = finalOutput.x
-
-            # Estimate variance of parameters based on Gauss-Newton approximation of the Hessian of the cost function. See: (https://www8.cs.umu.se/kurser/5DA001/HT07/lectures/lsq-handouts.pdf)
-            # basically Covariance matrix = inverse(Jacob^T*Jacob)*meanSquaredError, where Jacob^T*Jacob is the first order estimate for the hessian. The square root of the diagonal elements (c_ii) of Cov are the variances of the parameter b_i
-
-            # sigma squared estimate also called s^2 sometimes = chi^2 reduced
-            sigmaSquared = (np.matmul(np.transpose(finalOutput.fun), finalOutput.fun)) / (
-                    finalOutput.fun.shape[0] - self.finalParams.size)
-
-            # Plot residuals for error checking. Note: cancels update of the normal plots in the normal UI.
-            # plt.figure(100)
-            # plt.plot(finalOutput.fun)
-            # plt.show()
-
-            Jacob = finalOutput.jac
-            estVars = np.matrix.diagonal(
-                np.linalg.inv(Jacob.T.dot(Jacob)) * (np.matmul(np.transpose(finalOutput.fun), finalOutput.fun)) / (
-                        finalOutput.fun.shape[0] - self.finalParams.size))
-            # estVars = sigmaSquared*np.matrix.diagonal(np.linalg.inv(np.matmul(np.matrix.transpose(finalOutput.jac),finalOutput.jac)))
-
-            # estimated errors in parameters
-            self.standardDeviation = np.sqrt(estVars)
-
-            # taking chi^2  = sum((residuals^T)*(residuals)) = sum (r_i)^2
-            # print('Sum res^2 = ' + str(np.sum((np.matrix.transpose(finalOutput.fun).__mul__(finalOutput.fun)))))
-
-            self.L2NormOfRes = np.sqrt(np.sum(pow(finalOutput.fun, 2)))
-
-            # print('\nNormalized grad = grad/|grad| = ' + str(finalOutput.grad / np.sqrt(np.sum(pow(finalOutput.grad, 2)))))
-
-            self.resPercentData = np.sum(finalOutput.fun / self.activeData.zMod * 100) / finalOutput.fun.shape[0]
-
-            print('\nFit to: ' + self.activeData.dataNameNoExt)
-
-            self.percentSigma = self.standardDeviation / self.finalParams * 100
-
-            self.fitOutPutString = '#\n#\n#\t\t\t\t\t\t\t   Fit values\t\t\t~std Error\t\t\t ~std Error %% of value\n#\n#\tRmem  [ohm*cm^2] \t\t  = %5.8f\t\t\t%.3e\t\t\t\t%8.2f\n#\tRcl   [ohm*cm^2] \t\t  = %5.8f\t\t\t%.3e\t\t\t\t%8.2f' \
-                                   '\n#\tQdl   [F/(sec^phi)]  = %5.8f\t\t\t%.3e\t\t\t\t%8.2f\n#\tphi   [ ]  \t\t\t\t  = %5.8f\t\t\t%.3e\t\t\t\t%8.2f\n#\tLwire [H*cm^2] \t\t\t  = %.4e\t\t\t%.3e\t\t\t\t%8.2f' \
-                                   '\n#\tphi   [ ]  \t\t\t\t  = %5.8f\t\t\t%.3e\t\t\t\t%8.2f\n#\n#\tQdl/mgpt = %5.6f\n#\tL2 norm of res = %10.8f [ohm*cm^2]' % \
-                                   (float(self.finalParams[1]) * float(self.area.IE.get()),
-                                    float(self.standardDeviation[1]) * float(self.area.IE.get()), self.percentSigma[1],
-                                    float(self.finalParams[2]) * float(self.area.IE.get()),
-                                    float(self.standardDeviation[2]) * float(self.area.IE.get()), self.percentSigma[2],
-                                    float(self.finalParams[3]), float(self.standardDeviation[3]), self.percentSigma[3],
-                                    float(self.finalParams[4]), float(self.standardDeviation[4]), self.percentSigma[4],
-                                    float(self.finalParams[0]) * float(self.area.IE.get()),
-                                    float(self.standardDeviation[0]) * float(self.area.IE.get()), self.percentSigma[0],
-                                    float(self.finalParams[5]), float(self.standardDeviation[5]), self.percentSigma[5],
-                                    float(self.finalParams[3]) / (
-                                                float(self.area.IE.get()) * float(self.loading.IE.get())),
-                                    float(self.L2NormOfRes) * float(self.area.IE.get()))
-
-            print(self.fitOutPutString)
-            if self.model_selection.get() == self.eis_model[0]:
-                self.realFinalModel = self.funcreal(self.finalParams)
-                self.imagFinalModel = self.funcImg(self.finalParams)
-            elif self.model_selection.get() == self.eis_model[1]:
-                self.realFinalModel = self.funcreal_l(self.finalParams)
-                self.imagFinalModel = self.funcImg_l(self.finalParams)
-            elif self.model_selection.get() == self.eis_model[2]:
-                self.realFinalModel = self.funcreal_s(self.finalParams)
-                self.imagFinalModel = self.funcImg_s(self.finalParams)
-            self.zModFinalModel = self.funcAbs(self.finalParams)
-            self.phaseFinalModel = self.funcPhase(self.finalParams)
-            # (180/(np.pi))*np.arctan(self.funcImg(self.finalParams)/self.funcreal(self.finalParams))
-
-            self.AvgRealResPer = np.sum(abs(
-                np.array(abs(self.realFinalModel - self.activeData.zPrime)) / np.array(self.activeData.zPrime)) * 100) / \
-                                 self.realFinalModel.shape[0]
-            self.AvgImagResPer = np.sum(abs(
-                np.array(abs(self.imagFinalModel - self.activeData.ZdoublePrime)) / np.array(
-                    self.activeData.ZdoublePrime)) * 100) / \
-                                 self.imagFinalModel.shape[0]
-            # print('\nAvgRealResPer = ' + str(self.AvgRealResPer) + '\nAvgImagResPer = ' + str(self.AvgImagResPer))
-
-            self.Lwire.OE.config(state='normal')
-            self.Lwire.OE.delete(0, END)
-            self.Lwire.OE.insert(0, '%5.8f' % (float(self.finalParams[0]) * float(self.area.IE.get())))
-            self.Lwire.OE.config(state='readonly')
-
-            self.Rmem.OE.config(state='normal')
-            self.Rmem.OE.delete(0, END)
-            self.Rmem.OE.insert(0, '%5.8f' % (float(self.finalParams[1]) * float(self.area.IE.get())))
-            self.Rmem.OE.config(state='readonly')
-
-            self.Rcl.OE.config(state='normal')
-            self.Rcl.OE.delete(0, END)
-            self.Rcl.OE.insert(0, '%5.8f' % (self.finalParams[2] * float(self.area.IE.get())))
-            self.Rcl.OE.config(state='readonly')
-
-            self.Qdl.OE.config(state='normal')
-            self.Qdl.OE.delete(0, END)
-            self.Qdl.OE.insert(0, '%5.8f' % self.finalParams[3])
-            self.Qdl.OE.config(state='readonly')
-
-            self.Phi.OE.config(state='normal')
-            self.Phi.OE.delete(0, END)
-            self.Phi.OE.insert(0, '%5.8f' % self.finalParams[4])
-            self.Phi.OE.config(state='readonly')
-
-            self.Theta.OE.config(state='normal')
-            self.Theta.OE.delete(0, END)
-            self.Theta.OE.insert(0, '%5.8f' % self.finalParams[5])
-            self.Theta.OE.config(state='readonly')
-
-            self.Lwire.OESD.config(state='normal')
-            self.Lwire.OESD.delete(0, END)
-            self.Lwire.OESD.insert(0, '%5.8f' % (self.standardDeviation[0] * float(self.area.IE.get())))
-            self.Lwire.OESD.config(state='readonly')
-
-            self.Rmem.OESD.config(state='normal')
-            self.Rmem.OESD.delete(0, END)
-            self.Rmem.OESD.insert(0, '%5.8f' % ((float(self.standardDeviation[1]) * float(self.area.IE.get()))))
-            self.Rmem.OESD.config(state='readonly')
-
-            self.Rcl.OESD.config(state='normal')
-            self.Rcl.OESD.delete(0, END)
-            self.Rcl.OESD.insert(0, '%5.8f' % (self.standardDeviation[2] * float(self.area.IE.get())))
-            self.Rcl.OESD.config(state='readonly')
-
-            self.Qdl.OESD.config(state='normal')
-            self.Qdl.OESD.delete(0, END)
-            self.Qdl.OESD.insert(0, '%5.8f' % self.standardDeviation[3])
-            self.Qdl.OESD.config(state='readonly')
-
-            self.Phi.OESD.config(state='normal')
-            self.Phi.OESD.delete(0, END)
-            self.Phi.OESD.insert(0, '%5.8f' % self.standardDeviation[4])
-            self.Phi.OESD.config(state='readonly')
-
-            self.Theta.OESD.config(state='normal')
-            self.Theta.OESD.delete(0, END)
-            self.Theta.OESD.insert(0, '%5.8f' % self.standardDeviation[5])
-            self.Theta.OESD.config(state='readonly')
-
-            self.Lwire.OESDP.config(state='normal')
-            self.Lwire.OESDP.delete(0, END)
-            self.Lwire.OESDP.insert(0, '%5.4f' % (self.percentSigma[0]))
-            self.Lwire.OESDP.config(state='readonly')
-
-            self.Rmem.OESDP.config(state='normal')
-            self.Rmem.OESDP.delete(0, END)
-            self.Rmem.OESDP.insert(0, '%5.4f' % (self.percentSigma[1]))
-            self.Rmem.OESDP.config(state='readonly')
-
-            self.Rcl.OESDP.config(state='normal')
-            self.Rcl.OESDP.delete(0, END)
-            self.Rcl.OESDP.insert(0, '%5.4f' % (self.percentSigma[2]))
-            self.Rcl.OESDP.config(state='readonly')
-
-            self.Qdl.OESDP.config(state='normal')
-            self.Qdl.OESDP.delete(0, END)
-            self.Qdl.OESDP.insert(0, '%5.4f' % self.percentSigma[3])
-            self.Qdl.OESDP.config(state='readonly')
-
-            self.Phi.OESDP.config(state='normal')
-            self.Phi.OESDP.delete(0, END)
-            self.Phi.OESDP.insert(0, '%5.4f' % self.percentSigma[4])
-            self.Phi.OESDP.config(state='readonly')
-
-            self.Theta.OESDP.config(state='normal')
-            self.Theta.OESDP.delete(0, END)
-            self.Theta.OESDP.insert(0, '%5.4f' % self.percentSigma[5])
-            self.Theta.OESDP.config(state='readonly')
+        self.Phi.OE.config(state='normal')
+        self.Phi.OE.delete(0, END)
+        self.Phi.OE.insert(0, '%5.8f' % self.finalParams[4])
+        self.Phi.OE.config(state='readonly')
 
-            self.avgResPer.AVGRESPER.config(state='normal')
-            self.avgResPer.AVGRESPER.delete(0, END)
-            self.avgResPer.AVGRESPER.insert(0, '%5.4f' % self.resPercentData)
-            self.avgResPer.AVGRESPER.config(state='readonly')
+        self.Theta.OE.config(state='normal')
+        self.Theta.OE.delete(0, END)
+        self.Theta.OE.insert(0, '%5.8f' % self.finalParams[5])
+        self.Theta.OE.config(state='readonly')
+
+        self.Lwire.OESD.config(state='normal')
+        self.Lwire.OESD.delete(0, END)
+        self.Lwire.OESD.insert(0, '%5.8f' % (self.standardDeviation[0] * area))
+        self.Lwire.OESD.config(state='readonly')
+
+        self.Rmem.OESD.config(state='normal')
+        self.Rmem.OESD.delete(0, END)
+        self.Rmem.OESD.insert(0, '%5.8f' % ((float(self.standardDeviation[1]) * area)))
+        self.Rmem.OESD.config(state='readonly')
+
+        self.Rcl.OESD.config(state='normal')
+        self.Rcl.OESD.delete(0, END)
+        self.Rcl.OESD.insert(0, '%5.8f' % (self.standardDeviation[2] * area))
+        self.Rcl.OESD.config(state='readonly')
+
+        self.Qdl.OESD.config(state='normal')
+        self.Qdl.OESD.delete(0, END)
+        self.Qdl.OESD.insert(0, '%5.8f' % self.standardDeviation[3])
+        self.Qdl.OESD.config(state='readonly')
+
+        self.Phi.OESD.config(state='normal')
+        self.Phi.OESD.delete(0, END)
+        self.Phi.OESD.insert(0, '%5.8f' % self.standardDeviation[4])
+        self.Phi.OESD.config(state='readonly')
+
+        self.Theta.OESD.config(state='normal')
+        self.Theta.OESD.delete(0, END)
+        self.Theta.OESD.insert(0, '%5.8f' % self.standardDeviation[5])
+        self.Theta.OESD.config(state='readonly')
 
-            self.CreateFigures(self.finalParams, 'fit')
+        self.Lwire.OESDP.config(state='normal')
+        self.Lwire.OESDP.delete(0, END)
+        self.Lwire.OESDP.insert(0, '%5.4f' % (self.percentSigma[0]))
+        self.Lwire.OESDP.config(state='readonly')
+
+        self.Rmem.OESDP.config(state='normal')
+        self.Rmem.OESDP.delete(0, END)
+        self.Rmem.OESDP.insert(0, '%5.4f' % (self.percentSigma[1]))
+        self.Rmem.OESDP.config(state='readonly')
+
+        self.Rcl.OESDP.config(state='normal')
+        self.Rcl.OESDP.delete(0, END)
+        self.Rcl.OESDP.insert(0, '%5.4f' % (self.percentSigma[2]))
+        self.Rcl.OESDP.config(state='readonly')
+
+        self.Qdl.OESDP.config(state='normal')
+        self.Qdl.OESDP.delete(0, END)
+        self.Qdl.OESDP.insert(0, '%5.4f' % self.percentSigma[3])
+        self.Qdl.OESDP.config(state='readonly')
+
+        self.Phi.OESDP.config(state='normal')
+        self.Phi.OESDP.delete(0, END)
+        self.Phi.OESDP.insert(0, '%5.4f' % self.percentSigma[4])
+        self.Phi.OESDP.config(state='readonly')
+
+        self.Theta.OESDP.config(state='normal')
+        self.Theta.OESDP.delete(0, END)
+        self.Theta.OESDP.insert(0, '%5.4f' % self.percentSigma[5])
+        self.Theta.OESDP.config(state='readonly')
+
+        self.avgResPer.AVGRESPER.config(state='normal')
+        self.avgResPer.AVGRESPER.delete(0, END)
+        self.avgResPer.AVGRESPER.insert(0, '%5.4f' % self.resPercentData)
+        self.avgResPer.AVGRESPER.config(state='readonly')
+
+        self.ShowBootstrap(job)
+
+        self.CreateFigures(self.finalParams, 'fit')
+        self.ReportTimings(fitResult)
+
+    def ShowBootstrap(self, job):
+        """Fill the Bootstrap 95% CI column in the per-area units of the other columns."""
+        boot = job.bootstrapResult
+        if boot is not None:
+            lower = osif.per_area(boot.lower, job.settings.area)
+            upper = osif.per_area(boot.upper, job.settings.area)
+            print('#\tbootstrap (%s): %d refits, %d failed, %.2f s' % (boot.method, len(boot.params), boot.failed,
+                                                                       boot.wall_time))
+            for error, count in boot.errors.items():
+                print('#\t  %d refit(s) failed with %s' % (count, error))
+        for i, param in enumerate((self.Lwire, self.Rmem, self.Rcl, self.Qdl, self.Phi, self.Theta)):
+            param.OECI.config(state='normal')
+            param.OECI.delete(0, END)
+            param.OECI.insert(0, '---' if boot is None else '[%.4g, %.4g]' % (lower[i], upper[i]))
+            param.OECI.config(state='readonly')
 
     def CreateFigures(self, params, fitOrSim):
         if fitOrSim == 'fit':
@@ -724,134 +847,149 @@ class OSIF:
         else:
             graphLabel = ''
 
-        plt.close('all')
+        with self.timer.phase('plot'):
+            self.DrawFigures(params, graphLabel)
+        print('done with plotting')
+
+    def BuildFigures(self):
+        """Create the figure, its five graphs and the Tk canvas once.
+
+        Later plots only give the existing lines new data.  The model lines and
+        the legend are animated artists: when the data and the axis limits stay
+        the same (e.g. repeated simulations) they are blitted onto a saved
+        background instead of redrawing the whole figure.
+        """
+        f = Figure(figsize=[8, 3.5], tight_layout=True)
         # make layout for graphs
-        gs0 = gridspec.GridSpec(1, 2)
+        gs0 = gridspec.GridSpec(1, 2, figure=f)
         gs00 = gridspec.GridSpecFromSubplotSpec(4, 3, subplot_spec=gs0[0])
         gs01 = gridspec.GridSpecFromSubplotSpec(4, 4, subplot_spec=gs0[1])
-        f = plt.figure(1, figsize=[8, 3.5], tight_layout='true')
-
-        ###########################################################
-        ####          PLOT NYQUIST COMBINED FITTINGS           ####
-        ###########################################################
-
-        nyGraph = plt.Subplot(f, gs01[:, :])
-        f.add_subplot(nyGraph)
-        nyGraph.plot(self.activeData.zPrime, self.activeData.ZdoublePrime, 'bo', ls='--', markersize=2, linewidth=1,
-                     label='data: ' + self.activeData.dataNameNoExt)
-
-        if self.model_selection.get() == self.eis_model[0]:
-            nyGraph.plot(self.funcreal(params), self.funcImg(params), 'ro', markersize=2,
-                         label='\n%s\nLwire=%.5e\nRmem=%5.8f\nRcl=%5.8f\nQdl=%5.5f\nphi=%5.5f\ntheta=%5.5f' % (
-                             graphLabel, params[0] * float(self.area.IE.get()), params[1] * float(self.area.IE.get()),
-                             params[2] * float(self.area.IE.get()), params[3], params[4], params[5]))
-
-        elif self.model_selection.get() == self.eis_model[1]:
-            nyGraph.plot(self.funcreal_l(params), self.funcImg_l(params), 'ro', markersize=2,
-                         label='\n%s\nLwire=%.5e\nRmem=%5.8f\nRcl=%5.8f\nQdl=%5.5f\nphi=%5.5f\ntheta=%5.5f' % (
-                             graphLabel, params[0] * float(self.area.IE.get()), params[1] * float(self.area.IE.get()),
-                             params[2] * float(self.area.IE.get()), params[3], params[4], params[5]))
-
-        elif self.model_selection.get() == self.eis_model[2]:
-            nyGraph.plot(self.funcreal_s(params), self.funcImg_s(params), 'ro', markersize=2,
-                         label='\n%s\nLwire=%.5e\nRmem=%5.8f\nRcl=%5.8f\nQdl=%5.5f\nphi=%5.5f\ntheta=%5.5f' % (
-                             graphLabel, params[0] * float(self.area.IE.get()), params[1] * float(self.area.IE.get()),
-                             params[2] * float(self.area.IE.get()), params[3], params[4], params[5]))
-
-        plt.gca().invert_yaxis()
-        plt.xticks(rotation=20)
-
-        plt.xlabel('Re(Z)')
-        plt.ylabel('Im(Z)')
-        plt.legend(loc=2, fontsize=6)
-
-        ###########################################################
-        ####        PLOT Phase vs w COMBINED FITTINGS          ####
-        ###########################################################
-
-        phaseGraph = plt.Subplot(f, gs00[-4, :3])
-        f.add_subplot(phaseGraph)
-        phaseGraph.plot(self.activeData.frequency, self.activeData.phase, 'bo', ls='--', markersize=2,
-                        linewidth=1)
-        phaseGraph.plot(self.activeData.frequency, self.funcPhase(params), 'ro', markersize=2)
-        plt.ylabel('phase')
-        # plt.gca().set_yscale('log')
-        plt.gca().set_xscale('log')
-
-        ###########################################################
-        ####         PLOT |Z| vs w COMBINED FITTINGS           ####
-        ###########################################################
-
-        modZgraph = plt.Subplot(f, gs00[-3, :3])
-        f.add_subplot(modZgraph)
-        modZgraph.plot(self.activeData.frequency, self.activeData.modZExperimentalComplex, 'bo', ls='--', markersize=2,
-                       linewidth=1)
-        modZgraph.plot(self.activeData.frequency, self.funcAbs(params), 'ro', markersize=2)
-        plt.ylabel('|Z|')
-        plt.gca().set_yscale('log')
-        plt.gca().set_xscale('log')
-
-        ###########################################################
-        ####                   PLOT Im(Z)                      ####
-        ###########################################################
-
-        imZgraph = plt.Subplot(f, gs00[-2, :3])
-        f.add_subplot(imZgraph)
-        imZgraph.plot(self.activeData.frequency, self.activeData.ZdoublePrime, 'bo', ls='--', markersize=2, linewidth=1)
-
-        if self.model_selection.get() == self.eis_model[0]:
-            imZgraph.plot(self.activeData.frequency, (self.funcImg(params)), 'ro', markersize=2)
-        elif self.model_selection.get() == self.eis_model[1]:
-            imZgraph.plot(self.activeData.frequency, (self.funcImg_l(params)), 'ro', markersize=2)
-        elif self.model_selection.get() == self.eis_model[2]:
-            imZgraph.plot(self.activeData.frequency, (self.funcImg_s(params)), 'ro', markersize=2)
-
-        plt.ylabel('Im(Z)')
-        plt.gca().set_yscale('linear')
-        plt.gca().set_xscale('log')
-        plt.gca().set_xticks([])
-
-        ###########################################################
-        ####                   PLOT Re(Z)                      ####
-        ###########################################################
-
-        reZgraph = plt.Subplot(f, gs00[-1, :3])
-        f.add_subplot(reZgraph)
-        reZgraph.plot(self.activeData.frequency, self.activeData.zPrime, 'bo', ls='--', markersize=2, linewidth=1)
-
-        if self.model_selection.get() == self.eis_model[0]:
-            reZgraph.plot(self.activeData.frequency, self.funcreal(params), 'ro', markersize=2)
-        elif self.model_selection.get() == self.eis_model[1]:
-            reZgraph.plot(self.activeData.frequency, (self.funcreal_l(params)), 'ro', markersize=2)
-        elif self.model_selection.get() == self.eis_model[2]:
-            reZgraph.plot(self.activeData.frequency, (self.funcreal_s(params)), 'ro', markersize=2)
-
-        plt.xlabel('frequency')
-        plt.ylabel('Re(Z)')
-        plt.gca().set_yscale('log')
-        plt.gca().set_xscale('log')
-
-        ###########################################################
+
+        ####          NYQUIST, Phase vs w, |Z| vs w, Im(Z) and Re(Z)           ####
+        nyGraph = f.add_subplot(gs01[:, :])
+        nyGraph.invert_yaxis()
+        nyGraph.tick_params(axis='x', labelrotation=20)
+        nyGraph.set_xlabel('Re(Z)')
+        nyGraph.set_ylabel('Im(Z)')
+
+        phaseGraph = f.add_subplot(gs00[-4, :3])
+        phaseGraph.set_ylabel('phase')
+        phaseGraph.set_xscale('log')
+
+        modZgraph = f.add_subplot(gs00[-3, :3])
+        modZgraph.set_ylabel('|Z|')
+        modZgraph.set_yscale('log')
+        modZgraph.set_xscale('log')
+
+        imZgraph = f.add_subplot(gs00[-2, :3])
+        imZgraph.set_ylabel('Im(Z)')
+        imZgraph.set_yscale('linear')
+        imZgraph.set_xscale('log')
+        imZgraph.set_xticks([])
+
+        reZgraph = f.add_subplot(gs00[-1, :3])
+        reZgraph.set_xlabel('frequency')
+        reZgraph.set_ylabel('Re(Z)')
+        reZgraph.set_yscale('log')
+        reZgraph.set_xscale('log')
+
+        self.graphs = {}
+        for name, graph in [('nyquist', nyGraph), ('phase', phaseGraph), ('modZ', modZgraph), ('imZ', imZgraph),
+                            ('reZ', reZgraph)]:
+            dataLine, = graph.plot([], [], 'bo', ls='--', markersize=2, linewidth=1)
+            modelLine, = graph.plot([], [], 'ro', markersize=2, animated=True)
+            self.graphs[name] = (graph, dataLine, modelLine)
+        self.legend = None
+        self.plotBackground = None
+        self.plottedVersion = None
+
         ####              Draw figure in Tkinter               ####
-        ###########################################################
         for widget in self.plotFrame.winfo_children():
             widget.destroy()
         for widget in self.plotFrameToolBar.winfo_children():
             widget.destroy()
-
-        dataPlot = FigureCanvasTkAgg(f, master=self.plotFrame)
-        dataPlot.close_event()
-        dataPlot.draw()
-        dataPlot.get_tk_widget().grid(row=0, sticky=N + S + E + W, )
+        self.figure = f
+        self.dataPlot = FigureCanvasTkAgg(f, master=self.plotFrame)
+        self.dataPlot.mpl_connect('draw_event', self.OnDraw)
+        self.dataPlot.get_tk_widget().grid(row=0, sticky=N + S + E + W, )
         # toolbar = NavigationToolbar2TkAgg(dataPlot, self.plotFrameToolBar)
         # toolbar.update()
-        dataPlot._tkcanvas.grid(row=0, sticky=W + S)
 
-        print('done with plotting')
+    def OnDraw(self, event):
+        # a full draw leaves out the animated artists: save the background for blitting, then add them
+        self.plotBackground = self.dataPlot.copy_from_bbox(self.figure.bbox)
+        self.DrawAnimated()
+
+    def DrawAnimated(self):
+        for graph, dataLine, modelLine in self.graphs.values():
+            graph.draw_artist(modelLine)
+        self.graphs['nyquist'][0].draw_artist(self.legend)
+
+    def DrawFigures(self, params, graphLabel):
+        if getattr(self, 'dataPlot', None) is None:
+            self.BuildFigures()
+
+        # evaluate the model once and derive every curve from the complex impedance
+        model = self.funcModel(params)
+        modelMod, modelPhase = osif.modulus_and_phase(model)
+        data = self.activeData
+        curves = {'nyquist': ((data.zPrime, data.ZdoublePrime), (model.real, model.imag)),
+                  'phase': ((data.frequency, data.phase), (data.frequency, modelPhase)),
+                  'modZ': ((data.frequency, data.modZExperimentalComplex), (data.frequency, modelMod)),
+                  'imZ': ((data.frequency, data.ZdoublePrime), (data.frequency, model.imag)),
+                  'reZ': ((data.frequency, data.zPrime), (data.frequency, model.real))}
+
+        newData = self.plottedVersion != data.version
+        inView = True
+        for name, (dataXY, modelXY) in curves.items():
+            graph, dataLine, modelLine = self.graphs[name]
+            if newData:
+                dataLine.set_data(*dataXY)
+            modelLine.set_data(*modelXY)
+            inView = inView and self.InView(graph, *modelXY)
+        self.plottedVersion = data.version
+
+        nyGraph, dataLine, modelLine = self.graphs['nyquist']
+        dataLine.set_label('data: ' + data.dataNameNoExt)
+        modelLine.set_label('\n%s\nLwire=%.5e\nRmem=%5.8f\nRcl=%5.8f\nQdl=%5.5f\nphi=%5.5f\ntheta=%5.5f' % (
+            graphLabel, params[0] * float(self.area.IE.get()), params[1] * float(self.area.IE.get()),
+            params[2] * float(self.area.IE.get()), params[3], params[4], params[5]))
+        self.legend = nyGraph.legend(loc=2, fontsize=6)
+        self.legend.set_animated(True)
+
+        if newData or not inView or self.plotBackground is None:
+            for graph, dataLine, modelLine in self.graphs.values():
+                graph.relim()
+                graph.autoscale_view()
+            self.dataPlot.draw_idle()
+        else:
+            self.dataPlot.restore_region(self.plotBackground)
+            self.DrawAnimated()
+            self.dataPlot.blit(self.figure.bbox)
+
+    @staticmethod
+    def InView(graph, x, y):
+        """True if every finite point of (x, y) lies inside the current limits of ``graph``."""
+        x, y = np.asarray(x), np.asarray(y)
+        finite = np.isfinite(x) & np.isfinite(y)
+        if not finite.any():
+            return True
+        x, y = x[finite], y[finite]
+        xlim, ylim = sorted(graph.get_xlim()), sorted(graph.get_ylim())
+        return (xlim[0] <= x.min() and x.max() <= xlim[1] and ylim[0] <= y.min() and y.max() <= ylim[1])
+
+    def ReportTimings(self, fitResult):
+        """Print the phase timings of the last fit and pass its record to the osif.telemetry hooks."""
+        record = osif.telemetry.fit_record(fitResult, self.timer.timings, file=self.currentFileName.get())
+        print('timings [s]: ' + ', '.join('%s %.4f' % item for item in record['timings'].items()) +
+              '\nnfev %d, njev %d, status %d, cost %.6e' % (record['nfev'], record['njev'], record['status'],
+                                                            record['cost']))
+        osif.telemetry.emit(record)
 
     def KILLALL(self):
         for widget in self.plotFrame.winfo_children():
             widget.destroy()
+        self.dataPlot = None
         #   for widget in self.plotFrameToolBar.winfo_children():
         #       widget.destroy()
         print("\n\nAll plots killed. \nHave a nice day!")
@@ -863,137 +1001,97 @@ class OSIF:
             # nothing selected to load
             return
 
-        dataOutFile = open(self.currentDataDir.IE.get() + self.activeData.dataNameNoExt + '_fit.txt', "w+")
-        i = 0
-        dataOutFile.write('#Fitted model at fitting frequencies:\n#Frequency\t\tRe(Z)\t\t\tIm(Z)\t\t\t|Z|\n')
-        for real in self.realFinalModel:
+        baseName = self.currentDataDir.IE.get() + self.activeData.dataNameNoExt + '_fit'
+        with open(baseName + '.txt', "w+") as dataOutFile:
+            dataOutFile.write('#Fitted model at fitting frequencies:\n#Frequency\t\tRe(Z)\t\t\tIm(Z)\t\t\t|Z|\n')
+            np.savetxt(dataOutFile, np.column_stack((self.activeData.frequency, self.realFinalModel,
+                                                     self.imagFinalModel, self.zModFinalModel)),
+                       fmt='%.17g', delimiter='\t')
+
             dataOutFile.write(
-                str(self.activeData.frequency[i]) + '\t' + str(self.realFinalModel[i]) + '\t' + str(
-                    self.imagFinalModel[i]) + '\t' + str(
-                    self.zModFinalModel[i]) + '\n')
-            i += 1
-
-        dataOutFile.write(
-            '#\n#\n#\t\t\t\t   Fit values\t\t\t~std dev\t\t\t   ~stdDev %% of value\n#\n#\tRmem  [ohm*cm^2] \t  = %5.8f\t\t\t%.3e\t\t\t\t%8.2f\n#\tRcl   [ohm*cm^2] \t  = %5.8f\t\t\t%.3e\t\t\t\t%8.2f' \
-            '\n#\tQdl   [F/(cm^2*sec^phi)]  = %5.8f\t\t\t%.3e\t\t\t\t%8.2f\n#\tphi   [ ]  \t\t  = %5.8f\t\t\t%.3e\t\t\t\t%8.2f\n#\tLwire [H*cm^2] \t\t  = %.4e\t\t\t%.3e\t\t\t\t%8.2f' \
-            '\n#\ttheta   [ ]  \t\t  = %5.8f\t\t\t%.3e\t\t\t\t%8.2f\n#\n#\tQdl/mgpt = %5.6f\n#\tL2 norm of res = %10.8f' % (
-                float(self.finalParams[1]) * float(self.area.IE.get()),
-                float(self.standardDeviation[1]) * float(self.area.IE.get()), self.percentSigma[1],
-                float(self.finalParams[2]) * float(self.area.IE.get()),
-                float(self.standardDeviation[2]) * float(self.area.IE.get()), self.percentSigma[2],
-                float(self.finalParams[3]), float(self.standardDeviation[3]), self.percentSigma[3],
-                float(self.finalParams[4]), float(self.standardDeviation[4]), self.percentSigma[4],
-                float(self.finalParams[0]) * float(self.area.IE.get()),
-                float(self.standardDeviation[0]) * float(self.area.IE.get()), self.percentSigma[0],
-                float(self.finalParams[5]), float(self.standardDeviation[5]), self.percentSigma[5],
-                float(self.finalParams[3]) / (float(self.area.IE.get()) * float(self.loading.IE.get())),
-                float(self.L2NormOfRes)))
-
-        dataOutFile.write('\n#\tAvg. |Z| residual % WRT to data |Z| = ' + str(self.resPercentData))
-
-        dataOutFile.close()
-        print("saved data in: " + self.currentDataDir.IE.get() + self.activeData.dataNameNoExt + '_fit.txt')
-
-    # Because built in coth(x) cant deal with complex numbers because exp(x) cant deal with them, but pow(x,y) can.
-    def JPcoth(self, x):
-        return (pow(np.e, x) + pow(np.e, -x)) / (pow(np.e, x) - pow(np.e, -x))
+                '#\n#\n#\t\t\t\t   Fit values\t\t\t~std dev\t\t\t   ~stdDev %% of value\n#\n#\tRmem  [ohm*cm^2] \t  = %5.8f\t\t\t%.3e\t\t\t\t%8.2f\n#\tRcl   [ohm*cm^2] \t  = %5.8f\t\t\t%.3e\t\t\t\t%8.2f' \
+                '\n#\tQdl   [F/(cm^2*sec^phi)]  = %5.8f\t\t\t%.3e\t\t\t\t%8.2f\n#\tphi   [ ]  \t\t  = %5.8f\t\t\t%.3e\t\t\t\t%8.2f\n#\tLwire [H*cm^2] \t\t  = %.4e\t\t\t%.3e\t\t\t\t%8.2f' \
+                '\n#\ttheta   [ ]  \t\t  = %5.8f\t\t\t%.3e\t\t\t\t%8.2f\n#\n#\tQdl/mgpt = %5.6f\n#\tL2 norm of res = %10.8f' % (
+                    float(self.finalParams[1]) * float(self.area.IE.get()),
+                    float(self.standardDeviation[1]) * float(self.area.IE.get()), self.percentSigma[1],
+                    float(self.finalParams[2]) * float(self.area.IE.get()),
+                    float(self.standardDeviation[2]) * float(self.area.IE.get()), self.percentSigma[2],
+                    float(self.finalParams[3]), float(self.standardDeviation[3]), self.percentSigma[3],
+                    float(self.finalParams[4]), float(self.standardDeviation[4]), self.percentSigma[4],
+                    float(self.finalParams[0]) * float(self.area.IE.get()),
+                    float(self.standardDeviation[0]) * float(self.area.IE.get()), self.percentSigma[0],
+                    float(self.finalParams[5]), float(self.standardDeviation[5]), self.percentSigma[5],
+                    float(self.finalParams[3]) / (float(self.area.IE.get()) * float(self.loading.IE.get())),
+                    float(self.L2NormOfRes)))
+
+            dataOutFile.write('\n#\tAvg. |Z| residual % WRT to data |Z| = ' + str(self.resPercentData))
+        print("saved data in: " + baseName + '.txt')
+
+        # the same fit in machine-readable form, for Load Fit and scripts (osif.load_fit)
+        job = self.fitJob
+        sourceHash = osif.store.file_hash(job.path) if os.path.isfile(job.path) else ''
+        osif.save_fit(baseName + '.npz', self.fitResult, self.activeData.spectrum, job.settings,
+                      source_hash=sourceHash, loading=job.loading, fileName=job.fileName)
+        print("saved fit in: " + baseName + '.npz')
+
+    def LoadFit(self):
+        """Show a fit saved by Save Model Data without refitting it.
+
+        The fitted values also become the initial values, so pressing Fit
+        warm-starts a refit from them.
+        """
+        path = tkFileDialog.askopenfilename(title="Select a saved fit", filetypes=[("OSIF fit", "*_fit.npz")])
+        if not path:
+            return
+        try:
+            saved = osif.load_fit(path)
+        except (OSError, ValueError, KeyError) as e:
+            tkMessageBox.showinfo("Error!", f"Could not load {path}:\n{e}")
+            return
+        if saved.model.param_names != osif.PARAM_NAMES:
+            tkMessageBox.showinfo("Error!", "The GUI shows fits of the built-in models only;\n"
+                                            "load fits of %s with osif.load_fit" % saved.result.model)
+            return
+        # the saved data already passed the Kramers-Kronig check of the fit; it is shown as it was fitted
+        settings = replace(saved.settings, kk=None)
+        job = FitJob(fileName=saved.extra.get('fileName', saved.spectrum.name), path=saved.spectrum.source,
+                     settings=settings, loading=saved.extra.get('loading', float(self.loading.IE.get())))
+        if os.path.isfile(job.path) and not saved.matches(osif.load_spectrum(job.path)):
+            print('note: ' + job.path + ' has changed since this fit was saved')
+
+        for entry, value in ((self.area.IE, settings.area), (self.loading.IE, job.loading),
+                             (self.frequencyRange.OE, settings.lower), (self.frequencyRange.IE, settings.upper)):
+            entry.delete(0, END)
+            entry.insert(0, str(value))
+        self.fitProfile.set(settings.profile)
+        self.kkCheck.set(saved.settings.kk or 'off')
+        for param, value in zip((self.Lwire, self.Rcl, self.Qdl, self.Phi, self.Theta),
+                                np.delete(osif.per_area(saved.result.params, settings.area), 1)):
+            param.IE.delete(0, END)
+            param.IE.insert(0, '%.8g' % value)
+        self.ShowFit(job, saved.spectrum, saved.result, osif.telemetry.Timer())
+        print('loaded fit from: ' + path)
+
+    # The model functions live in osif.models; these evaluate the selected model on the chopped data.
+    def funcModel(self, param):
+        # repeated evaluations of the same parameters on the same data come from the engine's model cache
+        return osif.evaluate(self.model_selection.get(), param, self.activeData.spectrum.log_jw)
 
     # Minimizing this function results in fitting the real and complex parts of the impedance at the same time.
     def funcCost(self, params):
-        if self.model_selection.get() == self.eis_model[0]:
-            return np.array(np.sqrt(pow((self.funcreal(params) - self.activeData.zPrime), 2) + pow(
-                (self.funcImg(params) - self.activeData.ZdoublePrime), 2)))
-        elif self.model_selection.get() == self.eis_model[1]:
-            return np.array(np.sqrt(pow((self.funcreal_l(params) - self.activeData.zPrime), 2) + pow(
-                (self.funcImg_l(params) - self.activeData.ZdoublePrime), 2)))
-        elif self.model_selection.get() == self.eis_model[2]:
-            return np.array(np.sqrt(pow((self.funcreal_s(params) - self.activeData.zPrime), 2) + pow(
-                (self.funcImg_s(params) - self.activeData.ZdoublePrime), 2)))
-        else:
-            print("Error in Model Selection")
-
-    '''
-        def funcCost_l(self, params):
-            return np.array(np.sqrt(pow((self.funcreal_l(params) - self.activeData.zPrime), 2) + pow(
-                (self.funcImg_l(params) - self.activeData.ZdoublePrime), 2)))
-
-        def funcCost_s(self, params):
-            return np.array(np.sqrt(pow((self.funcreal_s(params) - self.activeData.zPrime), 2) + pow(
-                (self.funcImg_s(params) - self.activeData.ZdoublePrime), 2)))
-    '''
-
-    # Define the functions of the model (equation 2 from "A Physics-Based Impedance Model of Proton Exchange Membrane Fuel
-    # Cells Exhibiting Low-Frequency Inductive Loops")
+        return osif.funcCost(params, self.model_selection.get(), self.activeData.spectrum)
 
     def funcAbs(self, param):
-        if self.model_selection.get() == self.eis_model[0]:
-            return abs(self.funcreal(param) + 1j * self.funcImg(param))
-        elif self.model_selection.get() == self.eis_model[1]:
-            return abs(self.funcreal_l(param) + 1j * self.funcImg_l(param))
-        elif self.model_selection.get() == self.eis_model[2]:
-            return abs(self.funcreal_s(param) + 1j * self.funcImg_s(param))
-
-        '''def funcAbs_s(self, param):
-            return abs(self.funcreal_s(param) + 1j * self.funcImg_s(param))
-        '''
+        return abs(self.funcModel(param))
 
     def funcPhase(self, param):
-        if self.model_selection.get() == self.eis_model[0]:
-            return 180 / np.pi * np.arctan(self.funcImg(param) / self.funcreal(param))
-        elif self.model_selection.get() == self.eis_model[1]:
-            return 180 / np.pi * np.arctan(self.funcImg_l(param) / self.funcreal_l(param))
-        elif self.model_selection.get() == self.eis_model[2]:
-            return 180 / np.pi * np.arctan(self.funcImg_s(param) / self.funcreal_s(param))
-
-    #Function from Setzler
+        return osif.modulus_and_phase(self.funcModel(param))[1]
+
     def funcreal(self, param):
-        return np.real(param[0] * pow((1j * 2 * np.pi * self.activeData.frequency), param[5]) + param[1] + pow(
-            (param[2] / (param[3] * pow((1j * 2 * np.pi * self.activeData.frequency), param[4]))), 0.5) * self.JPcoth(
-            pow((param[2] * param[3] * pow((1j * 2 * np.pi * self.activeData.frequency), param[4])), 0.5)))
+        return np.real(self.funcModel(param))
 
     def funcImg(self, param):
-        return np.imag(param[0] * pow((1j * 2 * np.pi * self.activeData.frequency), param[5]) + param[1] + pow(
-            (param[2] / (param[3] * pow((1j * 2 * np.pi * self.activeData.frequency), param[4]))), 0.5) * self.JPcoth(
-            pow((param[2] * param[3] * pow((1j * 2 * np.pi * self.activeData.frequency), param[4])), 0.5)))
-
-    # 1-D linear diffusion model
-    def funcreal_l(self, param):
-        return np.real(
-            param[0] * pow((1j * 2 * np.pi * self.activeData.frequency), param[5]) + param[1] + param[2] * pow(
-                (param[2] * (param[3] * pow((1j * 2 * np.pi * self.activeData.frequency), param[4]))),
-                -0.5) * self.JPcoth(
-                pow((param[2] * param[3] * pow((1j * 2 * np.pi * self.activeData.frequency), param[4])), 0.5)))
-
-    def funcImg_l(self, param):
-        return np.imag(
-            param[0] * pow((1j * 2 * np.pi * self.activeData.frequency), param[5]) + param[1] + param[2] * pow(
-                (param[2] * (param[3] * pow((1j * 2 * np.pi * self.activeData.frequency), param[4]))),
-                -0.5) * self.JPcoth(
-                pow((param[2] * param[3] * pow((1j * 2 * np.pi * self.activeData.frequency), param[4])), 0.5)))
-
-    # 1-D spherical diffusion model
-    def funcreal_s(self, param):
-        return np.real(param[0] * pow((1j * 2 * np.pi * self.activeData.frequency), param[5]) + param[1] + param[2] /
-                       (pow(param[2] * param[3] * pow((1j * 2 * np.pi * self.activeData.frequency), param[4]), 0.5) *
-                        self.JPcoth(
-                            pow((param[2] * param[3] * pow((1j * 2 * np.pi * self.activeData.frequency), param[4])),
-                                0.5)) - 1))
-
-    def funcImg_s(self, param):
-        return np.imag(param[0] * pow((1j * 2 * np.pi * self.activeData.frequency), param[5]) + param[1] + param[2] /
-                       (pow(param[2] * param[3] * pow((1j * 2 * np.pi * self.activeData.frequency), param[4]), 0.5) *
-                        self.JPcoth(
-                            pow((param[2] * param[3] * pow((1j * 2 * np.pi * self.activeData.frequency), param[4])),
-                                0.5)) - 1))
-
-        #   pow((-1 + (param[2] * param[3] * pow((1j * 2 * np.pi * self.activeData.frequency), param[4]), 0.5) *
-        #   self.JPcoth( pow((param[2] * param[3] * pow((1j * 2 * np.pi * self.activeData.frequency), param[4])), 0.5))),
-        #   -1))
-
-        # return np.imag(param[0] * pow((1j * 2 * np.pi * self.activeData.frequency), param[5]) + param[1] + param[2] *
-        #    pow((-1 + ((param[2] * param[3] * pow((1j * 2 * np.pi * self.activeData.frequency), param[4]), 0.5)
-        #    *self.JPcoth(pow((param[2] * param[3] * pow((1j * 2 * np.pi * self.activeData.frequency), param[4])), 0.5)))),
-        #    -1))
+        return np.imag(self.funcModel(param))
 
 
 class Param():
@@ -1003,9 +1101,24 @@ class Param():
         self.OE = Entry()
         self.OESD = Entry()
         self.OESDP = Entry()
+        self.OECI = Entry()
         self.AVGRESPER = Entry()
 
 
+@dataclass
+class FitJob:
+    """A queued fit: the file and a snapshot of the settings at the time Fit was pressed."""
+    fileName: str
+    path: str
+    settings: osif.FitSettings
+    loading: float
+    monitor: osif.FitMonitor = field(default_factory=osif.FitMonitor)
+    stage: str = 'fit'
+    bootstrapResult: osif.BootstrapResult = None
+    fitted: osif.Spectrum = None
+    kk: osif.KKResult = None
+
+
 @dataclass
 class Data:
     dataName: str = ''
@@ -1025,6 +1138,48 @@ class Data:
     rawFrequency: list = field(default_factory=list)
     rawPhase: list = field(default_factory=list)
 
+    rawSpectrum: osif.Spectrum = None
+    spectrum: osif.Spectrum = None
+    # bumped whenever the fitting arrays change, so plots can tell new data from a redraw of the same data
+    version: int = 0
+
+    def load(self, spectrum):
+        """Take the raw data arrays from a freshly loaded osif.Spectrum."""
+        self.rawSpectrum = spectrum
+        self.dataName = spectrum.name
+        self.dataNameNoExt = Path(spectrum.name).stem
+        self.rawFrequency = spectrum.frequency
+        self.rawzPrime = spectrum.z_prime
+        self.rawZdoublePrime = spectrum.z_double_prime
+        self.rawzMod = spectrum.z_mod
+        self.rawZExperimentalComplex = spectrum.z_complex
+        self.rawmodZExperimentalComplex = spectrum.mod_z_complex
+        self.rawPhase = spectrum.phase
+
+    def chop(self, lower, upper):
+        """Restrict the fitting arrays to lower < frequency < upper."""
+        self.use(self.rawSpectrum.chop(lower, upper))
+
+    def window(self, settings):
+        """Restrict the fitting arrays to the data a fit with ``settings`` uses (osif.FitSettings.window)."""
+        self.use(settings.window(self.rawSpectrum))
+
+    def use(self, spectrum):
+        """Make ``spectrum`` the fitting data; the same points as before keep the current Spectrum and version."""
+        previous = self.spectrum
+        if previous is not None and all(np.array_equal(getattr(previous, name), getattr(spectrum, name))
+                                        for name in ('frequency', 'z_prime', 'z_double_prime')):
+            spectrum = previous
+        else:
+            self.version += 1
+        self.spectrum = spectrum
+        self.frequency = self.spectrum.frequency
+        self.zPrime = self.spectrum.z_prime
+        self.ZdoublePrime = self.spectrum.z_double_prime
+        self.zMod = self.spectrum.z_mod
+        self.modZExperimentalComplex = self.spectrum.mod_z_complex
+        self.phase = self.spectrum.phase
+
 
 def on_closing():
     if tkMessageBox.askokcancel("Quit", "Do you want to quit?"):
@@ -1033,7 +1188,8 @@ def on_closing():
         os._exit(0)
 
 
-root = Tk()
-app = OSIF(root)
-root.protocol("WM_DELETE_WINDOW", on_closing)
-root.mainloop()
\ No newline at end of file
+if __name__ == '__main__':
+    root = Tk()
+    app = OSIF(root)
+    root.protocol("WM_DELETE_WINDOW", on_closing)
+    root.mainloop()
\ No newline at end of file
@@ -0,0 +1,65 @@
+"""Accuracy and speed of osif.models.coth against the original JPcoth.
+
+Run from the repository root::
+
+    python benchmarks/bench_coth.py
+
+Accuracy is measured against mpmath when it is installed, otherwise against
+numpy's cosh/sinh in long double where that differs from double.
+"""
+
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from osif.models import coth  # noqa: E402
+
+# |x| ranges of interest: the small-|x| limit, the fitted range and the overflow region of JPcoth.
+MAGNITUDES = [1e-8, 1e-4, 1e-1, 1, 10, 100, 400, 1000]
+POINTS = 200
+
+
+def JPcoth(x):
+    """Implementation used up to v2.1."""
+    return (pow(np.e, x) + pow(np.e, -x)) / (pow(np.e, x) - pow(np.e, -x))
+
+
+def reference_coth(x):
+    try:
+        import mpmath
+    except ImportError:
+        xl = x.astype(np.clongdouble)
+        return (np.cosh(xl) / np.sinh(xl)).astype(complex)
+    mpmath.mp.dps = 40
+    return np.array([complex(mpmath.coth(mpmath.mpc(v))) for v in x])
+
+
+def relative_error(value, reference):
+    with np.errstate(invalid='ignore'):
+        err = np.abs(value - reference) / np.abs(reference)
+    return np.where(np.isfinite(value), err, np.inf)
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print('%10s  %22s  %22s  %10s  %10s' % ('|x|', 'JPcoth max rel err', 'coth max rel err', 'JPcoth us', 'coth us'))
+    with np.errstate(all='ignore'):
+        for magnitude in MAGNITUDES:
+            # arguments in the first quadrant, as produced by sqrt(Rcl*Qdl*(j*omega)^phi)
+            x = magnitude * np.exp(0.5j * np.pi * rng.uniform(0, 1, POINTS))
+            reference = reference_coth(x)
+            old_err = relative_error(JPcoth(x), reference)
+            new_err = relative_error(coth(x), reference)
+            old_time = min(timeit.repeat(lambda: JPcoth(x), number=200, repeat=5)) / 200 * 1e6
+            new_time = min(timeit.repeat(lambda: coth(x), number=200, repeat=5)) / 200 * 1e6
+            print('%10g  %22.3e  %22.3e  %10.1f  %10.1f' % (magnitude, old_err.max(), new_err.max(),
+                                                          old_time, new_time))
+    print('\n(%d points per row; inf marks overflow to inf/nan)' % POINTS)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""Speed of model evaluation, single fits and batch fits on synthetic spectra.
+
+Run from the repository root::
+
+    python benchmarks/bench_fit.py            # compare with benchmarks/baselines.json
+    python benchmarks/bench_fit.py --save     # record a new baseline
+
+Spectra are generated by osif.synthetic for all three models over realistic
+parameter ranges, point counts and noise levels.  Each case reports a rate
+(evaluations or fits per second); a case more than ``--tolerance`` slower
+than its baseline is flagged and the script exits with status 1.  Baselines
+are only comparable on the machine that recorded them.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import osif  # noqa: E402
+from osif.batch import FitSettings, fit_spectrum  # noqa: E402
+from osif.models import get_jacobian, get_kernel  # noqa: E402
+from osif.parallel import default_workers  # noqa: E402
+from osif.synthetic import frequencies, synthetic_corpus, write_txt  # noqa: E402
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+
+POINT_COUNTS = [30, 61, 200, 1000]
+NOISE_LEVELS = [0.0, 0.005]
+
+
+def rate(func, min_time=0.2):
+    """Calls of ``func`` per second, timed over at least ``min_time`` seconds (best of 3)."""
+    best = np.inf
+    for _ in range(3):
+        n, start = 0, time.perf_counter()
+        while True:
+            func()
+            n += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time / 3:
+                break
+        best = min(best, elapsed / n)
+    return 1 / best
+
+
+def bench_eval(quick):
+    results = {}
+    corpus = synthetic_corpus(len(osif.EIS_MODELS), seed=1)
+    for n_points in POINT_COUNTS[:2] if quick else POINT_COUNTS:
+        log_jw = osif.log_jw(frequencies(n_points))
+        for model, params, _ in corpus:
+            kernel, jacobian = get_kernel(model), get_jacobian(model)
+            results['eval/%s/%d points' % (model, n_points)] = rate(lambda: kernel(params, log_jw))
+            results['jac/%s/%d points' % (model, n_points)] = rate(lambda: jacobian(params, log_jw))
+    return results
+
+
+def bench_fit(quick):
+    # the same spectra in quick mode, so that the rates stay comparable with the baseline
+    results = {}
+    n_spectra = 6
+    for noise in NOISE_LEVELS:
+        for model in osif.EIS_MODELS:
+            corpus = synthetic_corpus(n_spectra, models=[model], noise=noise, seed=2)
+            settings = FitSettings(model=model)
+            start = time.perf_counter()
+            nfev = [fit_spectrum(spectrum, settings).nfev for _, _, spectrum in corpus]
+            elapsed = time.perf_counter() - start
+            key = 'fit/%s/noise %g' % (model, noise)
+            results[key] = n_spectra / elapsed
+            print('    %-45s mean nfev %.0f' % (key, np.mean(nfev)))
+    return results
+
+
+def bench_batch(quick):
+    results = {}
+    n_files = 12 if quick else 48
+    corpus = synthetic_corpus(n_files, noise=0.005, seed=3)
+    with tempfile.TemporaryDirectory() as directory:
+        paths = [write_txt(spectrum, os.path.join(directory, spectrum.name + '.txt')) for _, _, spectrum in corpus]
+        # one model for the whole batch, as in production runs; the data come from all three
+        settings = FitSettings(model=osif.TRANSMISSION_LINE)
+        for workers in sorted({1, default_workers()}):
+            start = time.perf_counter()
+            rows = osif.fit_files(paths, settings, workers=workers)
+            elapsed = time.perf_counter() - start
+            failed = sum(1 for row in rows if row.get('error'))
+            if failed:
+                print('    %d of %d batch fits failed' % (failed, len(rows)))
+            results['batch/%d workers' % workers] = len(rows) / elapsed
+    return results
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for key, value in results.items():
+        old = baseline.get(key)
+        if old is None:
+            print('%-50s %12.1f /s   (no baseline)' % (key, value))
+            continue
+        ratio = value / old
+        flag = ''
+        if ratio < 1 - tolerance:
+            flag = '  REGRESSION'
+            regressions.append(key)
+        print('%-50s %12.1f /s   %6.2fx baseline%s' % (key, value, ratio, flag))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--save', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--quick', action='store_true', help='fewer point counts and batch files')
+    parser.add_argument('--tolerance', type=float, default=0.3,
+                        help='flag cases slower than (1 - tolerance) times the baseline (default 0.3)')
+    parser.add_argument('--only', choices=['eval', 'fit', 'batch'], action='append',
+                        help='run only these sections')
+    args = parser.parse_args(argv)
+
+    # measure parsing as well: the parse cache would make the batch timings depend on earlier runs
+    os.environ['OSIF_CACHE_DIR'] = ''
+
+    results = {}
+    for name, bench in [('eval', bench_eval), ('fit', bench_fit), ('batch', bench_batch)]:
+        if args.only and name not in args.only:
+            continue
+        print('%s ...' % name)
+        results.update(bench(args.quick))
+
+    baseline = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+    print()
+    regressions = compare(results, baseline, args.tolerance)
+
+    if args.save:
+        with open(BASELINE_FILE, 'w', encoding='utf-8') as f:
+            json.dump({'machine': platform.platform(), 'processor': platform.processor(),
+                       'python': platform.python_version(), 'numpy': np.__version__,
+                       'results': {**baseline, **results}}, f, indent=1, sort_keys=True)
+        print('\nsaved baseline in: ' + BASELINE_FILE)
+        return 0
+    if regressions:
+        print('\n%d case(s) slower than the baseline by more than %d %%' % (len(regressions), args.tolerance * 100))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
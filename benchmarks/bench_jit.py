@@ -0,0 +1,94 @@
+"""Per-evaluation speed of the compiled kernels of osif.jit against the NumPy kernels.
+
+Run from the repository root (needs Numba)::
+
+    python benchmarks/bench_jit.py
+
+For each model and a few typical point counts the script times one model
+evaluation and one residual evaluation (what ``funcCost`` does per optimizer
+step) on both backends, and checks that the two agree to ``--rtol``.  It
+exits with status 1 when they do not.  Compilation happens once, before the
+timings, and is reported separately.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import osif  # noqa: E402
+from osif import jit, models  # noqa: E402
+from osif.synthetic import frequencies, synthetic_corpus  # noqa: E402
+
+from bench_fit import rate  # noqa: E402
+
+POINT_COUNTS = [50, 61, 100]
+
+
+def measure(corpus, n_points):
+    """Rates and the relative difference of the current backend's kernels and residuals."""
+    log_jw = osif.log_jw(frequencies(n_points))
+    results = {}
+    for model, params, _ in corpus:
+        z_data = models.impedance(model, params * 1.01, frequencies(n_points))
+        kernel = models.get_kernel(model)
+
+        def residuals():
+            # an optimizer never asks twice for the same point: keep the model cache out of the timing
+            models.model_cache.clear()
+            return models.residuals(model, params, log_jw, z_data)
+
+        results[model] = (rate(lambda: kernel(params, log_jw)),
+                          rate(residuals),
+                          kernel(params, log_jw),
+                          models.residuals(model, params, log_jw, z_data))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rtol', type=float, default=1e-12,
+                        help='largest relative difference allowed between the backends (default 1e-12)')
+    args = parser.parse_args(argv)
+
+    if not jit.available():
+        print('Numba is not installed; only the NumPy kernels are available')
+        return 0
+    corpus = synthetic_corpus(len(osif.EIS_MODELS), seed=1)
+
+    start = time.perf_counter()
+    jit.enable()
+    for model, params, _ in corpus:
+        models.get_kernel(model)(params, osif.log_jw(frequencies(5)))
+    print('compile (or load from the Numba cache): %.2f s\n' % (time.perf_counter() - start))
+
+    print('%-26s %6s %26s %26s %10s' % ('model', 'points', 'eval /s numpy  jit  gain', 'residual /s numpy  jit  gain',
+                                         'rel diff'))
+    worst = 0.0
+    for n_points in POINT_COUNTS:
+        jit.disable()
+        numpy_results = measure(corpus, n_points)
+        jit.enable()
+        jit_results = measure(corpus, n_points)
+        for model in numpy_results:
+            eval_np, res_np, z_np, r_np = numpy_results[model]
+            eval_jit, res_jit, z_jit, r_jit = jit_results[model]
+            diff = max(np.max(np.abs(z_jit - z_np) / np.abs(z_np)),
+                       np.max(np.abs(r_jit - r_np)) / np.max(np.abs(r_np)))
+            worst = max(worst, diff)
+            print('%-26s %6d %9.0f %9.0f %5.1fx %9.0f %9.0f %5.1fx %10.1e'
+                  % (model, n_points, eval_np, eval_jit, eval_jit / eval_np, res_np, res_jit, res_jit / res_np, diff))
+    jit.disable()
+
+    if worst > args.rtol:
+        print('\nthe backends differ by %.1e, more than --rtol %.0e' % (worst, args.rtol))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
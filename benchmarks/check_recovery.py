@@ -0,0 +1,206 @@
+"""Parameter recovery of the fit path on synthetic spectra with known parameters.
+
+Run from the repository root::
+
+    python benchmarks/check_recovery.py                     # compare with benchmarks/recovery_baseline.json
+    python benchmarks/check_recovery.py --save              # record a new baseline
+    python benchmarks/check_recovery.py --option xtol=1e-8 --option ftol=1e-8
+    python benchmarks/check_recovery.py --profile fast
+
+Every case of a fixed corpus (all three models, several noise levels) is
+fitted as the GUI Fit button does it: chop to the frequency window, the
+default initial values and bounds around Rmem, the options of a fit profile.
+Rmem starts from its true value: the synthetic spectra do not reach the real
+axis inside the window, so the estimate from the data (argmin |Z''|) is tens
+of percent off while the bounds only allow 10 %.  The error of the estimate
+is reported and flagged separately, and ``--estimate-rmem`` fits from the
+estimate as the GUI does.
+
+Each case reports the largest relative parameter error, ``nfev`` and wall
+time.  A case is flagged when its error exceeds ``--error-factor`` times the
+baseline error, or its ``nfev`` exceeds ``--nfev-factor`` times the
+baseline, or its Rmem estimate error exceeds ``--error-factor`` times the
+baseline, so changes such as looser tolerances (``--option``) can be judged
+on data.  The noise-free cases are then fitted again with the
+``--recovery-profile`` (publication by default) and flagged unless every
+parameter is within NOISE_FREE_TOLERANCE of the truth.  The script exits
+with status 1 when a case is flagged.
+"""
+
+import argparse
+import ast
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import osif  # noqa: E402
+from osif import fitting  # noqa: E402
+from osif.batch import FitSettings  # noqa: E402
+from osif.fitting import estimate_rmem, fit, initial_values  # noqa: E402
+from osif.models import PARAM_NAMES, resolve_model  # noqa: E402
+from osif.synthetic import synthetic_corpus  # noqa: E402
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'recovery_baseline.json')
+
+NOISE_LEVELS = [0.0, 0.002, 0.01]
+SPECTRA_PER_CASE = 4
+
+# Errors below this are numerical noise and are never flagged.
+ERROR_FLOOR = 1e-6
+
+# Largest relative parameter error of a noise-free case fitted with the recovery profile.
+NOISE_FREE_TOLERANCE = 5e-3
+
+
+def corpus():
+    """Fixed ``(case name, noise, model, true params, spectrum)`` list."""
+    cases = []
+    for i_noise, noise in enumerate(NOISE_LEVELS):
+        for i_model, model in enumerate(osif.EIS_MODELS):
+            triples = synthetic_corpus(SPECTRA_PER_CASE, models=[model], noise=noise,
+                                       seed=100 * i_noise + i_model)
+            for i, (_, params, spectrum) in enumerate(triples):
+                cases.append(('%s/noise %g/%d' % (model, noise, i), noise, model, params, spectrum))
+    return cases
+
+
+def run_case(model, params, spectrum, profile='default', options=None, estimate=False):
+    """Fit one case; ``options`` override those of ``profile``, and Rmem starts from its true value unless
+    ``estimate`` is True."""
+    start = time.perf_counter()
+    settings = FitSettings(model=model, profile=profile)
+    model = resolve_model(model)
+    series = model.series_resistance
+    try:
+        chopped = settings.window(spectrum)
+        init = initial_values(model, settings.init, settings.area)
+        rmem = estimate_rmem(chopped)
+        init[series] = rmem if estimate else params[series]
+        result = fit(chopped, model, init, profile=profile, options=options)
+    except Exception as exc:
+        return {'error': '%s: %s' % (type(exc).__name__, exc), 'time': time.perf_counter() - start}
+    relative = np.abs(result.params - params) / np.abs(params)
+    return {'max_error': float(relative.max()),
+            'errors': dict(zip(PARAM_NAMES, relative.tolist())),
+            'rmem_estimate_error': abs(rmem - params[series]) / params[series],
+            'nfev': result.nfev,
+            'status': result.status,
+            'time': time.perf_counter() - start}
+
+
+def flags(case, old, error_factor, nfev_factor):
+    if 'error' in case:
+        return [] if old is not None and 'error' in old else ['failed: ' + case['error']]
+    if old is None or 'error' in old:
+        return []
+    found = []
+    if case['max_error'] > max(error_factor * old['max_error'], ERROR_FLOOR):
+        found.append('error %.2e -> %.2e' % (old['max_error'], case['max_error']))
+    if case['nfev'] > nfev_factor * old['nfev']:
+        found.append('nfev %d -> %d' % (old['nfev'], case['nfev']))
+    # Rmem starts from the truth, so a worse estimate_rmem shows only here
+    old_estimate = old.get('rmem_estimate_error')
+    if old_estimate is not None and case['rmem_estimate_error'] > max(error_factor * old_estimate, ERROR_FLOOR):
+        found.append('Rmem estimate error %.2e -> %.2e' % (old_estimate, case['rmem_estimate_error']))
+    return found
+
+
+def parse_option(text):
+    name, _, value = text.partition('=')
+    known = sorted(set().union(*fitting.FIT_PROFILES.values()))
+    if name not in known:
+        raise argparse.ArgumentTypeError('unknown option %r, expected one of %s' % (name, known))
+    try:
+        value = ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        pass
+    return name, value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--save', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--option', type=parse_option, action='append', default=[], metavar='NAME=VALUE',
+                        help='override an entry of the profile options, e.g. xtol=1e-8')
+    parser.add_argument('--profile', choices=list(fitting.FIT_PROFILES), default='default',
+                        help='fit profile to run the corpus with (the baseline uses default)')
+    parser.add_argument('--estimate-rmem', action='store_true',
+                        help='start Rmem from its estimate from the data, as the GUI does, instead of the truth')
+    parser.add_argument('--recovery-profile', choices=list(fitting.FIT_PROFILES), default='publication',
+                        help='fit profile of the noise-free recovery check (default publication)')
+    parser.add_argument('--error-factor', type=float, default=2.0,
+                        help='flag cases whose parameter error grows beyond this factor (default 2)')
+    parser.add_argument('--nfev-factor', type=float, default=1.25,
+                        help='flag cases whose nfev grows beyond this factor (default 1.25)')
+    args = parser.parse_args(argv)
+
+    overrides = dict(args.option)
+    options = dict(fitting.get_profile(args.profile), **overrides)
+    if args.option or args.profile != 'default':
+        print('least squares options: %s' % options)
+
+    baseline = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, encoding='utf-8') as f:
+            baseline = json.load(f)['cases']
+
+    results, flagged = {}, 0
+    print('%-42s %10s %10s %6s %8s' % ('case', 'max error', 'baseline', 'nfev', 'time [s]'))
+    cases = corpus()
+    for name, _, model, params, spectrum in cases:
+        case = results[name] = run_case(model, params, spectrum, args.profile, overrides, args.estimate_rmem)
+        old = baseline.get(name)
+        if 'error' in case:
+            line = '%-42s %s' % (name, case['error'])
+        else:
+            line = '%-42s %10.2e %10s %6d %8.3f' % (name, case['max_error'],
+                                                     '%.2e' % old['max_error'] if old and 'error' not in old else '-',
+                                                     case['nfev'], case['time'])
+        found = flags(case, old, args.error_factor, args.nfev_factor)
+        if found:
+            flagged += 1
+            line += '  FLAGGED: ' + '; '.join(found)
+        print(line)
+
+    done = [case for case in results.values() if 'error' not in case]
+    print('\n%d cases, median max error %.2e, total nfev %d, total time %.2f s'
+          % (len(results), np.median([case['max_error'] for case in done]),
+             sum(case['nfev'] for case in done), sum(case['time'] for case in results.values())))
+    print('median relative error: ' + ', '.join('%s %.2e' % (name, np.median([case['errors'][name] for case in done]))
+                                                 for name in PARAM_NAMES))
+    print('median relative error of the Rmem estimate: %.2e'
+          % np.median([case['rmem_estimate_error'] for case in done]))
+
+    print('\nnoise-free recovery, %s profile, tolerance %g:' % (args.recovery_profile, NOISE_FREE_TOLERANCE))
+    for name, noise, model, params, spectrum in cases:
+        if noise:
+            continue
+        case = run_case(model, params, spectrum, args.recovery_profile, estimate=args.estimate_rmem)
+        if 'error' in case:
+            line = '%-42s %s' % (name, case['error'])
+        else:
+            line = '%-42s %10.2e %6d %8.3f' % (name, case['max_error'], case['nfev'], case['time'])
+        if 'error' in case or case['max_error'] > NOISE_FREE_TOLERANCE:
+            flagged += 1
+            line += '  FLAGGED: not recovered'
+        print(line)
+
+    if args.save:
+        with open(BASELINE_FILE, 'w', encoding='utf-8') as f:
+            json.dump({'least_squares_options': options, 'cases': results}, f, indent=1,
+                      sort_keys=True)
+        print('saved baseline in: ' + BASELINE_FILE)
+        return 0
+    if flagged:
+        print('%d case(s) flagged' % flagged)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,23 @@
+"""Open Source Impedance Fitter (OSIF) fitting engine.
+
+Everything needed to load, model and fit impedance spectra without Tk, so
+the engine can run on display-less machines.  The GUI in ``OSIF 2.0.py`` is a
+client of this package.
+"""
+
+from . import jit
+from .batch import FitSettings, find_data_files, fit_files, summary_table
+from .bootstrap import BootstrapResult, bootstrap_fit
+from .circuits import circuit_model, compile_circuit
+from .fitfile import SavedFit, load_fit, save_fit
+from .fitting import (FIT_PROFILES, FitCancelled, FitMonitor, FitResult, default_bounds, estimate_rmem, fit,
+                      funcCost, per_area, per_cell)
+from .kramers_kronig import KK_MODES, KKResult, kramers_kronig
+from .models import (EIS_MODELS, LINEAR_DIFFUSION, MODELS, PARAM_NAMES, SPHERICAL_DIFFUSION, TRANSMISSION_LINE,
+                     Model, evaluate, get_kernel, impedance, log_jw, modulus_and_phase, register_model,
+                     resolve_model)
+from .multistart import MultiStartResult, multistart_fit
+from .series import SeriesFit, fit_series
+from .spectrum import Spectrum, frequency_window, import_xlsx_file, list_data_files, load_spectra, load_spectrum
+from .store import ResultsStore
+from .watch import DirectoryPoller, watch_folder
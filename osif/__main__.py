@@ -0,0 +1,191 @@
+"""Command line interface: ``python -m osif <command> ...``."""
+
+import argparse
+import csv
+import os
+import sys
+import time
+
+from . import batch, telemetry
+from .bootstrap import BOOTSTRAP_METHODS
+from .series import fit_series, step_row
+from .fitting import DEFAULT_INIT, FIT_PROFILES
+from .kramers_kronig import KK_MODES, KK_THRESHOLD
+from .models import MODELS, PARAM_NAMES, TRANSMISSION_LINE, resolve_model
+from .watch import POLL_INTERVAL, SETTLE_TIME, watch_folder
+
+
+def model_argument(text):
+    """--model: a registered model name or a circuit expression."""
+    try:
+        resolve_model(text)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(str(exc))
+    return text
+
+
+def init_argument(text):
+    """--init NAME=VALUE."""
+    name, _, value = text.partition('=')
+    try:
+        return name, float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError('expected NAME=VALUE, not %r' % text)
+
+
+def add_fit_arguments(parser):
+    """Options shared by every command that fits spectra."""
+    parser.add_argument('--model', type=model_argument, default=TRANSMISSION_LINE,
+                        help='one of %s or a circuit expression such as "R-p(R,Q)-Wo" (see osif.circuits)'
+                             % ', '.join(MODELS))
+    parser.add_argument('--area', type=float, default=50.0, help='cell area [cm^2]')
+    parser.add_argument('--lower', type=float, default=1.0, help='lower frequency bound [Hz]')
+    parser.add_argument('--upper', type=float, default=10000.0, help='upper frequency bound [Hz]')
+    parser.add_argument('--profile', choices=list(FIT_PROFILES), default='default',
+                        help='optimizer settings: fast screening, default or publication')
+    parser.add_argument('--bootstrap', type=int, default=0, metavar='N',
+                        help='add percentile confidence intervals from N resampled refits per spectrum')
+    parser.add_argument('--bootstrap-method', choices=BOOTSTRAP_METHODS, default='residual',
+                        help='resample the residuals or add Gaussian noise of the same size (default: residual)')
+    parser.add_argument('--store', metavar='FILE',
+                        help='append every fit, with its data and model curve, to this SQLite results store')
+    parser.add_argument('--kk', choices=KK_MODES,
+                        help='Kramers-Kronig test of each spectrum before its fit: report the residuals, reject '
+                             'spectra or trim outlier points beyond --kk-threshold')
+    parser.add_argument('--kk-threshold', type=float, default=KK_THRESHOLD, metavar='PERCENT',
+                        help='Kramers-Kronig residual limit in %% of |Z| (default %(default)s)')
+    parser.add_argument('--telemetry', metavar='FILE',
+                        help='append a JSON line with phase timings and optimizer counters per fit')
+    parser.add_argument('--band', type=float, nargs=2, action='append', metavar=('LOWER', 'UPPER'),
+                        help='fit only LOWER < f < UPPER [Hz]; repeat for several bands (replaces --lower/--upper)')
+    parser.add_argument('--starts', type=int, default=1,
+                        help='starting points per spectrum; more than 1 runs a multi-start fit')
+    for name in PARAM_NAMES:
+        if name != 'Rmem':
+            parser.add_argument('--' + name, type=float, default=DEFAULT_INIT[name],
+                                help='initial value (default %(default)s)')
+    parser.add_argument('--init', type=init_argument, action='append', default=[], metavar='NAME=VALUE',
+                        help='initial value of any model parameter, per area, e.g. tau4=0.3 for a circuit')
+
+
+def fit_settings(args):
+    init = dict(DEFAULT_INIT)
+    init.update({name: getattr(args, name) for name in PARAM_NAMES if name != 'Rmem'})
+    init.update(args.init)
+    return batch.FitSettings(model=args.model, area=args.area, lower=args.lower, upper=args.upper, init=init,
+                             starts=args.starts, bands=args.band, profile=args.profile,
+                             bootstrap=args.bootstrap, bootstrap_method=args.bootstrap_method, store=args.store,
+                             kk=args.kk, kk_threshold=args.kk_threshold)
+
+
+def enable_telemetry(args):
+    """Send fit records of this process and of worker processes to ``--telemetry``."""
+    if args.telemetry:
+        os.environ['OSIF_TELEMETRY'] = args.telemetry
+        telemetry.write_to(args.telemetry)
+
+
+def run_batch(args):
+    paths = batch.find_data_files(args.paths)
+    if not paths:
+        print('no data files found', file=sys.stderr)
+        return 1
+    table = batch.summary_table(batch.fit_files(paths, fit_settings(args), workers=args.workers))
+    if args.out:
+        table.to_csv(args.out, index=False)
+        print('saved summary of %d fits in: %s' % (len(table), args.out))
+    else:
+        table.to_csv(sys.stdout, index=False)
+    failed = table['error'].fillna('').astype(bool).sum()
+    if failed:
+        print('%d of %d spectra failed' % (failed, len(table)), file=sys.stderr)
+    return 0
+
+
+def run_series(args):
+    paths = batch.find_data_files(args.paths)
+    if not paths:
+        print('no data files found', file=sys.stderr)
+        return 1
+    settings = fit_settings(args)
+    out = open(args.out, 'w', newline='') if args.out else sys.stdout
+    try:
+        writer = csv.DictWriter(out, fieldnames=batch.summary_columns([settings.model], bool(settings.kk))
+                                + ['warm', 'cold_refit'],
+                                extrasaction='ignore')
+        writer.writeheader()
+        for step in fit_series(paths, settings, jump=args.jump):
+            writer.writerow(step_row(step, settings))
+            out.flush()
+    finally:
+        if args.out:
+            out.close()
+    return 0
+
+
+def run_watch(args):
+    if not os.path.isdir(args.directory):
+        print('not a directory: %s' % args.directory, file=sys.stderr)
+        return 1
+    settings = fit_settings(args)
+    out = open(args.out, 'a' if args.append else 'w', newline='') if args.out else sys.stdout
+    try:
+        writer = csv.DictWriter(out, fieldnames=batch.summary_columns([settings.model], bool(settings.kk)),
+                                extrasaction='ignore')
+        if not args.append:
+            writer.writeheader()
+        print('watching %s (Ctrl-C to stop)' % args.directory, file=sys.stderr)
+        for path, rows in watch_folder(args.directory, settings, workers=args.workers, poll_interval=args.poll,
+                                       settle_time=args.settle, include_existing=args.existing):
+            writer.writerows(rows)
+            out.flush()
+            latency = time.time() - os.path.getmtime(path) if os.path.exists(path) else float('nan')
+            print('fitted %s %.1f s after it was written' % (os.path.basename(path), latency), file=sys.stderr)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.out:
+            out.close()
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m osif', description='Open Source Impedance Fitter')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    batch_parser = commands.add_parser('batch', help='fit every spectrum in directories or glob patterns')
+    batch_parser.add_argument('paths', nargs='+', help='data directories or glob patterns ("data/**/*.txt")')
+    batch_parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per core)')
+    batch_parser.add_argument('-o', '--out', help='CSV file for the summary table (default: stdout)')
+    add_fit_arguments(batch_parser)
+    batch_parser.set_defaults(func=run_batch)
+
+    series_parser = commands.add_parser('series', help='fit a time series of spectra in file name order, '
+                                                       'warm-starting each fit from the previous one')
+    series_parser.add_argument('paths', nargs='+', help='data directories or glob patterns')
+    series_parser.add_argument('--jump', type=float, default=3.0,
+                               help='refit from the cold start when the relative residual grows by this factor')
+    series_parser.add_argument('-o', '--out', help='CSV file, written row by row (default: stdout)')
+    add_fit_arguments(series_parser)
+    series_parser.set_defaults(func=run_series)
+
+    watch_parser = commands.add_parser('watch', help='fit every data file written into a directory, as it arrives')
+    watch_parser.add_argument('directory', help='data directory the potentiostat writes to')
+    watch_parser.add_argument('--existing', action='store_true', help='also fit the files already in the directory')
+    watch_parser.add_argument('--poll', type=float, default=POLL_INTERVAL,
+                              help='seconds between directory listings (default %(default)s)')
+    watch_parser.add_argument('--settle', type=float, default=SETTLE_TIME,
+                              help='seconds a file must stay unchanged before it is read (default %(default)s)')
+    watch_parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per core)')
+    watch_parser.add_argument('-o', '--out', help='CSV file, written row by row (default: stdout)')
+    watch_parser.add_argument('--append', action='store_true', help='append to --out instead of overwriting it')
+    add_fit_arguments(watch_parser)
+    watch_parser.set_defaults(func=run_watch)
+
+    args = parser.parse_args(argv)
+    enable_telemetry(args)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
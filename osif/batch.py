@@ -0,0 +1,275 @@
+"""Fitting many spectra at once on a process pool."""
+
+import glob
+import os
+import time
+from dataclasses import dataclass, field
+
+from . import telemetry
+from .bootstrap import bootstrap_fit
+from .fitting import DEFAULT_INIT, estimate_rmem, fit, initial_values, per_area
+from .kramers_kronig import KK_THRESHOLD, kk_row, kk_screen, kramers_kronig
+from .models import TRANSMISSION_LINE, evaluate, resolve_model
+from .multistart import multistart_fit
+from .parallel import default_workers, process_pool, single_threaded_blas
+from .spectrum import DATA_EXTENSIONS, list_data_files, load_spectra
+from .store import ResultsStore, file_hash, fit_curve, settings_record
+
+
+@dataclass
+class FitSettings:
+    """Everything besides the data that the GUI uses to set up a fit.
+
+    ``model`` is a registered model name or a :class:`osif.models.Model`.
+    ``init`` holds the per-area initial values keyed by parameter name;
+    parameters it lacks start from the model's defaults, and the series
+    resistance (Rmem) is always re-estimated from the data.
+    ``starts`` > 1 runs a multi-start fit within each file's worker.
+    ``bands``, a list of ``(lower, upper)`` pairs, replaces the single
+    frequency window, e.g. to leave out a noisy mid-band.  ``profile`` names
+    the optimizer settings, see :data:`osif.fitting.FIT_PROFILES`.
+    ``bootstrap`` > 0 adds percentile confidence intervals from that many
+    resampled refits (:func:`osif.bootstrap.bootstrap_fit`).  ``store``, the
+    path of a :class:`osif.store.ResultsStore`, receives every fit as it
+    finishes.  ``kk`` runs the Kramers–Kronig test on the window before the
+    fit and adds its residuals to the summary row; ``'reject'`` and
+    ``'trim'`` also reject the spectrum or drop its outlier points at
+    ``kk_threshold`` % of |Z|, see :func:`osif.kramers_kronig.kk_screen`.
+    """
+    model: str = TRANSMISSION_LINE
+    area: float = 50.0
+    lower: float = 1.0
+    upper: float = 10000.0
+    init: dict = field(default_factory=lambda: dict(DEFAULT_INIT))
+    starts: int = 1
+    bands: list = None
+    profile: str = 'default'
+    bootstrap: int = 0
+    bootstrap_method: str = 'residual'
+    store: str = None
+    kk: str = None
+    kk_threshold: float = KK_THRESHOLD
+
+    def window(self, spectrum, screen=True, kk=None):
+        """The part of ``spectrum`` that is fitted: ``bands`` if given, else ``lower < f < upper``.
+
+        Unless ``screen`` is False, the window then goes through the
+        Kramers–Kronig check of ``kk``, which may reject or trim it.  The
+        ``kk`` argument, the :meth:`kk_test` of ``spectrum`` if it has
+        already been run, saves solving the test again.
+        """
+        chopped = spectrum.window(self.bands or [(self.lower, self.upper)])
+        if screen and self.kk in ('reject', 'trim'):
+            chopped = kk_screen(chopped, self.kk, self.kk_threshold, kk)[0]
+        return chopped
+
+    def kk_test(self, spectrum):
+        """KKResult of the (unscreened) window of ``spectrum``."""
+        return kramers_kronig(self.window(spectrum, screen=False))
+
+    def kk_row(self, spectrum):
+        """Summary row entries of the Kramers–Kronig test of the (unscreened) window of ``spectrum``."""
+        return kk_row(self.kk_test(spectrum), self.kk_threshold)
+
+
+def find_data_files(patterns):
+    """Expand directories and glob patterns into a sorted list of data files."""
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths.update(os.path.join(pattern, name) for name in list_data_files(pattern))
+        else:
+            paths.update(path for path in glob.glob(pattern, recursive=True)
+                         if path.endswith(DATA_EXTENSIONS) and os.path.isfile(path))
+    return sorted(paths)
+
+
+def fit_spectrum(spectrum, settings, timer=None, monitor=None):
+    """Chop ``spectrum``, estimate Rmem and fit it the way the GUI Fit button does.
+
+    ``timer`` (a :class:`osif.telemetry.Timer`) receives the ``chop`` and
+    ``rmem`` phase times.  ``monitor`` (a :class:`osif.fitting.FitMonitor`)
+    follows single-start fits.
+    """
+    timer = timer or telemetry.Timer()
+    with timer.phase('chop'):
+        chopped = settings.window(spectrum)
+    return fit_window(chopped, settings, timer, monitor)
+
+
+def fit_window(chopped, settings, timer=None, monitor=None):
+    """Estimate Rmem and fit ``chopped``, the :meth:`FitSettings.window` of a spectrum; see :func:`fit_spectrum`."""
+    timer = timer or telemetry.Timer()
+    model = resolve_model(settings.model)
+    with timer.phase('rmem'):
+        init = initial_values(model, settings.init, settings.area)
+        init[model.series_resistance] = estimate_rmem(chopped)
+    bounds = model.bounds(init[model.series_resistance])
+    if settings.starts > 1:
+        return multistart_fit(chopped, model, init, bounds=bounds, n_starts=settings.starts,
+                              workers=1, profile=settings.profile).best
+    return fit(chopped, model, init, bounds=bounds, monitor=monitor, profile=settings.profile)
+
+
+def result_row(result, settings):
+    """Summary row entries of a FitResult, in the per-area units of the GUI."""
+    row = {}
+    model = resolve_model(result.model)
+    area_params = per_area(result.params, settings.area, model)
+    area_se = per_area(result.standard_error, settings.area, model)
+    for name, value, se in zip(model.param_names, area_params, area_se):
+        row[name] = value
+        row[name + '_se'] = se
+    row.update(L2NormOfRes=result.L2NormOfRes * settings.area, resPercentData=result.resPercentData,
+               nfev=result.nfev, status=result.status, termination=result.termination,
+               tail_improvement=result.tail_improvement, success=result.success, error='')
+    return row
+
+
+def bootstrap_row(boot, settings):
+    """Summary row entries of a BootstrapResult: interval bounds in the per-area units of the GUI."""
+    row = {}
+    model = resolve_model(settings.model)
+    for name, low, high in zip(model.param_names, per_area(boot.lower, settings.area, model),
+                               per_area(boot.upper, settings.area, model)):
+        row[name + '_ci_low'] = low
+        row[name + '_ci_high'] = high
+    return row
+
+
+def error_text(exc):
+    return '%s: %s' % (type(exc).__name__, exc)
+
+
+def store_fit(store, row, settings, chopped=None, result=None, source_hash=None):
+    """Append a summary row to ``store`` with the settings, the source hash and, for a fit, its curve.
+
+    ``chopped`` is the fitted data, i.e. the :meth:`FitSettings.window` of the spectrum.
+    """
+    curve = None
+    if result is not None:
+        curve = fit_curve(chopped, evaluate(result.model, result.params, chopped.log_jw))
+    return store.append(dict(row, **settings_record(settings), file_hash=source_hash), curve)
+
+
+def fit_file(path, settings):
+    """Load and fit every spectrum (sheet) in one file and return their summary rows; never raises."""
+    start = time.perf_counter()
+    timer = telemetry.Timer()
+    model_name = getattr(settings.model, 'name', settings.model)
+    store = ResultsStore(settings.store) if settings.store else None
+    try:
+        return _fit_file(path, settings, store, model_name, start, timer)
+    finally:
+        if store is not None:
+            store.close()
+
+
+def _fit_file(path, settings, store, model_name, start, timer):
+    try:
+        with timer.phase('load'):
+            spectra = load_spectra(path)
+        source_hash = file_hash(path) if store is not None else None
+    except Exception as exc:
+        row = {'file': path, 'sheet': '', 'model': model_name, 'error': error_text(exc),
+               'fit_time': time.perf_counter() - start}
+        if store is not None:
+            store_fit(store, row, settings)
+        return [row]
+    rows = []
+    for spectrum in spectra:
+        row = {'file': path, 'sheet': spectrum.sheet, 'model': model_name}
+        result = kk = chopped = None
+        try:
+            # one Kramers-Kronig solve per spectrum, for the summary row and the screen
+            if settings.kk:
+                with timer.phase('kk'):
+                    kk = settings.kk_test(spectrum)
+                    row.update(kk_row(kk, settings.kk_threshold))
+            with timer.phase('chop'):
+                chopped = settings.window(spectrum, kk=kk)
+            result = fit_window(chopped, settings, timer)
+        except Exception as exc:
+            row['error'] = error_text(exc)
+        else:
+            row.update(result_row(result, settings))
+            if settings.bootstrap:
+                try:
+                    with timer.phase('bootstrap'):
+                        boot = bootstrap_fit(chopped, result, settings.bootstrap,
+                                             method=settings.bootstrap_method, workers=1)
+                except Exception as exc:
+                    row['error'] = 'bootstrap: ' + error_text(exc)
+                else:
+                    row.update(bootstrap_row(boot, settings))
+            if telemetry.enabled():
+                telemetry.emit(telemetry.fit_record(result, timer.timings, file=path, sheet=spectrum.sheet))
+        row['fit_time'] = time.perf_counter() - start
+        if store is not None:
+            store_fit(store, row, settings, chopped, result, source_hash)
+        rows.append(row)
+        start = time.perf_counter()
+        timer = telemetry.Timer()
+    return rows
+
+
+def fit_files(paths, settings=None, workers=None):
+    """Fit every file in ``paths`` and return one summary row per spectrum, in order.
+
+    Parameters
+    ----------
+    paths : list of str
+        Data files, e.g. from :func:`find_data_files`.
+    settings : FitSettings, optional
+        Fit set up shared by all files.
+    workers : int, optional
+        Number of worker processes; defaults to one per core.  ``1`` fits in
+        the calling process.
+
+    Returns
+    -------
+    list of dict
+        Workbooks give one row per sheet.  Spectra that failed have an
+        ``error`` entry and no parameters.
+    """
+    settings = settings or FitSettings()
+    workers = workers or default_workers()
+    if workers == 1 or len(paths) <= 1:
+        return [row for path in paths for row in fit_file(path, settings)]
+    with single_threaded_blas(), process_pool(min(workers, len(paths))) as pool:
+        return [row for rows in pool.map(fit_file, paths, [settings] * len(paths)) for row in rows]
+
+
+def _param_names(model, rows=()):
+    """Parameter names of ``model``, or those in its ``rows`` for a model this process cannot resolve."""
+    try:
+        return resolve_model(model).param_names
+    except ValueError:
+        return [name[:-len('_se')] for row in rows if row.get('model') == model for name in row
+                if name.endswith('_se')]
+
+
+def summary_columns(models=(TRANSMISSION_LINE,), kk=False, rows=()):
+    """Column order of the summary table of fits of ``models``, with the Kramers–Kronig columns if ``kk``.
+
+    ``models`` are registered names, circuit expressions or Models; the
+    parameter names of other models are taken from their summary ``rows``.
+    """
+    columns = ['file', 'sheet', 'model']
+    for model in models:
+        for name in _param_names(model, rows):
+            if name not in columns:
+                columns += [name, name + '_se', name + '_ci_low', name + '_ci_high']
+    columns += ['L2NormOfRes', 'resPercentData', 'nfev', 'status', 'termination', 'tail_improvement', 'success']
+    if kk:
+        columns += ['kk_rms', 'kk_max', 'kk_outliers']
+    return columns + ['fit_time', 'error']
+
+
+def summary_table(rows):
+    """Combine summary rows into a pandas DataFrame with the columns in a fixed order."""
+    import pandas as pd
+
+    models = list(dict.fromkeys(row['model'] for row in rows)) or [TRANSMISSION_LINE]
+    kk = any('kk_rms' in row for row in rows)
+    return pd.DataFrame(rows).reindex(columns=summary_columns(models, kk, rows))
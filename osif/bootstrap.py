@@ -0,0 +1,157 @@
+"""Bootstrap and Monte Carlo confidence intervals of fitted parameters.
+
+The standard errors of :func:`osif.fitting.fit` come from a linear
+approximation at the solution, which breaks down when a parameter sits on a
+bound (phi or theta at 1, Rmem at the edge of its window).  Here the fitted
+spectrum is resampled ``n_samples`` times and every resampled spectrum is
+refitted, warm-started from the original solution; percentiles of the refitted
+parameters give the intervals.
+"""
+
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from .fitting import default_bounds, estimate_rmem, fit
+from .models import impedance
+from .parallel import default_workers, process_pool, single_threaded_blas
+from .spectrum import Spectrum
+
+BOOTSTRAP_METHODS = ('residual', 'montecarlo')
+
+
+@dataclass
+class BootstrapResult:
+    """Outcome of :func:`bootstrap_fit`.
+
+    ``params`` holds the refitted per-cell parameters of every resample that
+    converged, one row each; ``failed`` counts the others.  ``errors`` maps
+    the message of every error a refit raised to the number of refits that
+    raised it.
+    """
+    method: str
+    level: float
+    params: np.ndarray
+    failed: int
+    wall_time: float
+    errors: dict = field(default_factory=dict)
+
+    @property
+    def lower(self):
+        return np.percentile(self.params, 50 * (1 - self.level), axis=0)
+
+    @property
+    def upper(self):
+        return np.percentile(self.params, 50 * (1 + self.level), axis=0)
+
+    @property
+    def std(self):
+        return np.std(self.params, axis=0, ddof=1)
+
+
+def resample(spectrum, model_z, method, rng):
+    """One resampled copy of ``spectrum`` around the fitted impedance ``model_z``.
+
+    The residuals are taken relative to |model_z|, because |Z| spans decades
+    over a spectrum: ``'residual'`` adds the fit's relative complex residuals
+    drawn with replacement, ``'montecarlo'`` Gaussian noise with their
+    standard deviation, both scaled back by |model_z| at each point.
+    """
+    scale = np.abs(model_z)
+    residuals = (spectrum.z_complex - model_z) / scale
+    if method == 'residual':
+        z = model_z + scale * residuals[rng.integers(0, residuals.size, residuals.size)]
+    elif method == 'montecarlo':
+        sigma = np.sqrt(np.mean(np.abs(residuals) ** 2) / 2)
+        z = model_z + sigma * scale * (rng.standard_normal(model_z.shape) + 1j * rng.standard_normal(model_z.shape))
+    else:
+        raise ValueError('method must be one of %s, not %r' % (BOOTSTRAP_METHODS, method))
+    resampled = Spectrum(spectrum.frequency, z.real.copy(), z.imag.copy(), np.abs(z), name=spectrum.name,
+                         source=spectrum.source, sheet=spectrum.sheet)
+    resampled.__dict__['log_jw'] = spectrum.log_jw
+    return resampled
+
+
+def _refit_chunk(spectrum, model, params, bounds, profile, method, seeds):
+    """Refit one resample per seed; rows of NaN mark refits that failed, and the Counter of their errors."""
+    model_z = impedance(model, params, spectrum.frequency)
+    refitted = np.full((len(seeds), len(params)), np.nan)
+    errors = Counter()
+    for i, seed in enumerate(seeds):
+        try:
+            result = fit(resample(spectrum, model_z, method, np.random.default_rng(seed)), model, params,
+                         bounds=bounds, profile=profile)
+        except Exception as exc:
+            errors['%s: %s' % (type(exc).__name__, exc)] += 1
+            continue
+        if result.success:
+            refitted[i] = result.params
+    return refitted, errors
+
+
+def bootstrap_fit(spectrum, result, n_samples=200, method='residual', bounds=None, level=0.95, workers=None,
+                  seed=None, profile=None):
+    """Percentile confidence intervals of ``result`` from refits of resampled spectra.
+
+    Parameters
+    ----------
+    spectrum : Spectrum
+        The (chopped) spectrum ``result`` was fitted to.
+    result : FitResult
+        The fit whose parameters start every refit.
+    n_samples : int
+        Number of resampled spectra.
+    method : {'residual', 'montecarlo'}
+        See :func:`resample`.
+    bounds : tuple, optional
+        Bounds of the refits; defaults to the bounds of the original fit, or
+        the model's bounds around the Rmem estimate of ``spectrum`` for
+        results that do not carry them.
+    level : float
+        Coverage of the intervals.
+    workers : int, optional
+        Worker processes; defaults to one per core.  ``1`` refits in the
+        calling process.
+    seed : int, optional
+        Makes the resamples reproducible, independently of ``workers``.
+    profile : str, optional
+        Fit profile of the refits; defaults to that of ``result``.
+
+    Returns
+    -------
+    BootstrapResult
+    """
+    start_time = time.perf_counter()
+    if method not in BOOTSTRAP_METHODS:
+        raise ValueError('method must be one of %s, not %r' % (BOOTSTRAP_METHODS, method))
+    if bounds is None:
+        bounds = result.bounds
+    if bounds is None:
+        bounds = default_bounds(estimate_rmem(spectrum), result.model)
+    profile = profile or result.profile
+    params = np.clip(result.params, bounds[0], bounds[1])
+    seeds = np.random.SeedSequence(seed).spawn(n_samples)
+    workers = min(workers or default_workers(), n_samples)
+
+    if workers == 1:
+        outcomes = [_refit_chunk(spectrum, result.model, params, bounds, profile, method, seeds)]
+    else:
+        # one chunk per worker keeps the pickling of the spectrum and the process start-up to a minimum
+        chunks = [seeds[i::workers] for i in range(workers)]
+        with single_threaded_blas(), process_pool(workers) as pool:
+            outcomes = list(pool.map(_refit_chunk, *zip(*[(spectrum, result.model, params, bounds, profile, method,
+                                                           chunk) for chunk in chunks])))
+    refitted = np.vstack([chunk for chunk, _ in outcomes])
+    errors = sum((chunk_errors for _, chunk_errors in outcomes), Counter())
+    converged = np.all(np.isfinite(refitted), axis=1)
+    if not converged.any():
+        raise RuntimeError('none of the %d bootstrap refits converged%s'
+                           % (n_samples, ''.join('; %d x %s' % (count, error) for error, count in errors.items())))
+    return BootstrapResult(method=method,
+                           level=level,
+                           params=refitted[converged],
+                           failed=int(n_samples - converged.sum()),
+                           wall_time=time.perf_counter() - start_time,
+                           errors=dict(errors))
@@ -0,0 +1,122 @@
+"""Persistent cache of parsed spectra.
+
+Parsing an ``.xlsx`` file through openpyxl costs far more than fitting it,
+so the four data columns of every sheet of a loaded file are kept as an
+``.npz`` file under the cache directory.  Entries are keyed by the absolute path, size and
+modification time of the source file, so an edited or replaced file is
+parsed again automatically; its new entry replaces the old one, so the cache
+holds one entry per file.  The GUI and batch runs share the cache.
+
+The directory is ``$OSIF_CACHE_DIR`` if set, else ``$XDG_CACHE_HOME/osif``
+or ``~/.cache/osif``.  Set ``OSIF_CACHE_DIR`` to an empty string to disable
+caching.
+"""
+
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+# Bump when parsing changes so that entries written by older versions are not reused.
+CACHE_VERSION = 3
+
+COLUMNS = ('frequency', 'z_prime', 'z_double_prime', 'z_mod')
+
+
+def cache_dir():
+    """The cache directory, or None when caching is disabled."""
+    directory = os.environ.get('OSIF_CACHE_DIR')
+    if directory is not None:
+        return directory or None
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'osif')
+
+
+def _sha1(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def cache_key(path):
+    """Key of ``path`` in its current state: ``<hash of absolute path>-<hash of version, size and mtime>``."""
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    return '%s-%s' % (_sha1(path), _sha1('%d\0%d\0%d' % (CACHE_VERSION, stat.st_size, stat.st_mtime_ns)))
+
+
+def _entry(path, key=None):
+    directory = cache_dir()
+    if directory is None:
+        return None
+    return os.path.join(directory, (key or cache_key(path)) + '.npz')
+
+
+def read(path, key=None):
+    """Cached sheets of ``path`` as a list of ``(sheet_name, columns)``, or None on a miss.
+
+    ``key`` is the :func:`cache_key` of ``path`` if the caller has taken it already.
+    """
+    try:
+        entry = _entry(path, key)
+        if entry is None or not os.path.exists(entry):
+            return None
+        with np.load(entry) as data:
+            return [(str(sheet), tuple(data['%s_%d' % (name, i)] for name in COLUMNS))
+                    for i, sheet in enumerate(data['sheets'])]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def write(path, sheets, key=None):
+    """Store the parsed ``(sheet_name, columns)`` of ``path``; failures only cost the cache.
+
+    ``key`` is the :func:`cache_key` of ``path`` taken before it was parsed.
+    Nothing is stored when the file has changed since, because ``sheets``
+    may then hold the old contents.
+    """
+    try:
+        entry = _entry(path, key)
+        if entry is None or (key is not None and cache_key(path) != key):
+            return
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        # write then rename, so concurrent workers never see a partial entry
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(entry), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                arrays = {'sheets': np.array([sheet for sheet, _ in sheets], dtype=str)}
+                for i, (_, columns) in enumerate(sheets):
+                    arrays.update(('%s_%d' % (name, i), column) for name, column in zip(COLUMNS, columns))
+                np.savez(f, **arrays)
+            os.replace(tmp, entry)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        _prune(entry)
+    except OSError:
+        pass
+
+
+def _prune(entry):
+    """Remove the entries of earlier versions of the file of ``entry`` and those of older cache layouts."""
+    directory, name = os.path.split(entry)
+    prefix = name.split('-')[0] + '-'
+    for other in os.listdir(directory):
+        if other.endswith('.npz') and other != name and (other.startswith(prefix) or '-' not in other):
+            try:
+                os.unlink(os.path.join(directory, other))
+            except FileNotFoundError:
+                # another worker pruned it first
+                pass
+
+
+def clear():
+    """Remove every cache entry and return how many were removed."""
+    directory = cache_dir()
+    if directory is None or not os.path.isdir(directory):
+        return 0
+    removed = 0
+    for name in os.listdir(directory):
+        if name.endswith('.npz'):
+            os.unlink(os.path.join(directory, name))
+            removed += 1
+    return removed
@@ -0,0 +1,443 @@
+"""Equivalent circuits written as expressions, compiled to model kernels.
+
+A circuit is a string of elements joined in series by ``-``; ``p(A, B, ...)``
+puts its arguments in parallel.  Each element may name its parameters in
+parentheses, and a number instead of a name fixes that parameter::
+
+    L(Lwire,theta)-R(Rmem)-TLM(Rcl,Qdl,phi)     the Transmission Line model
+    R-p(R,Q)-Wo                                 Randles with a finite Warburg element
+    L(Lwire,1)-R(Rmem)-G(Rg,tau)                ideal inductor, Gerischer element
+
+Elements (``s`` = j*omega):
+
+=======  =================  ===============================================
+R        R                  R
+C        C                  1 / (C s)
+L        L, theta           L s^theta
+Q        Q, phi             1 / (Q s^phi), a constant phase element
+W        Aw                 Aw / sqrt(s), semi-infinite Warburg
+Wo       Rw, tau            Rw coth(x) / x, x = sqrt(tau s), finite reflective Warburg
+Ws       Rw, tau            Rw tanh(x) / x, finite transmissive Warburg
+G        Rg, tau            Rg / sqrt(1 + tau s), Gerischer
+TLM      Rcl, Qdl, phi      Rcl coth(x) / x, x = sqrt(Rcl Qdl s^phi)
+SPH      Rcl, Qdl, phi      Rcl / (x coth(x) - 1), 1-D spherical diffusion
+=======  =================  ===============================================
+
+Unnamed parameters are called after the element and its position, e.g.
+``R1``; a name used twice is one shared parameter.  Parameters are ordered
+by first appearance.
+
+:func:`compile_circuit` turns an expression into straight-line NumPy code for
+the impedance and for its Jacobian (forward-mode derivatives combined
+through the series and parallel connections), compiled once and cached by
+expression.  :func:`circuit_model` wraps it in a :class:`osif.models.Model`;
+:func:`osif.models.resolve_model` accepts circuit expressions wherever a
+model name is expected.
+"""
+
+import functools
+import re
+from dataclasses import dataclass
+
+import numpy as np
+
+from .models import DEFAULT_INIT, Model, coth_and_csch2, xcoth_minus_1
+
+# Units (per area), whether per_cell divides by the area, whether multi-start fits sample log-uniformly, the
+# default initial value and the bounds of each kind of parameter.
+PARAM_KINDS = {
+    'resistance': ('ohm*cm^2', True, True, 0.1, (0, np.inf)),
+    'inductance': ('H*cm^2', True, True, 2e-5, (0, 1)),
+    'capacitance': ('F/cm^2', False, True, 1e-3, (0, np.inf)),
+    'cpe': ('F/(cm^2*sec^phi)', False, True, 2.5, (0, np.inf)),
+    'exponent': ('', False, False, 0.95, (0, 1)),
+    'warburg': ('ohm*cm^2*sec^-0.5', True, True, 0.1, (0, np.inf)),
+    'time': ('sec', False, True, 1e-2, (0, np.inf)),
+}
+
+# Window around the estimated series resistance, as for the built-in models.
+SERIES_RESISTANCE_WINDOW = (0.9, 1.1)
+
+
+# Element impedances z(log_jw, *p) and, with grad=True, (z, (dz/dp, ...)).  Derivatives may be scalars.
+def _resistor(log_jw, R, grad=False):
+    z = R + 0j
+    return (z, (1.0,)) if grad else z
+
+
+def _capacitor(log_jw, C, grad=False):
+    z = np.exp(-log_jw) / C
+    return (z, (-z / C,)) if grad else z
+
+
+def _inductor(log_jw, L, theta, grad=False):
+    s_theta = np.exp(theta * log_jw)
+    z = L * s_theta
+    return (z, (s_theta, z * log_jw)) if grad else z
+
+
+def _cpe(log_jw, Q, phi, grad=False):
+    z = np.exp(-phi * log_jw) / Q
+    return (z, (-z / Q, -z * log_jw)) if grad else z
+
+
+def _warburg(log_jw, Aw, grad=False):
+    s_half = np.exp(-0.5 * log_jw)
+    z = Aw * s_half
+    return (z, (s_half,)) if grad else z
+
+
+def _coth_over_x(x):
+    c, dc = coth_and_csch2(x)
+    return c / x, (dc * x - c) / (x * x)
+
+
+def _tanh_over_x(x):
+    c, dc = coth_and_csch2(x)
+    xc = x * c
+    return 1 / xc, -(c + x * dc) / (xc * xc)
+
+
+def _spherical(x):
+    g, dg = xcoth_minus_1(x)
+    return 1 / g, -dg / (g * g)
+
+
+def _finite_warburg(F_and_dF):
+    def element(log_jw, Rw, tau, grad=False):
+        x = np.sqrt(tau + 0j) * np.exp(0.5 * log_jw)
+        F, dF = F_and_dF(x)
+        z = Rw * F
+        return (z, (F, Rw * dF * x / (2 * tau))) if grad else z
+    return element
+
+
+def _gerischer(log_jw, Rg, tau, grad=False):
+    u = 1 + tau * np.exp(log_jw)
+    root = np.sqrt(u)
+    z = Rg / root
+    return (z, (1 / root, -0.5 * z * np.exp(log_jw) / u)) if grad else z
+
+
+def _diffusion(F_and_dF):
+    # as the Jacobians in osif.models, with dx/dRcl = x/(2*Rcl), dx/dQdl = x/(2*Qdl), dx/dphi = x*ln(s)/2
+    def element(log_jw, Rcl, Qdl, phi, grad=False):
+        x = np.sqrt(Rcl * Qdl + 0j) * np.exp(0.5 * phi * log_jw)
+        F, dF = F_and_dF(x)
+        z = Rcl * F
+        if not grad:
+            return z
+        half_x_dF = 0.5 * x * dF
+        return z, (F + half_x_dF, Rcl * half_x_dF / Qdl, Rcl * half_x_dF * log_jw)
+    return element
+
+
+@dataclass(frozen=True)
+class Element:
+    """A circuit element: its function and ``(default name, kind)`` of each parameter."""
+    function: object
+    params: tuple
+
+
+ELEMENTS = {
+    'R': Element(_resistor, (('R', 'resistance'),)),
+    'C': Element(_capacitor, (('C', 'capacitance'),)),
+    'L': Element(_inductor, (('L', 'inductance'), ('theta', 'exponent'))),
+    'Q': Element(_cpe, (('Q', 'cpe'), ('phi', 'exponent'))),
+    'W': Element(_warburg, (('Aw', 'warburg'),)),
+    'Wo': Element(_finite_warburg(_coth_over_x), (('Rw', 'resistance'), ('tau', 'time'))),
+    'Ws': Element(_finite_warburg(_tanh_over_x), (('Rw', 'resistance'), ('tau', 'time'))),
+    'G': Element(_gerischer, (('Rg', 'resistance'), ('tau', 'time'))),
+    'TLM': Element(_diffusion(_coth_over_x), (('Rcl', 'resistance'), ('Qdl', 'cpe'), ('phi', 'exponent'))),
+    'SPH': Element(_diffusion(_spherical), (('Rcl', 'resistance'), ('Qdl', 'cpe'), ('phi', 'exponent'))),
+}
+
+PARALLEL = 'p'
+
+_TOKEN = re.compile(r'\s*(?:(\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)|(\w+)|(.))', re.UNICODE)
+
+
+def _tokens(expression):
+    tokens = []
+    for number, name, symbol in _TOKEN.findall(expression):
+        if number:
+            tokens.append(('number', float(number)))
+        elif name:
+            tokens.append(('name', name))
+        elif symbol.strip():
+            if symbol not in '-(),':
+                raise ValueError('unexpected %r in circuit %r' % (symbol, expression))
+            tokens.append((symbol, symbol))
+    return tokens
+
+
+class _Parser:
+    """Recursive descent parser of circuit expressions into nested tuples.
+
+    Leaves are ``('element', type, args)`` where args are names, numbers or
+    None (unnamed); connections are ``('series', children)`` and
+    ``('parallel', children)``.
+    """
+
+    def __init__(self, expression):
+        self.expression = expression
+        self.tokens = _tokens(expression)
+        self.position = 0
+
+    def error(self, message):
+        return ValueError('%s in circuit %r' % (message, self.expression))
+
+    def peek(self):
+        return self.tokens[self.position][0] if self.position < len(self.tokens) else None
+
+    def take(self, kind):
+        if self.peek() != kind:
+            found = self.tokens[self.position][1] if self.position < len(self.tokens) else 'the end'
+            raise self.error('expected %s, found %r' % (kind, found))
+        self.position += 1
+        return self.tokens[self.position - 1][1]
+
+    def parse(self):
+        if not self.tokens:
+            raise self.error('no elements')
+        tree = self.series()
+        if self.position != len(self.tokens):
+            raise self.error('unexpected %r' % (self.tokens[self.position][1],))
+        return tree
+
+    def series(self):
+        children = [self.term()]
+        while self.peek() == '-':
+            self.take('-')
+            children.append(self.term())
+        return children[0] if len(children) == 1 else ('series', children)
+
+    def arguments(self, parse_argument):
+        self.take('(')
+        arguments = [parse_argument()]
+        while self.peek() == ',':
+            self.take(',')
+            arguments.append(parse_argument())
+        self.take(')')
+        return arguments
+
+    def argument(self):
+        if self.peek() == 'number':
+            return self.take('number')
+        return self.take('name')
+
+    def term(self):
+        name = self.take('name')
+        if name == PARALLEL:
+            children = self.arguments(self.series)
+            if len(children) < 2:
+                raise self.error('p() needs at least two branches')
+            return ('parallel', children)
+        if name not in ELEMENTS:
+            raise self.error('unknown element %r, expected one of %s or p(...)' % (name, list(ELEMENTS)))
+        n_params = len(ELEMENTS[name].params)
+        args = [None] * n_params
+        if self.peek() == '(':
+            args = self.arguments(self.argument)
+            if len(args) != n_params:
+                raise self.error('%s takes %d parameters (%s), got %d'
+                                 % (name, n_params, ', '.join(p for p, _ in ELEMENTS[name].params), len(args)))
+        return ('element', name, args)
+
+
+@dataclass(frozen=True)
+class Circuit:
+    """A compiled circuit expression.
+
+    ``kernel(param, log_jw)`` and ``jacobian(param, log_jw)`` follow the
+    conventions of :mod:`osif.models`; ``source`` is the generated code.
+    ``series_resistance`` is the index of the first resistor connected
+    directly in series, or None.
+    """
+    expression: str
+    param_names: tuple
+    kinds: tuple
+    series_resistance: object
+    kernel: object
+    jacobian: object
+    source: str
+
+
+class _CodeGenerator:
+    def __init__(self):
+        self.names = []
+        self.kinds = []
+        self.kernel_lines = []
+        self.jacobian_lines = []
+        self.n_vars = 0
+        self.n_elements = 0
+        self.frequency_dependent = False
+        # parameter indices (None for fixed values) of each element, by id() of its tree node
+        self.element_params = {}
+
+    def var(self):
+        self.n_vars += 1
+        return 'v%d' % self.n_vars
+
+    def param(self, name, kind, expression):
+        if name in self.names:
+            index = self.names.index(name)
+            if self.kinds[index] != kind:
+                raise ValueError('parameter %r is used as both %s and %s in circuit %r'
+                                 % (name, self.kinds[index], kind, expression))
+            return index
+        self.names.append(name)
+        self.kinds.append(kind)
+        return len(self.names) - 1
+
+    def emit(self, line, jacobian_line=None):
+        self.kernel_lines.append(line)
+        self.jacobian_lines.append(line if jacobian_line is None else jacobian_line)
+
+    def node(self, tree, expression):
+        """Emit the code of ``tree``; returns the variable of its impedance and ``{param index: variable}``."""
+        if tree[0] == 'element':
+            _, element_type, args = tree
+            self.n_elements += 1
+            element = ELEMENTS[element_type]
+            if element_type != 'R':
+                self.frequency_dependent = True
+            call_args, params = [], []
+            for (default_name, kind), arg in zip(element.params, args):
+                if isinstance(arg, float):
+                    call_args.append(repr(arg))
+                    params.append(None)
+                else:
+                    index = self.param(arg or '%s%d' % (default_name, self.n_elements), kind, expression)
+                    call_args.append('param[%d]' % index)
+                    params.append(index)
+            self.element_params[id(tree)] = params
+            z, d = self.var(), self.var()
+            self.kernel_lines.append('%s = _%s(log_jw, %s)' % (z, element_type, ', '.join(call_args)))
+            self.jacobian_lines.append('%s, %s = _%s(log_jw, %s, True)' % (z, d, element_type, ', '.join(call_args)))
+            derivatives = {}
+            for i, index in enumerate(params):
+                if index is not None:
+                    derivatives = self.add(derivatives, {index: '%s[%d]' % (d, i)})
+            return z, derivatives
+
+        _, children = tree
+        results = [self.node(child, expression) for child in children]
+        z = self.var()
+        if tree[0] == 'series':
+            self.emit('%s = %s' % (z, ' + '.join(child_z for child_z, _ in results)))
+            derivatives = {}
+            for _, child_derivatives in results:
+                derivatives = self.add(derivatives, child_derivatives)
+            return z, derivatives
+
+        # parallel: Z = 1 / sum(1 / Z_i), so dZ/dp = Z^2 * sum(dZ_i/dp / Z_i^2)
+        self.emit('%s = 1 / (%s)' % (z, ' + '.join('1 / %s' % child_z for child_z, _ in results)))
+        z2 = self.var()
+        self.jacobian_lines.append('%s = %s * %s' % (z2, z, z))
+        derivatives = {}
+        for index in sorted(set().union(*(child_derivatives for _, child_derivatives in results))):
+            terms = ['%s / (%s * %s)' % (child_derivatives[index], child_z, child_z)
+                     for child_z, child_derivatives in results if index in child_derivatives]
+            d = self.var()
+            self.jacobian_lines.append('%s = %s * (%s)' % (d, z2, ' + '.join(terms)))
+            derivatives[index] = d
+        return z, derivatives
+
+    def add(self, derivatives, more):
+        """Sum of two ``{param index: variable}`` derivative maps, emitting the additions of shared parameters."""
+        derivatives = dict(derivatives)
+        for index, d in more.items():
+            if index in derivatives:
+                total = self.var()
+                self.jacobian_lines.append('%s = %s + %s' % (total, derivatives[index], d))
+                derivatives[index] = total
+            else:
+                derivatives[index] = d
+        return derivatives
+
+
+def normalize(expression):
+    """``expression`` without whitespace, the key under which it is compiled and named."""
+    return re.sub(r'\s+', '', expression)
+
+
+@functools.lru_cache(maxsize=None)
+def _compile(expression):
+    tree = _Parser(expression).parse()
+    generator = _CodeGenerator()
+    z, derivatives = generator.node(tree, expression)
+    if not generator.names:
+        raise ValueError('circuit %r has no free parameters' % expression)
+
+    # an all-resistor circuit gives a scalar; the models return one value per frequency
+    result = z if generator.frequency_dependent else '%s + np.zeros(log_jw.shape, dtype=complex)' % z
+    kernel_source = '\n'.join(['def kernel(param, log_jw):']
+                              + ['    ' + line for line in generator.kernel_lines]
+                              + ['    return %s' % result])
+    jacobian_source = '\n'.join(['def jacobian(param, log_jw):']
+                                + ['    ' + line for line in generator.jacobian_lines]
+                                + ['    jac = np.empty((log_jw.shape[0], %d), dtype=complex)' % len(generator.names)]
+                                + ['    jac[:, %d] = %s' % (index, d) for index, d in sorted(derivatives.items())]
+                                + ['    return jac'])
+    source = kernel_source + '\n\n\n' + jacobian_source + '\n'
+    namespace = {'np': np}
+    namespace.update(('_' + name, element.function) for name, element in ELEMENTS.items())
+    exec(compile(source, '<circuit %s>' % expression, 'exec'), namespace)
+
+    series = tree[1] if tree[0] == 'series' else [tree]
+    series_resistance = next((generator.element_params[id(child)][0] for child in series
+                              if child[0] == 'element' and child[1] == 'R'
+                              and generator.element_params[id(child)][0] is not None), None)
+    return Circuit(expression=expression,
+                   param_names=tuple(generator.names),
+                   kinds=tuple(generator.kinds),
+                   series_resistance=series_resistance,
+                   kernel=namespace['kernel'],
+                   jacobian=namespace['jacobian'],
+                   source=source)
+
+
+def compile_circuit(expression):
+    """Compile a circuit expression (see the module docstring) into a cached :class:`Circuit`."""
+    return _compile(normalize(expression))
+
+
+def _circuit_bounds(lower, upper, series_resistance, rmem):
+    lower, upper = list(lower), list(upper)
+    lower[series_resistance] = SERIES_RESISTANCE_WINDOW[0] * rmem
+    upper[series_resistance] = SERIES_RESISTANCE_WINDOW[1] * rmem
+    return tuple(lower), tuple(upper)
+
+
+@functools.lru_cache(maxsize=None)
+def _circuit_model(expression, name):
+    circuit = _compile(expression)
+    if circuit.series_resistance is None:
+        raise ValueError('circuit %r needs a resistor in series (R at the top level), whose value is '
+                         'estimated from the data' % expression)
+    kinds = [PARAM_KINDS[kind] for kind in circuit.kinds]
+    return Model(name=name or expression,
+                 kernel=circuit.kernel,
+                 jacobian=circuit.jacobian,
+                 param_names=circuit.param_names,
+                 units=tuple(kind[0] for kind in kinds),
+                 default_init={param: DEFAULT_INIT.get(param, kind[3]) for param, kind in zip(circuit.param_names, kinds)},
+                 area_scaled=tuple(i for i, kind in enumerate(kinds) if kind[1]),
+                 log_sampled=tuple(i for i, kind in enumerate(kinds) if kind[2]),
+                 series_resistance=circuit.series_resistance,
+                 bounds=functools.partial(_circuit_bounds, tuple(kind[4][0] for kind in kinds),
+                                          tuple(kind[4][1] for kind in kinds), circuit.series_resistance),
+                 info='Equivalent circuit %s.' % expression,
+                 expression=expression)
+
+
+def circuit_model(expression, name=None):
+    """:class:`osif.models.Model` of a circuit expression, named after the expression unless ``name`` is given.
+
+    Units, default initial values, area scaling and bounds follow from the
+    kind of each parameter (:data:`PARAM_KINDS`); parameters named as in
+    :data:`osif.models.DEFAULT_INIT` start from those values.  The first
+    resistor in series is estimated from the data like Rmem.
+    """
+    return _circuit_model(normalize(expression), name)
@@ -0,0 +1,159 @@
+"""Fit files: a finished fit saved so that it can be loaded back without refitting.
+
+A fit file is an ``.npz`` archive.  Its arrays are the fitted (windowed)
+data, the initial values, bounds, fitted parameters, standard errors,
+covariance matrix, residuals and Jacobian of the fit; its ``metadata`` entry
+is a JSON document with the model name, the :class:`osif.batch.FitSettings`
+of the fit, the optimizer outcome (status, message, evaluations, cost,
+timings, profile) and the SHA-256 checksums of the fitted data and of the
+source file.  Everything is stored at full float64 precision.
+
+:func:`load_fit` returns a :class:`SavedFit`, which re-plots and
+re-simulates from the stored arrays and warm-starts a refit from the saved
+parameters::
+
+    save_fit('cell1_fit.npz', result, chopped, settings)
+    saved = load_fit('cell1_fit.npz')
+    z = saved.impedance(np.logspace(-1, 5, 200))
+    result = saved.refit(profile='publication')
+
+Models are stored by name, so a model registered by a script has to be
+registered again before its fits are loaded; circuit expressions are
+compiled again on load.
+"""
+
+import dataclasses
+import hashlib
+import json
+import os
+import tempfile
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from .batch import FitSettings
+from .fitting import FitResult, fit
+from .models import impedance, resolve_model
+from .spectrum import Spectrum
+
+# Bump when the layout changes; load_fit refuses files written by a newer version.
+FIT_FILE_VERSION = 1
+
+_DATA_ARRAYS = ('frequency', 'z_prime', 'z_double_prime', 'z_mod')
+_RESULT_ARRAYS = ('params', 'standard_error', 'covariance', 'init', 'residuals', 'jac')
+_RESULT_FIELDS = ('model', 'L2NormOfRes', 'resPercentData', 'cost', 'nfev', 'njev', 'status', 'message', 'success',
+                  'timings', 'profile', 'tail_improvement')
+
+
+def data_checksum(spectrum):
+    """SHA-256 of the frequency and impedance arrays of ``spectrum`` as float64."""
+    digest = hashlib.sha256()
+    for name in ('frequency', 'z_prime', 'z_double_prime'):
+        digest.update(np.ascontiguousarray(getattr(spectrum, name), dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def _settings_dict(settings):
+    record = dataclasses.asdict(settings)
+    record['model'] = getattr(settings.model, 'name', settings.model)
+    return record
+
+
+@dataclass
+class SavedFit:
+    """A fit loaded from a fit file.
+
+    ``spectrum`` is the fitted data, i.e. already windowed by ``settings``.
+    ``extra`` holds whatever the writer added, e.g. the catalyst loading of
+    the GUI.
+    """
+    result: FitResult
+    spectrum: Spectrum
+    settings: FitSettings
+    data_checksum: str
+    source_hash: str = ''
+    created: float = 0.0
+    extra: dict = field(default_factory=dict)
+
+    @property
+    def model(self):
+        return resolve_model(self.result.model)
+
+    def impedance(self, frequency=None):
+        """Model impedance at the saved parameters, at the fitted frequencies unless ``frequency`` is given."""
+        return impedance(self.model, self.result.params,
+                         self.spectrum.frequency if frequency is None else frequency)
+
+    def matches(self, spectrum):
+        """True if the window of ``spectrum`` is exactly the data this fit was made on."""
+        return data_checksum(self.settings.window(spectrum)) == self.data_checksum
+
+    def refit(self, spectrum=None, profile=None, monitor=None):
+        """Fit again, starting from the saved parameters with the saved bounds.
+
+        ``spectrum`` defaults to the saved data; a new (raw) spectrum is
+        windowed with the saved settings first.  ``profile`` defaults to the
+        profile of the saved fit.
+        """
+        data = self.spectrum if spectrum is None else self.settings.window(spectrum)
+        bounds = self.result.bounds
+        init = self.result.params if bounds is None else np.clip(self.result.params, bounds[0], bounds[1])
+        return fit(data, self.model, init, bounds=bounds, monitor=monitor, profile=profile or self.result.profile)
+
+
+def save_fit(path, result, spectrum, settings=None, source_hash='', **extra):
+    """Write ``result``, the fit of the (windowed) ``spectrum``, to the fit file ``path``.
+
+    ``settings`` is the :class:`osif.batch.FitSettings` of the fit,
+    ``source_hash`` the :func:`osif.store.file_hash` of the file the data
+    came from, and ``extra`` any further JSON-serializable entries.
+    """
+    settings = settings or FitSettings(model=result.model)
+    metadata = {name: getattr(result, name) for name in _RESULT_FIELDS}
+    metadata.update(version=FIT_FILE_VERSION, created=time.time(), settings=_settings_dict(settings),
+                    param_names=list(result.param_names or resolve_model(result.model).param_names), name=spectrum.name,
+                    source=spectrum.source, sheet=spectrum.sheet, data_checksum=data_checksum(spectrum),
+                    source_hash=source_hash, extra=extra)
+    arrays = {name: np.asarray(getattr(spectrum, name), dtype=float) for name in _DATA_ARRAYS}
+    arrays.update((name, np.asarray(getattr(result, name), dtype=float)) for name in _RESULT_ARRAYS
+                  if getattr(result, name) is not None)
+    if result.bounds is not None:
+        arrays['lower_bounds'], arrays['upper_bounds'] = (np.asarray(b, dtype=float) for b in result.bounds)
+    arrays['metadata'] = np.array(json.dumps(metadata))
+
+    path = os.fspath(path)
+    # write then rename, so a reader never sees a partial file
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def load_fit(path):
+    """Read a fit file written by :func:`save_fit`."""
+    with np.load(path, allow_pickle=False) as data:
+        metadata = json.loads(str(data['metadata']))
+        if metadata.get('version', 0) > FIT_FILE_VERSION:
+            raise ValueError('%s was written by a newer version of OSIF (fit file version %d)'
+                             % (path, metadata['version']))
+        arrays = {name: data[name] for name in data.files if name != 'metadata'}
+
+    spectrum = Spectrum(*(arrays[name] for name in _DATA_ARRAYS), name=metadata['name'],
+                        source=metadata['source'], sheet=metadata['sheet'])
+    bounds = None
+    if 'lower_bounds' in arrays:
+        bounds = (arrays['lower_bounds'], arrays['upper_bounds'])
+    result = FitResult(frequency=spectrum.frequency, bounds=bounds, param_names=tuple(metadata['param_names']),
+                       **{name: metadata[name] for name in _RESULT_FIELDS},
+                       **{name: arrays.get(name) for name in _RESULT_ARRAYS})
+    settings = FitSettings(**{name: value for name, value in metadata['settings'].items()
+                              if name in FitSettings.__dataclass_fields__})
+    if settings.bands:
+        settings.bands = [tuple(band) for band in settings.bands]
+    return SavedFit(result=result, spectrum=spectrum, settings=settings, data_checksum=metadata['data_checksum'],
+                    source_hash=metadata['source_hash'], created=metadata['created'], extra=metadata['extra'])
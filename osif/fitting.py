@@ -0,0 +1,303 @@
+"""Least squares fitting of the OSIF models to a measured spectrum."""
+
+import threading
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+import scipy.optimize
+
+from .models import AREA_SCALED, DEFAULT_INIT, TRANSMISSION_LINE, evaluate, resolve_model, residuals
+
+# Optimizer settings used by the GUI since v1.0.
+LEAST_SQUARES_OPTIONS = dict(max_nfev=50000, method='trf', xtol=1e-11, ftol=1e-11, gtol=1e-11)
+
+# Named optimizer settings for scipy.optimize.least_squares.  'fast' is meant for screening many spectra,
+# 'publication' spends more evaluations on the final digits and scales the steps by the Jacobian columns,
+# which matters because the parameters span ten decades.
+FIT_PROFILES = {
+    'fast': dict(max_nfev=2000, method='trf', xtol=1e-6, ftol=1e-6, gtol=1e-6),
+    'default': LEAST_SQUARES_OPTIONS,
+    'publication': dict(max_nfev=200000, method='trf', xtol=1e-12, ftol=1e-12, gtol=1e-12, x_scale='jac'),
+}
+
+# Criterion that ended the fit, by least_squares status.
+TERMINATION = {-1: 'improper input', 0: 'max_nfev', 1: 'gtol', 2: 'ftol', 3: 'xtol', 4: 'ftol and xtol'}
+
+# Share of the evaluations at the end of a fit over which tail_improvement is measured.
+TAIL_FRACTION = 0.1
+
+
+@dataclass
+class FitResult:
+    """Outcome of :func:`fit`.
+
+    ``params`` and ``standard_error`` are in per-cell units, in the order of
+    the model's ``param_names``, which are kept with the result so that
+    results of unregistered models can be read too; ``covariance`` is the full estimated
+    covariance matrix of the parameters, and ``init`` and ``bounds`` are the
+    starting point and bounds the fit was run with.  ``timings`` holds the
+    wall time of the ``optimize`` and ``covariance`` phases in seconds.
+
+    ``termination`` names the criterion that ended the fit and
+    ``tail_improvement`` is the relative decrease of the best cost over the
+    last 10 % of the evaluations: values near 0 mean the fit had long
+    converged, large values mean it was still improving when it stopped.
+    """
+    model: str
+    params: np.ndarray
+    standard_error: np.ndarray
+    residuals: np.ndarray
+    jac: np.ndarray
+    frequency: np.ndarray
+    L2NormOfRes: float
+    resPercentData: float
+    cost: float
+    nfev: int
+    njev: int
+    status: int
+    message: str
+    success: bool
+    timings: dict = field(default_factory=dict)
+    profile: str = 'default'
+    tail_improvement: float = np.nan
+    covariance: np.ndarray = None
+    init: np.ndarray = None
+    bounds: tuple = None
+    param_names: tuple = None
+
+    @property
+    def termination(self):
+        return TERMINATION.get(self.status, 'status %d' % self.status)
+
+    @property
+    def percent_sigma(self):
+        return self.standard_error / self.params * 100
+
+    def as_dict(self):
+        """Flat ``{name: value}`` record of the fitted parameters and their SE."""
+        record = {'model': self.model}
+        param_names = self.param_names or resolve_model(self.model).param_names
+        for name, value, se in zip(param_names, self.params, self.standard_error):
+            record[name] = float(value)
+            record[name + '_se'] = float(se)
+        record.update(L2NormOfRes=float(self.L2NormOfRes), resPercentData=float(self.resPercentData),
+                      cost=float(self.cost), nfev=int(self.nfev), status=int(self.status), profile=self.profile,
+                      termination=self.termination, tail_improvement=float(self.tail_improvement))
+        return record
+
+
+class FitCancelled(Exception):
+    """Raised by :func:`fit` once its :class:`FitMonitor` has been cancelled."""
+
+
+class FitMonitor:
+    """Progress of a running :func:`fit`, to be read and cancelled from another thread.
+
+    ``iteration`` counts Jacobian evaluations (one per optimizer iteration),
+    ``nfev`` residual evaluations and ``cost`` is 0.5 * sum(res^2) of the
+    latest evaluation; ``costs`` holds the cost of every evaluation.
+    :meth:`cancel` makes the fit raise :class:`FitCancelled` at its next
+    evaluation.  ``cancel_event``, e.g. a ``multiprocessing.Event``, lets
+    another process cancel the fit by setting it.
+    """
+
+    def __init__(self, cancel_event=None):
+        self.iteration = 0
+        self.nfev = 0
+        self.cost = np.nan
+        self.costs = []
+        self._cancelled = threading.Event() if cancel_event is None else cancel_event
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def check(self):
+        if self._cancelled.is_set():
+            raise FitCancelled('fit cancelled after %d evaluations' % self.nfev)
+
+    def residuals(self, params, model, spectrum):
+        """:func:`funcCost` that records progress."""
+        self.check()
+        res = funcCost(params, model, spectrum)
+        self.nfev += 1
+        self.cost = 0.5 * float(res.dot(res))
+        self.costs.append(self.cost)
+        return res
+
+    def jacobian(self, params, model, spectrum):
+        """:func:`funcJac` that records progress."""
+        self.check()
+        self.iteration += 1
+        return funcJac(params, model, spectrum)
+
+    def tail_improvement(self, fraction=TAIL_FRACTION):
+        """Relative decrease of the best cost over the last ``fraction`` of the evaluations."""
+        if not self.costs:
+            return np.nan
+        best = np.minimum.accumulate(self.costs)
+        before = best[max(int(np.ceil(len(best) * (1 - fraction))) - 1, 0)]
+        return float((before - best[-1]) / before) if before > 0 else 0.0
+
+
+def get_profile(profile):
+    """Return the least_squares options of a named fit profile (see :data:`FIT_PROFILES`)."""
+    try:
+        return FIT_PROFILES[profile]
+    except KeyError:
+        raise ValueError('unknown fit profile %r, expected one of %s' % (profile, list(FIT_PROFILES))) from None
+
+
+def _area_scaled(model):
+    return AREA_SCALED if model is None else resolve_model(model).area_scaled
+
+
+def per_cell(params, area, model=None):
+    """Convert per-area values (as entered in the GUI) to the per-cell values ``model`` uses."""
+    params = np.array(params, dtype=float)
+    params[list(_area_scaled(model))] /= area
+    return params
+
+
+def per_area(params, area, model=None):
+    """Inverse of :func:`per_cell`."""
+    params = np.array(params, dtype=float)
+    params[list(_area_scaled(model))] *= area
+    return params
+
+
+def initial_values(model, init, area):
+    """Per-cell starting values of ``model`` from per-area ``init`` entries, falling back on its defaults."""
+    model = resolve_model(model)
+    return per_cell([init.get(name, model.default_init[name]) for name in model.param_names], area, model)
+
+
+def funcCost(params, model, spectrum):
+    """Residuals minimized by the fit.
+
+    Minimizing this function results in fitting the real and complex parts of
+    the impedance at the same time: each residual is the distance between the
+    model and the data in the complex plane.
+    """
+    return residuals(model, params, spectrum.log_jw, spectrum.z_complex)
+
+
+def funcJac(params, model, spectrum):
+    """Analytic Jacobian of :func:`funcCost`.
+
+    For r = |Z - Z_data| the derivative is Re(conj(Z - Z_data) * dZ/dp) / r.
+    Points where the model passes exactly through the data have no defined
+    derivative and get a zero row.  The model itself was evaluated at the same
+    point for the residuals and comes from the cache.
+    """
+    diff = evaluate(model, params, spectrum.log_jw) - spectrum.z_complex
+    res = np.abs(diff)
+    dZ = resolve_model(model).jac(params, spectrum.log_jw)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        jac = np.real(np.conj(diff)[:, None] * dZ) / res[:, None]
+    jac[res == 0] = 0
+    return jac
+
+
+def estimate_rmem(spectrum):
+    """Estimate Rmem [ohm] from a (chopped) spectrum.
+
+    When the imaginary component of the impedance is approximately zero, the
+    real component corresponds to the membrane resistance, so this returns
+    the value of Z' where |Z''| is minimal.
+    """
+    idx_rmem = int(np.argmin(np.abs(spectrum.z_double_prime)))
+    return float(spectrum.z_prime[idx_rmem])
+
+
+def default_bounds(rmem, model=TRANSMISSION_LINE):
+    """Parameter bounds of ``model`` used by the GUI, for the built-in models with Rmem within 10 % of ``rmem``."""
+    return resolve_model(model).bounds(rmem)
+
+
+def fit(spectrum, model, init, bounds=None, verbose=0, monitor=None, profile='default', options=None):
+    """Fit ``model`` to ``spectrum`` starting from ``init``.
+
+    Parameters
+    ----------
+    spectrum : Spectrum
+        Data to fit, already chopped to the fitting frequency window.
+    model : str or Model
+        A registered model name (see :data:`osif.models.MODELS`) or a
+        :class:`osif.models.Model`.
+    init : sequence of float
+        Initial values of the model's parameters in per-cell units, e.g.
+        ``[Lwire, Rmem, Rcl, Qdl, phi, theta]``.
+    bounds : tuple, optional
+        ``(lower, upper)`` bounds; defaults to the model's bounds around the
+        initial value of its series resistance (Rmem).
+    verbose : int
+        Passed to :func:`scipy.optimize.least_squares`.
+    monitor : FitMonitor, optional
+        Receives the progress of the fit and can cancel it.
+    profile : str
+        Optimizer settings, one of :data:`FIT_PROFILES`.
+    options : dict, optional
+        least_squares options that override those of the profile, e.g.
+        ``{'max_nfev': 2000}``.
+
+    Returns
+    -------
+    FitResult
+    """
+    # looked up once here, so that the optimizer's calls go straight to the model's kernel and Jacobian
+    model = resolve_model(model)
+    if bounds is None:
+        bounds = model.bounds(init[model.series_resistance])
+    options = dict(get_profile(profile), **(options or {}))
+    monitor = monitor or FitMonitor()
+    start = time.perf_counter()
+    finalOutput = scipy.optimize.least_squares(monitor.residuals, np.asarray(init, dtype=float),
+                                               jac=monitor.jacobian, args=(model, spectrum), bounds=bounds,
+                                               verbose=verbose, **options)
+    optimize_time = time.perf_counter() - start
+    result = _fit_result(model, spectrum, finalOutput)
+    result.timings = {'optimize': optimize_time, 'covariance': time.perf_counter() - start - optimize_time}
+    result.profile = profile
+    result.tail_improvement = monitor.tail_improvement()
+    result.init = np.array(init, dtype=float)
+    result.bounds = tuple(np.broadcast_to(np.asarray(b, dtype=float), result.init.shape).copy() for b in bounds)
+    return result
+
+
+def _fit_result(model, spectrum, finalOutput):
+    finalParams = finalOutput.x
+    res = finalOutput.fun
+    dof = res.shape[0] - finalParams.size
+
+    # Estimate variance of parameters based on Gauss-Newton approximation of the Hessian of the cost function. See: (https://www8.cs.umu.se/kurser/5DA001/HT07/lectures/lsq-handouts.pdf)
+    # basically Covariance matrix = inverse(Jacob^T*Jacob)*meanSquaredError, where Jacob^T*Jacob is the first order estimate for the hessian. The square root of the diagonal elements (c_ii) of Cov are the variances of the parameter b_i
+    Jacob = finalOutput.jac
+    try:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            covariance = np.linalg.inv(Jacob.T.dot(Jacob)) * res.dot(res) / dof
+    except np.linalg.LinAlgError:
+        # e.g. noise-free data: the Jacobian rows of points the model passes through exactly are zero
+        covariance = np.full((finalParams.size, finalParams.size), np.nan)
+    estVars = np.diagonal(covariance)
+
+    return FitResult(model=model.name,
+                     params=finalParams,
+                     standard_error=np.sqrt(estVars),
+                     residuals=res,
+                     jac=Jacob,
+                     frequency=spectrum.frequency,
+                     L2NormOfRes=float(np.sqrt(np.sum(pow(res, 2)))),
+                     resPercentData=float(np.sum(res / spectrum.z_mod * 100) / res.shape[0]),
+                     cost=float(finalOutput.cost),
+                     nfev=int(finalOutput.nfev),
+                     njev=int(finalOutput.njev or 0),
+                     status=int(finalOutput.status),
+                     message=finalOutput.message,
+                     success=bool(finalOutput.success),
+                     covariance=covariance,
+                     param_names=tuple(model.param_names))
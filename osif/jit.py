@@ -0,0 +1,133 @@
+"""Optional Numba-compiled model kernels.
+
+Each NumPy kernel in :mod:`osif.models` evaluates a dozen whole-array
+expressions and allocates a temporary for each.  The compiled kernels here
+run one fused loop over the frequencies instead, and the compiled residual
+computes the model impedance and |Z - Z_data| in the same pass.  They are
+used for fits once :func:`enable` is called, or when the ``OSIF_JIT``
+environment variable is set (which also covers batch worker processes).
+Without Numba installed everything stays on the NumPy kernels.
+"""
+
+import cmath
+import dataclasses
+import math
+import os
+
+import numpy as np
+
+from . import models
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# Model forms of the compiled loop: F(x) = coth(x)/x or 1/(x*coth(x) - 1), see osif.models.
+COTH_OVER_X = 0
+SPHERICAL = 1
+MODEL_FORMS = {
+    models.TRANSMISSION_LINE: COTH_OVER_X,
+    models.LINEAR_DIFFUSION: COTH_OVER_X,
+    models.SPHERICAL_DIFFUSION: SPHERICAL,
+}
+
+# The built-in models with their NumPy kernels, restored by disable().
+_NUMPY_MODELS = {name: models.MODELS[name] for name in MODEL_FORMS}
+
+
+def available():
+    """True if Numba is installed."""
+    return numba is not None
+
+
+if numba is not None:
+    _XCOTH_SERIES = tuple(models.XCOTH_SERIES)
+    _COTH_ASYMPTOTE = models.COTH_ASYMPTOTE
+    _XCOTH_SERIES_RADIUS = models.XCOTH_SERIES_RADIUS
+
+    @numba.njit(cache=True)
+    def _expm1(z):
+        # exp(z) - 1 without cancellation for small |z|: Re = expm1(a)*cos(b) - 2*sin(b/2)^2
+        a, b = z.real, z.imag
+        s = math.sin(0.5 * b)
+        return complex(math.expm1(a) * math.cos(b) - 2 * s * s, math.exp(a) * math.sin(b))
+
+    @numba.njit(cache=True)
+    def _coth(x):
+        # same formulation as osif.models.coth
+        sign = -1.0 if x.real < 0 else 1.0
+        if abs(x.real) > _COTH_ASYMPTOTE:
+            return complex(sign, 0.0)
+        em = _expm1(-2 * sign * x)
+        return -sign * (2 + em) / em
+
+    @numba.njit(cache=True)
+    def _form(x, form):
+        if form == COTH_OVER_X:
+            return _coth(x) / x
+        if abs(x) < _XCOTH_SERIES_RADIUS:
+            u = x * x
+            g = 0j
+            for n in range(len(_XCOTH_SERIES) - 1, -1, -1):
+                g = (g + _XCOTH_SERIES[n]) * u
+        else:
+            g = x * _coth(x) - 1
+        return 1 / g
+
+    @numba.njit(cache=True)
+    def _fused(param, log_jw, form, z_data, z_out, res_out):
+        sqrt_rq = cmath.sqrt(complex(param[2] * param[3], 0.0))
+        for i in range(log_jw.shape[0]):
+            lw = log_jw[i]
+            x = sqrt_rq * cmath.exp(0.5 * param[4] * lw)
+            z = param[0] * cmath.exp(param[5] * lw) + param[1] + param[2] * _form(x, form)
+            z_out[i] = z
+            if res_out.shape[0]:
+                res_out[i] = abs(z - z_data[i])
+
+
+_NO_DATA = np.empty(0, dtype=complex)
+_NO_RESIDUALS = np.empty(0)
+
+
+def _compiled_kernel(form):
+    def kernel(param, log_jw):
+        z = np.empty(log_jw.shape[0], dtype=complex)
+        _fused(np.asarray(param, dtype=float), log_jw, form, _NO_DATA, z, _NO_RESIDUALS)
+        return z
+    return kernel
+
+
+def _compiled_residuals(form):
+    def fused_residuals(param, log_jw, z_data):
+        """Model impedance and |Z - z_data| from one compiled loop."""
+        z = np.empty(log_jw.shape[0], dtype=complex)
+        res = np.empty(log_jw.shape[0])
+        _fused(np.asarray(param, dtype=float), log_jw, form, z_data, z, res)
+        return z, res
+    return fused_residuals
+
+
+def enable():
+    """Use the compiled kernels for all fits in this process; returns False if Numba is not installed."""
+    if numba is None:
+        return False
+    for name, form in MODEL_FORMS.items():
+        models.register_model(dataclasses.replace(_NUMPY_MODELS[name], kernel=_compiled_kernel(form),
+                                                  residuals=_compiled_residuals(form)), replace=True)
+    return True
+
+
+def disable():
+    """Go back to the NumPy kernels."""
+    for model in _NUMPY_MODELS.values():
+        models.register_model(model, replace=True)
+
+
+def enabled():
+    return any(models.MODELS[name] is not model for name, model in _NUMPY_MODELS.items())
+
+
+if os.environ.get('OSIF_JIT'):
+    enable()
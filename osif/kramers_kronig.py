@@ -0,0 +1,138 @@
+"""Linear Kramers–Kronig test of measured spectra.
+
+The impedance of a linear, causal and stable system can be approximated by
+an ohmic resistance, an inductance, a capacitance and a chain of RC (Voigt)
+elements in series (Schönleber et al., Electrochim. Acta 131 (2014) 20).
+With the time constants of the RC elements fixed, log-spaced over the
+measured frequency range, the resistances enter linearly, so the test is a
+single linear least squares problem over the real and imaginary parts at
+once.  Its residuals, relative to |Z|, stay within a fraction of a percent
+for valid data; drift of the cell during the measurement, nonlinearity or
+noisy cabling show up as larger residuals, usually at the low frequencies.
+
+:func:`kramers_kronig` runs the test; :func:`kk_screen` uses it to reject a
+spectrum or to drop its outlier frequencies before a fit
+(``FitSettings(kk=...)``, ``--kk`` on the command line).
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+KK_MODES = ('report', 'reject', 'trim')
+
+# RC elements per decade of the measured frequency range.
+KK_ELEMENTS_PER_DECADE = 5
+
+# Residual [% of |Z|] above which a point is an outlier ('trim') and RMS residual above which 'reject' drops a spectrum.
+KK_THRESHOLD = 1.0
+
+# Largest share of the points 'trim' drops; a spectrum with more outliers is rejected instead.
+KK_MAX_TRIMMED = 0.2
+
+
+@dataclass
+class KKResult:
+    """Outcome of :func:`kramers_kronig`.
+
+    ``residuals_real`` and ``residuals_imag`` are the per-point residuals of
+    the real and imaginary parts in % of the data |Z|; ``z_fit`` is the
+    impedance of the fitted RC chain and ``tau`` its time constants [s].
+    """
+    frequency: np.ndarray
+    residuals_real: np.ndarray
+    residuals_imag: np.ndarray
+    z_fit: np.ndarray
+    tau: np.ndarray
+
+    @property
+    def residual(self):
+        """Per-point magnitude of the complex residual in % of |Z|."""
+        return np.hypot(self.residuals_real, self.residuals_imag)
+
+    @property
+    def rms(self):
+        return float(np.sqrt(np.mean(self.residual ** 2)))
+
+    @property
+    def max_residual(self):
+        return float(np.max(self.residual))
+
+    def outliers(self, threshold=KK_THRESHOLD):
+        """Mask of the points whose residual exceeds ``threshold`` % of |Z|."""
+        return self.residual > threshold
+
+
+def kramers_kronig(spectrum, elements_per_decade=KK_ELEMENTS_PER_DECADE):
+    """Fit a chain of RC elements with fixed time constants to ``spectrum`` and return its residuals.
+
+    Parameters
+    ----------
+    spectrum : Spectrum
+        The (chopped) spectrum to test.
+    elements_per_decade : float
+        Density of the time constants; the number of RC elements is capped at
+        the number of points.
+
+    Returns
+    -------
+    KKResult
+    """
+    omega = 2 * np.pi * spectrum.frequency
+    w_min, w_max = np.min(omega), np.max(omega)
+    n_elements = int(np.clip(np.ceil(np.log10(w_max / w_min) * elements_per_decade), 1, omega.size))
+    tau = np.logspace(-np.log10(w_max), -np.log10(w_min), n_elements)
+
+    # columns: RC elements, R0, L, 1/C
+    wt = omega[:, None] * tau[None, :]
+    denominator = 1 + wt ** 2
+    zeros, ones = np.zeros_like(omega), np.ones_like(omega)
+    basis_real = np.column_stack((1 / denominator, ones, zeros, zeros))
+    basis_imag = np.column_stack((-wt / denominator, zeros, omega, -1 / omega))
+
+    # relative weighting, and unit columns so that L and 1/C do not dominate the conditioning
+    weight = 1 / spectrum.mod_z_complex
+    design = np.vstack((basis_real * weight[:, None], basis_imag * weight[:, None]))
+    scale = np.linalg.norm(design, axis=0)
+    scale[scale == 0] = 1
+    coefficients = np.linalg.lstsq(design / scale, np.concatenate((spectrum.z_prime * weight,
+                                                                   spectrum.z_double_prime * weight)),
+                                   rcond=None)[0] / scale
+
+    z_fit = basis_real.dot(coefficients) + 1j * basis_imag.dot(coefficients)
+    return KKResult(frequency=spectrum.frequency,
+                    residuals_real=(spectrum.z_prime - z_fit.real) * weight * 100,
+                    residuals_imag=(spectrum.z_double_prime - z_fit.imag) * weight * 100,
+                    z_fit=z_fit,
+                    tau=tau)
+
+
+def kk_screen(spectrum, mode, threshold=KK_THRESHOLD, result=None):
+    """Apply the Kramers–Kronig check ``mode`` to ``spectrum``; returns the screened spectrum and the KKResult.
+
+    ``result``, the KKResult of ``spectrum`` if the test has already been
+    run, is used instead of solving it again.  ``'report'`` only runs the test.  ``'reject'`` raises ValueError when the
+    RMS residual exceeds ``threshold`` % of |Z|.  ``'trim'`` drops the points
+    whose residual exceeds ``threshold``, unless they are more than
+    :data:`KK_MAX_TRIMMED` of the spectrum, which is then rejected.
+    """
+    if mode not in KK_MODES:
+        raise ValueError('Kramers-Kronig mode must be one of %s, not %r' % (KK_MODES, mode))
+    if result is None:
+        result = kramers_kronig(spectrum)
+    if mode == 'reject' and result.rms > threshold:
+        raise ValueError('rejected by the Kramers-Kronig test: RMS residual %.2f %% of |Z| exceeds %g %%'
+                         % (result.rms, threshold))
+    if mode == 'trim':
+        keep = ~result.outliers(threshold)
+        if np.mean(~keep) > KK_MAX_TRIMMED:
+            raise ValueError('rejected by the Kramers-Kronig test: %d of %d points exceed %g %% of |Z|'
+                             % (np.sum(~keep), keep.size, threshold))
+        if not keep.all():
+            spectrum = spectrum.take(np.flatnonzero(keep))
+    return spectrum, result
+
+
+def kk_row(result, threshold=KK_THRESHOLD):
+    """Summary row entries of a KKResult."""
+    return {'kk_rms': result.rms, 'kk_max': result.max_residual, 'kk_outliers': int(result.outliers(threshold).sum())}
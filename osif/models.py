@@ -0,0 +1,461 @@
+"""Equivalent circuit models fitted by OSIF.
+
+The built-in models take the parameter vector
+
+    param = [Lwire, Rmem, Rcl, Qdl, phi, theta]
+
+in per-cell units (ohm, H, F/sec^phi) together with an array of frequencies in
+Hz, and return the complex impedance at those frequencies.  Each model is a
+single fused ``*_kernel(param, log_jw)`` evaluation; fits call the kernels
+directly with ln(j*omega) cached on the spectrum, through :func:`evaluate`,
+which remembers the most recent evaluations.
+
+Models are :class:`Model` objects in a registry keyed by name.  A fit looks
+its model up once (:func:`resolve_model`) and then calls the kernel and the
+Jacobian of the object directly.  New models, with their own parameters,
+are added with :func:`register_model`.
+"""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+import numpy as np
+
+TRANSMISSION_LINE = "Transmission Line"
+LINEAR_DIFFUSION = "1-D Linear Diffusion"
+SPHERICAL_DIFFUSION = "1-D Spherical Diffusion"
+
+# The built-in models, in the order the GUI lists them.
+EIS_MODELS = [TRANSMISSION_LINE, LINEAR_DIFFUSION, SPHERICAL_DIFFUSION]
+
+PARAM_NAMES = ('Lwire', 'Rmem', 'Rcl', 'Qdl', 'phi', 'theta')
+
+# Units of PARAM_NAMES as the GUI shows them (per area).
+PARAM_UNITS = ('H*cm^2', 'ohm*cm^2', 'ohm*cm^2', 'F/(cm^2*sec^phi)', '', '')
+
+# Initial values shown in the GUI, in the per-area units the user types in.
+DEFAULT_INIT = dict(Lwire=2e-5, Rmem=0.03, Rcl=0.1, Qdl=2.5, phi=0.95, theta=0.95)
+
+# Lwire [H*cm^2], Rmem and Rcl [ohm*cm^2] are entered per area; Qdl, phi and theta are not.
+AREA_SCALED = (0, 1, 2)
+
+# Lwire, Rcl and Qdl span decades; multi-start fits sample them log-uniformly.
+LOG_SAMPLED = (0, 2, 3)
+
+
+# |Re x| beyond which coth(x) equals +-1 to double precision (exp(-2 * 20) ~ 4e-18).
+COTH_ASYMPTOTE = 20.0
+
+# Below this |x|, x*coth(x) - 1 is summed from its Taylor series instead of cancelling 1 against ~1.
+XCOTH_SERIES_RADIUS = 0.5
+
+# x*coth(x) - 1 = sum_n XCOTH_SERIES[n-1] * x^(2n), with coefficients 2^(2n) * B_2n / (2n)!.  Ten terms
+# reach double precision for |x| < XCOTH_SERIES_RADIUS (the ratio of successive terms is about -x^2/pi^2).
+XCOTH_SERIES = np.array([3.3333333333333333e-1, -2.2222222222222222e-2, 2.1164021164021164e-3,
+                         -2.1164021164021164e-4, 2.1377799155576933e-5, -2.1644042808063972e-6,
+                         2.1925947851873778e-7, -2.2214608789979679e-8, 2.2507846516808993e-9,
+                         -2.2805151204592183e-10])
+
+
+def _coth(x):
+    """coth(x) and its derivative 1 - coth(x)^2, see :func:`coth`."""
+    x = np.asarray(x, dtype=complex)
+    sign = np.where(x.real < 0, -1.0, 1.0)
+    y2 = -2 * sign * x
+    em = np.expm1(y2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        c = np.where(np.abs(x.real) > COTH_ASYMPTOTE, sign, -sign * (2 + em) / em)
+        # q = 1 + em, taken from exp() directly because 1 + em loses q once it is small
+        dc = -4 * np.exp(y2) / (em * em)
+    # the pole at 0, where em = 0; 0 / 0 would give nan for the imaginary part
+    pole = x == 0
+    if np.any(pole):
+        c = np.where(pole, np.inf, c)
+        dc = np.where(pole, -np.inf, dc)
+    return c, dc
+
+
+def coth(x):
+    """Complex hyperbolic cotangent that does not overflow.
+
+    With y = +-x chosen so that Re y >= 0, coth(y) = (1 + q) / (1 - q) where
+    q = exp(-2y) never exceeds 1 in magnitude.  Writing 1 - q as -expm1(-2y)
+    keeps full precision for small |x| as well, where 1/x dominates.  Beyond
+    |Re x| = COTH_ASYMPTOTE the result is the asymptote +-1.
+    """
+    return _coth(x)[0]
+
+
+def coth_and_csch2(x):
+    """coth(x) and 1 - coth(x)^2 = -csch(x)^2 (the derivative of coth).
+
+    1 - coth^2 = -4q / (1 - q)^2 decays to 0 for large |Re x|; computing it as
+    1 - c*c would lose all digits there.
+    """
+    return _coth(x)
+
+
+def xcoth_minus_1(x):
+    """x*coth(x) - 1 and its derivative, accurate for small |x|.
+
+    For small |x| the direct form cancels (x*coth(x) -> 1 while the result
+    goes as x^2/3), so the Taylor series is used inside XCOTH_SERIES_RADIUS.
+    """
+    x = np.asarray(x, dtype=complex)
+    c, dc = _coth(x)
+    g = x * c - 1
+    dg = c + x * dc
+    small = np.abs(x) < XCOTH_SERIES_RADIUS
+    if np.any(small):
+        xs = x[small]
+        u = xs * xs
+        series = np.zeros_like(xs)
+        d_series = np.zeros_like(xs)
+        for n in range(XCOTH_SERIES.size, 0, -1):
+            series = (series + XCOTH_SERIES[n - 1]) * u
+            d_series = d_series * u + 2 * n * XCOTH_SERIES[n - 1]
+        g[small] = series
+        dg[small] = d_series * xs
+    return g, dg
+
+
+def log_jw(frequency):
+    """ln(j*2*pi*f), from which every power of j*omega in the models is formed.
+
+    Computing it once per spectrum turns each ``pow(j*omega, a)`` into a
+    single ``exp(a * log_jw)``.
+    """
+    return np.log(2 * np.pi * np.asarray(frequency, dtype=float)) + 0.5j * np.pi
+
+
+def _wire_and_membrane(param, log_jw):
+    """Lwire * (j*omega)^theta + Rmem, shared by every model."""
+    return param[0] * np.exp(param[5] * log_jw) + param[1]
+
+
+def _x(param, log_jw):
+    """x = sqrt(Rcl * Qdl * (j*omega)^phi), the argument of coth in every model."""
+    return np.sqrt(param[2] * param[3] + 0j) * np.exp(0.5 * param[4] * log_jw)
+
+
+# Function from Setzler (equation 2 from "A Physics-Based Impedance Model of Proton Exchange Membrane Fuel
+# Cells Exhibiting Low-Frequency Inductive Loops"): sqrt(Rcl / (Qdl * (j*omega)^phi)) * coth(x), which is
+# Rcl * coth(x) / x.
+def transmission_line_kernel(param, log_jw):
+    x = _x(param, log_jw)
+    return _wire_and_membrane(param, log_jw) + param[2] * coth(x) / x
+
+
+# 1-D linear diffusion model: Rcl * (Rcl * Qdl * (j*omega)^phi)^-0.5 * coth(x), also Rcl * coth(x) / x.
+def linear_diffusion_kernel(param, log_jw):
+    x = _x(param, log_jw)
+    return _wire_and_membrane(param, log_jw) + param[2] * coth(x) / x
+
+
+# 1-D spherical diffusion model: Rcl / (x * coth(x) - 1).
+def spherical_diffusion_kernel(param, log_jw):
+    x = _x(param, log_jw)
+    return _wire_and_membrane(param, log_jw) + param[2] / xcoth_minus_1(x)[0]
+
+
+def transmission_line(param, frequency):
+    return transmission_line_kernel(param, log_jw(frequency))
+
+
+def linear_diffusion(param, frequency):
+    return linear_diffusion_kernel(param, log_jw(frequency))
+
+
+def spherical_diffusion(param, frequency):
+    return spherical_diffusion_kernel(param, log_jw(frequency))
+
+
+# Analytic Jacobians.  All three models share the form
+#
+#     Z = Lwire * s^theta + Rmem + Rcl * F(x),   s = j*2*pi*f,   x = sqrt(Rcl * Qdl * s^phi)
+#
+# with F(x) = coth(x)/x for the transmission line and linear diffusion models (the two expressions are
+# algebraically identical) and F(x) = 1/(x*coth(x) - 1) for spherical diffusion.  Using
+# dx/dRcl = x/(2*Rcl), dx/dQdl = x/(2*Qdl) and dx/dphi = x*ln(s)/2 the derivatives follow directly.
+
+def _jacobian(param, log_jw, F_and_dF):
+    s_theta = np.exp(param[5] * log_jw)
+    x = _x(param, log_jw)
+    F, dF = F_and_dF(x)
+    half_x_dF = 0.5 * x * dF
+
+    jac = np.empty((log_jw.shape[0], 6), dtype=complex)
+    jac[:, 0] = s_theta
+    jac[:, 1] = 1
+    jac[:, 2] = F + half_x_dF
+    jac[:, 3] = param[2] * half_x_dF / param[3]
+    jac[:, 4] = param[2] * half_x_dF * log_jw
+    jac[:, 5] = param[0] * s_theta * log_jw
+    return jac
+
+
+# F(x) and dF/dx for each model.
+def _coth_over_x(x):
+    c, dc = coth_and_csch2(x)
+    return c / x, (dc * x - c) / (x * x)
+
+
+def _spherical(x):
+    g, dg = xcoth_minus_1(x)
+    return 1 / g, -dg / (g * g)
+
+
+def transmission_line_jac(param, log_jw):
+    """d Z / d param for :func:`transmission_line_kernel`, shape ``(len(log_jw), 6)``."""
+    return _jacobian(param, log_jw, _coth_over_x)
+
+
+def linear_diffusion_jac(param, log_jw):
+    """d Z / d param for :func:`linear_diffusion_kernel`, shape ``(len(log_jw), 6)``."""
+    return _jacobian(param, log_jw, _coth_over_x)
+
+
+def spherical_diffusion_jac(param, log_jw):
+    """d Z / d param for :func:`spherical_diffusion_kernel`, shape ``(len(log_jw), 6)``."""
+    return _jacobian(param, log_jw, _spherical)
+
+
+def standard_bounds(rmem):
+    """Bounds of the built-in models, with Rmem held within 10 % of ``rmem``."""
+    bounds_lower = (0, 0.9 * rmem, 0, 0, 0, 0)
+    bounds_upper = (1, 1.1 * rmem, np.inf, np.inf, 1, 1)
+    return bounds_lower, bounds_upper
+
+
+def forward_difference_jacobian(kernel, param, log_jw, step=1e-7):
+    """d Z / d param of ``kernel`` by forward differences, for models without an analytic Jacobian."""
+    param = np.asarray(param, dtype=float)
+    z = kernel(param, log_jw)
+    jac = np.empty((log_jw.shape[0], param.size), dtype=complex)
+    for i in range(param.size):
+        h = step * max(abs(param[i]), 1e-3)
+        shifted = param.copy()
+        shifted[i] += h
+        jac[:, i] = (kernel(shifted, log_jw) - z) / h
+    return jac
+
+
+@dataclass(eq=False)
+class Model:
+    """An equivalent circuit model OSIF can fit.
+
+    ``kernel(param, log_jw)`` returns the complex impedance for the per-cell
+    ``param`` (ordered as ``param_names``) at ln(j*omega); ``jacobian`` has
+    the same arguments and returns d Z / d param with one column per
+    parameter.  Without a Jacobian, fits use forward differences of the
+    kernel.
+
+    ``units`` and ``default_init`` are per area, as the GUI shows them, and
+    ``area_scaled`` lists the parameters that are divided by the cell area to
+    get per-cell values.  ``series_resistance`` is the index of the
+    high-frequency resistance, which fits estimate from the data;
+    ``bounds(estimate)`` returns the ``(lower, upper)`` bounds around that
+    estimate.  ``residuals(param, log_jw, z_data)``, if given, returns the
+    impedance and |Z - z_data| in one pass (see :mod:`osif.jit`).
+    ``expression`` is the circuit expression of a model compiled by
+    :mod:`osif.circuits`, from which worker processes rebuild it.
+    """
+    name: str
+    kernel: Callable
+    jacobian: Optional[Callable] = None
+    param_names: tuple = PARAM_NAMES
+    units: tuple = PARAM_UNITS
+    default_init: dict = field(default_factory=lambda: dict(DEFAULT_INIT))
+    area_scaled: tuple = AREA_SCALED
+    log_sampled: tuple = LOG_SAMPLED
+    series_resistance: int = 1
+    bounds: Callable = standard_bounds
+    info: str = ''
+    reference: str = ''
+    residuals: Optional[Callable] = None
+    expression: str = ''
+
+    def impedance(self, param, frequency):
+        """Complex impedance at ``frequency`` [Hz]."""
+        return self.kernel(param, log_jw(np.asarray(frequency, dtype=float)))
+
+    def jac(self, param, log_jw):
+        """d Z / d param, analytic if the model has a Jacobian."""
+        if self.jacobian is None:
+            return forward_difference_jacobian(self.kernel, param, log_jw)
+        return self.jacobian(param, log_jw)
+
+
+DIFFUSION_HANDBOOK = ('https://www.researchgate.net/publication/342833389_Handbook_of_Electrochemical_Impedance_'
+                      'Spectroscopy_DIFFUSION_IMPEDANCES')
+
+# Registered models by name, in the order the GUI lists them.
+MODELS = OrderedDict()
+
+
+def register_model(model, replace=False):
+    """Add ``model`` to the registry under ``model.name`` and return it.
+
+    Register plug-in models when their module is imported, so that batch
+    worker processes see them too.
+    """
+    if model.name in MODELS and not replace:
+        raise ValueError('a model named %r is already registered' % model.name)
+    if len(model.param_names) != len(model.units) or set(model.param_names) - set(model.default_init):
+        raise ValueError('model %r needs a unit and a default initial value for every parameter' % model.name)
+    MODELS[model.name] = model
+    model_cache.clear()
+    return model
+
+
+def resolve_model(model):
+    """The :class:`Model` for a registered name or a circuit expression (see :mod:`osif.circuits`).
+
+    Model objects are returned as they are.
+    """
+    if isinstance(model, Model):
+        return model
+    try:
+        return MODELS[model]
+    except KeyError:
+        pass
+    from .circuits import circuit_model
+
+    try:
+        return circuit_model(model)
+    except (TypeError, ValueError) as exc:
+        raise ValueError('unknown model %r, expected one of %s or a circuit expression (%s)'
+                         % (model, list(MODELS), exc)) from None
+
+
+def get_model(model):
+    """Return the ``(param, frequency)`` impedance function of a model."""
+    return resolve_model(model).impedance
+
+
+def impedance(model, param, frequency):
+    """Complex impedance of ``model`` at ``frequency``."""
+    return resolve_model(model).impedance(param, frequency)
+
+
+def get_kernel(model):
+    """Return the ``(param, log_jw)`` impedance kernel of a model."""
+    return resolve_model(model).kernel
+
+
+def get_jacobian(model):
+    """Return the ``(param, log_jw)`` Jacobian function of a model."""
+    return resolve_model(model).jac
+
+
+# Number of recent kernel evaluations kept by evaluate().  A fit needs two (the residual and the Jacobian
+# at the same point); plotting a result needs one more.
+MODEL_CACHE_SIZE = 16
+
+
+class ModelCache:
+    """Bounded least recently used cache of kernel evaluations.
+
+    Entries are keyed on the model object, the parameter values and the
+    identity of the ``log_jw`` array, which is cached on each Spectrum, so
+    the cache hits whenever the same spectrum is evaluated at the same
+    parameters again.  Stored impedances are read-only.
+    """
+
+    def __init__(self, maxsize=MODEL_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def evaluate(self, model, param, log_jw):
+        model = resolve_model(model)
+        param = np.asarray(param, dtype=float)
+        key = (model, param.tobytes(), id(log_jw))
+        with self._lock:
+            entry = self._entries.get(key)
+            # the entry holds log_jw itself, so a new array that reuses a freed id() never matches
+            if entry is not None and entry[0] is log_jw:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+        with self._lock:
+            self.misses += 1
+        return self.store(model, param, log_jw, model.kernel(param, log_jw))
+
+    def store(self, model, param, log_jw, z):
+        """Remember ``z`` as the impedance of ``model`` at ``param`` and return it, read-only."""
+        z.flags.writeable = False
+        key = (resolve_model(model), np.asarray(param, dtype=float).tobytes(), id(log_jw))
+        with self._lock:
+            self._entries[key] = (log_jw, z)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return z
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+model_cache = ModelCache()
+
+
+def evaluate(model, param, log_jw):
+    """Impedance of ``model`` at ``param`` from its kernel, reusing recent evaluations (see :class:`ModelCache`)."""
+    return model_cache.evaluate(model, param, log_jw)
+
+
+def residuals(model, param, log_jw, z_data):
+    """|Z - z_data| of ``model`` at ``param``; the impedance is kept in the model cache for the Jacobian."""
+    model = resolve_model(model)
+    if model.residuals is None:
+        return np.abs(model_cache.evaluate(model, param, log_jw) - z_data)
+    z, res = model.residuals(param, log_jw, z_data)
+    model_cache.store(model, param, log_jw, z)
+    return res
+
+
+def modulus_and_phase(z):
+    """|Z| and phase [deg] of a model impedance, as the GUI plots them."""
+    return np.abs(z), 180 / np.pi * np.arctan(z.imag / z.real)
+
+
+def check_jacobian(model, param, frequency, step=1e-5):
+    """Largest relative difference between the analytic and a central difference Jacobian.
+
+    Useful when adding or changing a model: a correct Jacobian gives values
+    well below ``1e-3``, the remainder being finite difference error.
+    """
+    frequency = np.asarray(frequency, dtype=float)
+    param = np.asarray(param, dtype=float)
+    model = resolve_model(model)
+    func = model.impedance
+    analytic = model.jac(param, log_jw(frequency))
+    numeric = np.empty_like(analytic)
+    for i in range(param.size):
+        h = step * max(abs(param[i]), 1e-3)
+        up, down = param.copy(), param.copy()
+        up[i] += h
+        down[i] -= h
+        numeric[:, i] = (func(up, frequency) - func(down, frequency)) / (2 * h)
+    scale = np.maximum(np.abs(numeric), np.abs(analytic)).max(axis=0)
+    scale[scale == 0] = 1
+    return float(np.max(np.abs(analytic - numeric) / scale))
+
+
+register_model(Model(TRANSMISSION_LINE, transmission_line_kernel, transmission_line_jac,
+                     info='--------------------------\n'
+                          'The model being used in this program is Eq. 2 from the opened Fuller paper.\n'
+                          'The derivation can be found in their suplimentary information. If you would\n'
+                          'like to use a different model, contact Jason Pfeilsticker.\n\n',
+                     reference='https://iopscience.iop.org/article/10.1149/2.0361506jes'))
+register_model(Model(LINEAR_DIFFUSION, linear_diffusion_kernel, linear_diffusion_jac,
+                     info='1-D linear diffusion model selected.', reference=DIFFUSION_HANDBOOK))
+register_model(Model(SPHERICAL_DIFFUSION, spherical_diffusion_kernel, spherical_diffusion_jac,
+                     info='1-D spherical diffusion model selected.', reference=DIFFUSION_HANDBOOK))
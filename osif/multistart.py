@@ -0,0 +1,232 @@
+"""Multi-start fitting: many local fits from quasi-random starting points."""
+
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+
+import numpy as np
+from scipy.stats import qmc
+
+from .fitting import FitCancelled, FitMonitor, fit
+from .circuits import circuit_model
+from .models import LOG_SAMPLED, MODELS, resolve_model
+from .parallel import default_workers, process_pool, single_threaded_blas
+
+# Share of the width of their bounds by which the linearly sampled parameters (Rmem, phi, theta) are drawn
+# around the initial value.
+SPREAD = 0.25
+
+# Evaluation limit of each local fit.  A start that has not converged by then is far from every solution
+# the other starts reach; letting it run to the profile's limit only delays the answer.
+MULTISTART_MAX_NFEV = 2000
+
+
+@dataclass
+class MultiStartResult:
+    """Outcome of :func:`multistart_fit`.
+
+    ``params`` and ``costs`` hold the solution of every start that finished,
+    sorted by cost; ``best`` is the full result of the lowest cost and
+    ``agreeing`` marks the solutions that match it.  ``errors`` holds the
+    error message of every start that failed.
+    """
+    best: object
+    starts: np.ndarray
+    params: np.ndarray
+    costs: np.ndarray
+    agreeing: np.ndarray
+    stopped_early: bool
+    wall_time: float
+    errors: list = field(default_factory=list)
+
+    @property
+    def n_failed(self):
+        return len(self.errors)
+
+    @property
+    def n_agree(self):
+        return int(self.agreeing.sum())
+
+    @property
+    def spread(self):
+        """Standard deviation of each parameter over the finished starts."""
+        return np.std(self.params, axis=0)
+
+    @property
+    def agreeing_spread(self):
+        """Standard deviation of each parameter over the starts that agree with the best."""
+        return np.std(self.params[self.agreeing], axis=0)
+
+
+def sample_starts(init, bounds, n_starts, sampler='sobol', decades=1.0, seed=None, log_sampled=LOG_SAMPLED,
+                  spread=SPREAD):
+    """Quasi-random starting points within ``bounds``.
+
+    The first row is ``init`` itself.  The parameters in ``log_sampled``
+    (those that span decades, e.g. Lwire, Rcl and Qdl) are drawn from
+    ``init * 10**[-decades, decades]`` clipped to the bounds, the others
+    from ``init`` +- ``spread`` times the width of their bounds, clipped to
+    the bounds.
+    """
+    init = np.asarray(init, dtype=float)
+    lower, upper = (np.asarray(b, dtype=float) for b in bounds)
+    width = upper - lower
+    lo, hi = np.maximum(init - spread * width, lower), np.minimum(init + spread * width, upper)
+    log = np.zeros(init.size, dtype=bool)
+    for i in log_sampled:
+        if init[i] > 0:
+            log[i] = True
+            lo[i] = np.log10(max(init[i] * 10 ** -decades, lower[i], np.finfo(float).tiny))
+            hi[i] = np.log10(min(init[i] * 10 ** decades, upper[i]))
+    if not np.all(np.isfinite(lo) & np.isfinite(hi)):
+        raise ValueError('cannot sample starting points from infinite bounds %s' % (bounds,))
+
+    if sampler == 'sobol':
+        engine = qmc.Sobol(d=init.size, scramble=True, seed=seed)
+    elif sampler == 'lhs':
+        engine = qmc.LatinHypercube(d=init.size, seed=seed)
+    else:
+        raise ValueError("sampler must be 'sobol' or 'lhs', not %r" % sampler)
+    n = max(n_starts - 1, 0)
+    if sampler == 'sobol' and n > 1:
+        # Sobol points are drawn in powers of two; the leading points of the sequence are used.
+        unit = engine.random_base2(int(np.ceil(np.log2(n))))[:n]
+    else:
+        unit = engine.random(n)
+    points = lo + unit * (hi - lo)
+    points[:, log] = 10 ** points[:, log]
+    return np.vstack([np.clip(init, lower, upper), np.clip(points, lower, upper)])
+
+
+def _agrees(params, costs, best, rtol):
+    """Mask of the solutions whose cost and parameters match ``params[best]`` within ``rtol``."""
+    cost_ok = costs <= costs[best] * (1 + rtol) + np.finfo(float).tiny
+    scale = np.maximum(np.abs(params[best]), np.finfo(float).eps)
+    param_ok = np.all(np.abs(params - params[best]) <= rtol * scale + 1e-12, axis=1)
+    return cost_ok & param_ok
+
+
+def _model_spec(model):
+    """What the workers rebuild ``model`` from: compiled circuit kernels cannot be pickled."""
+    if MODELS.get(model.name) is model:
+        return model.name
+    if model.expression:
+        return model.expression, model.name
+    return model
+
+
+# Set in worker processes: the event that cancels the running starts once the answer is known.
+_stop = None
+
+
+def _init_worker(stop):
+    global _stop
+    _stop = stop
+
+
+def _fit_start(spectrum, spec, start, bounds, profile='default', max_nfev=None):
+    """One local fit; returns its FitResult, the error message if it failed, or None if it was cancelled."""
+    try:
+        model = circuit_model(*spec) if isinstance(spec, tuple) else spec
+        return fit(spectrum, model, start, bounds=bounds, profile=profile,
+                   monitor=None if _stop is None else FitMonitor(_stop),
+                   options=None if max_nfev is None else {'max_nfev': max_nfev})
+    except FitCancelled:
+        return None
+    except Exception as exc:
+        return '%s: %s' % (type(exc).__name__, exc)
+
+
+def multistart_fit(spectrum, model, init, bounds=None, n_starts=16, sampler='sobol', agree=3, rtol=1e-3,
+                   workers=None, timeout=None, seed=None, profile='default', max_nfev=MULTISTART_MAX_NFEV):
+    """Run local fits from ``n_starts`` starting points and keep the best.
+
+    Parameters
+    ----------
+    spectrum, model, init, bounds
+        As for :func:`osif.fitting.fit`.
+    n_starts : int
+        Number of starting points, including ``init``.
+    sampler : {'sobol', 'lhs'}
+        Sobol or Latin hypercube sampling, see :func:`sample_starts`.
+    agree : int
+        Stop once this many finished starts reach the same solution as the
+        best one (cost and parameters within ``rtol``).  ``0`` runs every start.
+    workers : int, optional
+        Worker processes; defaults to one per core.  ``1`` runs the starts
+        one after another in the calling process.
+    timeout : float, optional
+        Wall-clock limit in seconds; the best solution found so far is returned.
+    seed : int, optional
+        Seed for the sampler.
+    profile : str
+        Optimizer settings of every local fit, see :data:`osif.fitting.FIT_PROFILES`.
+    max_nfev : int, optional
+        Evaluation limit of every local fit; ``None`` keeps the profile's.
+
+    Returns
+    -------
+    MultiStartResult
+    """
+    start_time = time.perf_counter()
+    model = resolve_model(model)
+    if bounds is None:
+        bounds = model.bounds(init[model.series_resistance])
+    starts = sample_starts(init, bounds, n_starts, sampler=sampler, seed=seed, log_sampled=model.log_sampled)
+    workers = min(workers or default_workers(), len(starts))
+    deadline = None if timeout is None else start_time + timeout
+
+    results = []
+
+    def converged():
+        finished = [r for r in results if not isinstance(r, str)]
+        if not agree or len(finished) < agree:
+            return False
+        params = np.array([r.params for r in finished])
+        costs = np.array([r.cost for r in finished])
+        return _agrees(params, costs, int(np.argmin(costs)), rtol).sum() >= agree
+
+    stopped_early = False
+    if workers == 1:
+        for start in starts:
+            results.append(_fit_start(spectrum, model, start, bounds, profile, max_nfev))
+            if converged() or (deadline is not None and time.perf_counter() > deadline):
+                stopped_early = len(results) < len(starts)
+                break
+    else:
+        stop = multiprocessing.get_context('spawn').Event()
+        pool = process_pool(workers, _init_worker, (stop,))
+        try:
+            spec = _model_spec(model)
+            with single_threaded_blas():
+                pending = {pool.submit(_fit_start, spectrum, spec, start, bounds, profile, max_nfev)
+                           for start in starts}
+            while pending:
+                remaining = None if deadline is None else max(deadline - time.perf_counter(), 0)
+                done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                results.extend(result for result in (future.result() for future in done) if result is not None)
+                if not done or converged():
+                    stopped_early = bool(pending)
+                    break
+        finally:
+            # Cancel the starts that are still running once the answer is known; they stop at their next
+            # evaluation, so the pool is gone before the next fit needs the cores.
+            stop.set()
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    errors = [r for r in results if isinstance(r, str)]
+    finished = sorted((r for r in results if not isinstance(r, str)), key=lambda r: r.cost)
+    if not finished:
+        raise RuntimeError('none of the %d starts of the multi-start fit finished: %s'
+                           % (len(results), '; '.join(sorted(set(errors)))))
+    params = np.array([r.params for r in finished])
+    costs = np.array([r.cost for r in finished])
+    return MultiStartResult(best=finished[0],
+                            starts=starts,
+                            params=params,
+                            costs=costs,
+                            agreeing=_agrees(params, costs, 0, rtol),
+                            stopped_early=stopped_early,
+                            wall_time=time.perf_counter() - start_time,
+                            errors=errors)
@@ -0,0 +1,42 @@
+"""Process pools shared by the batch, multi-start and bootstrap fits."""
+
+import contextlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# Environment variables that cap the thread pools of the common BLAS/OpenMP builds.
+BLAS_THREAD_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+                    'VECLIB_MAXIMUM_THREADS', 'NUMEXPR_NUM_THREADS')
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+@contextlib.contextmanager
+def single_threaded_blas():
+    """Limit BLAS/OpenMP to one thread in worker processes started inside the block.
+
+    With one worker per core, letting each worker's BLAS also spawn a thread
+    per core oversubscribes the machine.  The variables must be set before a
+    worker imports numpy, so they are set here in the parent and inherited by
+    workers started with the ``spawn`` method (forked workers would inherit
+    the parent's already initialised BLAS instead).
+    """
+    saved = {name: os.environ.get(name) for name in BLAS_THREAD_VARS}
+    os.environ.update({name: '1' for name in BLAS_THREAD_VARS})
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def process_pool(workers, initializer=None, initargs=()):
+    """A spawn-based ProcessPoolExecutor; submit to it inside :func:`single_threaded_blas`."""
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                               initializer=initializer, initargs=initargs)
@@ -0,0 +1,154 @@
+"""Warm-started fitting of ordered series of spectra, e.g. hourly spectra of one cell."""
+
+import os
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from . import telemetry
+from .batch import FitSettings, error_text, result_row, store_fit
+from .fitting import estimate_rmem, fit, initial_values
+from .kramers_kronig import kk_row
+from .models import resolve_model
+from .spectrum import load_spectra
+from .store import ResultsStore, file_hash
+
+
+@dataclass
+class SeriesFit:
+    """One step of :func:`fit_series`.
+
+    ``warm`` tells whether the kept result started from the previous fit;
+    ``cold_refit`` whether a cold start was also tried because the residual
+    jumped.  ``result`` is None and ``error`` is set when the step failed.
+    ``kk`` holds the Kramers–Kronig summary entries when the settings ask for
+    the test.
+    """
+    index: int
+    name: str
+    result: object
+    sheet: str = ''
+    warm: bool = False
+    cold_refit: bool = False
+    error: str = ''
+    fit_time: float = 0.0
+    kk: dict = None
+
+
+def _expand(spectra):
+    """Spectra of ``spectra``, loading paths lazily; unreadable paths give ``(path, exception)``."""
+    for item in spectra:
+        if isinstance(item, (str, os.PathLike)):
+            try:
+                loaded = load_spectra(item)
+            except Exception as exc:
+                yield os.fspath(item), exc
+            else:
+                yield from loaded
+        else:
+            yield item
+
+
+def step_row(step, settings):
+    """Summary row of a :class:`SeriesFit`: the batch summary entries plus ``warm`` and ``cold_refit``."""
+    row = {'file': step.name, 'sheet': step.sheet, 'model': getattr(settings.model, 'name', settings.model),
+           'warm': step.warm, 'cold_refit': step.cold_refit, 'fit_time': step.fit_time, 'error': step.error}
+    row.update(step.kk or {})
+    if step.result is not None:
+        row.update(result_row(step.result, settings))
+    return row
+
+
+def relative_residual(result, spectrum):
+    """L2 norm of the residuals relative to the L2 norm of the data |Z|, comparable across spectra."""
+    return result.L2NormOfRes / np.linalg.norm(spectrum.z_mod)
+
+
+def fit_series(spectra, settings=None, jump=3.0):
+    """Fit an ordered stream of spectra, seeding each fit with the previous solution.
+
+    Parameters
+    ----------
+    spectra : iterable of Spectrum or path
+        Spectra in time order.  Paths are loaded one at a time, so a lazy
+        iterable is processed in constant memory; a workbook contributes
+        its sheets in order.
+    settings : FitSettings, optional
+        Model, area, frequency window and the cold start values.  With
+        ``settings.store`` set, every step is appended to that results store.
+    jump : float
+        If the relative residual of a warm-started fit exceeds ``jump`` times
+        that of the previous spectrum, the spectrum is also fitted from the cold
+        start and the better of the two is kept.
+
+    Yields
+    ------
+    SeriesFit
+        After a failed step the next spectrum is fitted from the cold start.
+    """
+    settings = settings or FitSettings()
+    model = resolve_model(settings.model)
+    cold = initial_values(model, settings.init, settings.area)
+    previous = None
+    previous_residual = None
+
+    store = ResultsStore(settings.store) if settings.store else None
+    try:
+        for index, spectrum in enumerate(_expand(spectra)):
+            if isinstance(spectrum, tuple):
+                path, exc = spectrum
+                previous = previous_residual = None
+                step = SeriesFit(index=index, name=path, result=None, error=error_text(exc))
+                if store is not None:
+                    store_fit(store, step_row(step, settings), settings)
+                yield step
+                continue
+
+            start = time.perf_counter()
+            step = SeriesFit(index=index, name=spectrum.source or spectrum.name, sheet=spectrum.sheet, result=None)
+            timer = telemetry.Timer()
+            try:
+                kk = chopped = None
+                if settings.kk:
+                    with timer.phase('kk'):
+                        kk = settings.kk_test(spectrum)
+                        step.kk = kk_row(kk, settings.kk_threshold)
+                with timer.phase('chop'):
+                    chopped = settings.window(spectrum, kk=kk)
+                cold_init = cold.copy()
+                with timer.phase('rmem'):
+                    cold_init[model.series_resistance] = estimate_rmem(chopped)
+                bounds = model.bounds(cold_init[model.series_resistance])
+
+                if previous is None:
+                    result = fit(chopped, model, cold_init, bounds=bounds, profile=settings.profile)
+                else:
+                    warm_init = np.clip(previous.params, bounds[0], bounds[1])
+                    result = fit(chopped, model, warm_init, bounds=bounds, profile=settings.profile)
+                    step.warm = True
+                    if relative_residual(result, chopped) > jump * previous_residual:
+                        step.cold_refit = True
+                        cold_result = fit(chopped, model, cold_init, bounds=bounds, profile=settings.profile)
+                        if cold_result.cost < result.cost:
+                            result = cold_result
+                            step.warm = False
+            except Exception as exc:
+                step.error = error_text(exc)
+                previous = previous_residual = None
+            else:
+                step.result = result
+                if telemetry.enabled():
+                    telemetry.emit(telemetry.fit_record(result, timer.timings, file=step.name, sheet=step.sheet,
+                                                        warm=step.warm, cold_refit=step.cold_refit))
+                previous = result
+                previous_residual = relative_residual(result, chopped)
+            step.fit_time = time.perf_counter() - start
+            if store is not None:
+                source = spectrum.source if os.path.isfile(spectrum.source) else None
+                store_fit(store, step_row(step, settings), settings, chopped, step.result,
+                          file_hash(source) if source else None)
+            yield step
+    finally:
+        if store is not None:
+            store.close()
@@ -0,0 +1,257 @@
+"""Loading and windowing of measured impedance spectra."""
+
+import os
+import warnings
+from dataclasses import dataclass
+from functools import cached_property
+from pathlib import Path
+
+import numpy as np
+
+from . import cache
+from .models import log_jw
+
+# File extensions OSIF knows how to read.
+DATA_EXTENSIONS = ('.txt', '.xls', '.xlsx')
+
+# Header used by the potentiostat export for the negated imaginary part.
+NEG_Z_DOUBLE_PRIME = "-Z'' (Ω)"
+
+
+@dataclass
+class Spectrum:
+    """One measured impedance spectrum.
+
+    All arrays are float64 and share the same length.  ``z_double_prime`` is
+    the imaginary part of the impedance with its physical sign (the files store
+    -Z'', which is negated on load).  Derived arrays used in every model
+    evaluation are computed once and cached, so the data arrays should not be
+    modified in place.
+    """
+    frequency: np.ndarray
+    z_prime: np.ndarray
+    z_double_prime: np.ndarray
+    z_mod: np.ndarray
+    name: str = ''
+    source: str = ''
+    sheet: str = ''
+
+    @cached_property
+    def z_complex(self):
+        return self.z_prime + 1j * self.z_double_prime
+
+    @cached_property
+    def log_jw(self):
+        return log_jw(self.frequency)
+
+    @property
+    def mod_z_complex(self):
+        return np.abs(self.z_complex)
+
+    @property
+    def phase(self):
+        return (180 / np.pi) * np.arctan(self.z_double_prime / self.z_prime)
+
+    def __len__(self):
+        return self.frequency.shape[0]
+
+    def chop(self, lower, upper):
+        """Return the part of the spectrum with ``lower < f < upper``.
+
+        Mirrors the frequency window of the GUI: both bounds are exclusive.
+        See :meth:`window`.
+        """
+        return self.window([(lower, upper)])
+
+    def window(self, bands):
+        """Return the points whose frequency lies inside any of ``bands``.
+
+        ``bands`` is a sequence of ``(lower, upper)`` pairs with exclusive
+        bounds, e.g. ``[(1, 300), (2000, 10000)]`` to drop a noisy mid-band.
+        For a single band on sorted data (ascending or descending) the
+        result holds views of this spectrum's arrays; otherwise the selected
+        points are copied in their original order.
+        """
+        index = frequency_window(self.frequency, bands)
+        if np.size(self.frequency[index]) == 0:
+            raise ValueError('no data points in %s' % _describe_bands(bands))
+        return self.take(index)
+
+    def take(self, index):
+        """Return the points selected by ``index`` (a slice, integer array or mask)."""
+        chopped = Spectrum(self.frequency[index], self.z_prime[index], self.z_double_prime[index],
+                           self.z_mod[index], name=self.name, source=self.source, sheet=self.sheet)
+        # carry over derived arrays that were already computed
+        for name in ('z_complex', 'log_jw'):
+            if name in self.__dict__:
+                chopped.__dict__[name] = self.__dict__[name][index]
+        return chopped
+
+
+def _describe_bands(bands):
+    return ', '.join('%g Hz < f < %g Hz' % (lower, upper) for lower, upper in bands)
+
+
+def _monotonic(values):
+    """1 for non-decreasing, -1 for non-increasing, 0 for neither (or NaN)."""
+    steps = np.diff(values)
+    if np.all(steps >= 0):
+        return 1
+    if np.all(steps <= 0):
+        return -1
+    return 0
+
+
+def frequency_window(frequency, bands):
+    """Index selecting the frequencies inside any of ``bands`` (exclusive bounds).
+
+    Returns a slice when a single band is applied to sorted frequencies, so
+    that indexing gives views, and a boolean mask otherwise.  Unsorted
+    frequencies and repeated sweeps are handled point by point.
+    """
+    frequency = np.asarray(frequency)
+    bands = [(float(lower), float(upper)) for lower, upper in bands]
+    if len(bands) == 1:
+        lower, upper = bands[0]
+        order = _monotonic(frequency)
+        if order == 1:
+            return slice(int(np.searchsorted(frequency, lower, 'right')),
+                         int(np.searchsorted(frequency, upper, 'left')))
+        if order == -1:
+            reverse = -frequency
+            return slice(int(np.searchsorted(reverse, -upper, 'right')),
+                         int(np.searchsorted(reverse, -lower, 'left')))
+    mask = np.zeros(frequency.shape, dtype=bool)
+    for lower, upper in bands:
+        mask |= (frequency > lower) & (frequency < upper)
+    return mask
+
+
+def _columns(header, data):
+    """Split rows of (frequency, Z', Z'' or -Z'', |Z|) into float64 columns with the physical sign of Z''."""
+    data = np.asarray(data, dtype=float).reshape(-1, 4)
+    freq, z_prime, z_double, z_mod = (np.ascontiguousarray(data[:, i]) for i in range(4))
+    if len(header) > 3 and header[3] == NEG_Z_DOUBLE_PRIME:
+        z_double = -z_double
+    return freq, z_prime, z_double, z_mod
+
+
+def read_xlsx_sheets(path):
+    """Yield ``(sheet_name, columns)`` for every non-empty sheet of an Excel workbook.
+
+    The workbook is streamed in read-only mode and only the frequency, Z',
+    Z'' and |Z| columns (B to E) are read, straight into float64 arrays.
+    Empty cells become NaN; rows without any of the four values are skipped.
+    """
+    try:
+        import openpyxl
+    except ImportError as exc:
+        raise ImportError(
+            "openpyxl is required to load Excel files. "
+            "Install it with 'pip install openpyxl' and try again."
+        ) from exc
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            # exported workbooks often record a wrong (A1:A1) dimension; read until the last row instead
+            sheet.reset_dimensions()
+            rows = sheet.iter_rows(min_col=1, max_col=5, values_only=True)
+            header = next(rows, None)
+            if header is None:
+                continue
+            data = [row[1:5] for row in rows if any(value is not None for value in row[1:5])]
+            if data:
+                yield sheet.title, _columns(header, data)
+    finally:
+        workbook.close()
+
+
+def import_xlsx_file(path):
+    """Read impedance data from an Excel file.
+
+    Parameters
+    ----------
+    path : str
+        Full path to the Excel file.
+
+    Returns
+    -------
+    tuple of lists
+        frequency, z_prime, z_double_prime, z_mod extracted from the first
+        sheet of the file.
+    """
+    for _, columns in read_xlsx_sheets(path):
+        return tuple(column.tolist() for column in columns)
+    raise ValueError('no data in %s' % path)
+
+
+def import_txt_file(path):
+    """Read impedance data from a tab delimited text file.
+
+    Returns
+    -------
+    tuple of np.ndarray
+        frequency, z_prime, z_double_prime, z_mod extracted from the file.
+    """
+    with open(path, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            if line.strip() and not line.startswith('#'):
+                header = line.rstrip('\r\n').split('\t')
+                break
+        else:
+            raise ValueError('no data in %s' % path)
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', UserWarning)  # empty file, reported below
+                data = np.loadtxt(f, delimiter='\t', comments='#', usecols=(1, 2, 3, 4), ndmin=2)
+        except ValueError:
+            # empty fields, which loadtxt cannot parse
+            f.seek(0)
+            data = np.genfromtxt(f, delimiter='\t', comments='#', usecols=(1, 2, 3, 4), skip_header=1,
+                                 filling_values=np.nan, ndmin=2)
+    if data.size == 0:
+        raise ValueError('no data in %s' % path)
+    return _columns(header, data)
+
+
+def _parse(path):
+    """Parse ``path`` into a list of ``(sheet_name, columns)``; text files have a single unnamed sheet."""
+    if path.endswith('.txt'):
+        return [('', import_txt_file(path))]
+    sheets = list(read_xlsx_sheets(path))
+    if not sheets:
+        raise ValueError('no data in %s' % path)
+    return sheets
+
+
+def load_spectra(path, use_cache=True):
+    """Load every spectrum in a file: one per sheet of a workbook, one for a text file.
+
+    Parsed files are kept in the persistent cache of :mod:`osif.cache`
+    unless ``use_cache`` is False.
+    """
+    path = str(path)
+    # keyed by the state of the file before it is parsed, so a file rewritten meanwhile is not cached as new
+    key = cache.cache_key(path) if use_cache and cache.cache_dir() is not None else None
+    sheets = cache.read(path, key) if key else None
+    if sheets is None:
+        sheets = _parse(path)
+        if key:
+            cache.write(path, sheets, key)
+    name = Path(path).name
+    return [Spectrum(*columns, name=name, source=path, sheet=sheet) for sheet, columns in sheets]
+
+
+def load_spectrum(path, use_cache=True):
+    """Load a ``.txt``, ``.xls`` or ``.xlsx`` file into a :class:`Spectrum`.
+
+    Only the first sheet of a workbook is returned, see :func:`load_spectra`.
+    """
+    return load_spectra(path, use_cache=use_cache)[0]
+
+
+def list_data_files(directory):
+    """Return the sorted names of the data files in ``directory``."""
+    return sorted(dataFile for dataFile in os.listdir(directory)
+                  if dataFile.endswith(DATA_EXTENSIONS))
@@ -0,0 +1,181 @@
+"""SQLite store of fit results that batch and series runs append to.
+
+The ``fits`` table holds one row per fitted spectrum: the summary row of
+:mod:`osif.batch` (parameters and their SE in per-area units, the residual
+norms, optimizer counters, errors) together with the settings that produced
+it (model, area, frequency window, profile, Kramers–Kronig check), the
+source file and the SHA-256 of its contents.  Parameter columns are added
+the first time a model with new parameter names is stored, so fits of
+different models and circuits share one table and can be queried by
+column::
+
+    with ResultsStore('fits.sqlite') as store:
+        table = store.fits('model = ? AND Rcl > ?', ('Transmission Line', 0.1))
+
+The ``curves`` table holds the fitted data and model impedance point by
+point, keyed by the fit id, so the main table stays small.
+
+Every process opens its own connection.  The database runs in WAL mode and
+each append is one ``BEGIN IMMEDIATE`` transaction, so worker processes can
+append concurrently (writes are serialized, readers are never blocked).
+WAL needs a local file system, not a network share.
+"""
+
+import hashlib
+import json
+import numbers
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+# Seconds a writer waits for another process's transaction before giving up.
+STORE_TIMEOUT = 60.0
+
+CURVE_COLUMNS = ('frequency', 'z_prime', 'z_double_prime', 'model_z_prime', 'model_z_double_prime')
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS fits (
+    id INTEGER PRIMARY KEY,
+    time REAL NOT NULL,
+    file TEXT,
+    sheet TEXT,
+    file_hash TEXT,
+    model TEXT
+);
+CREATE INDEX IF NOT EXISTS fits_model ON fits (model);
+CREATE INDEX IF NOT EXISTS fits_file_hash ON fits (file_hash);
+CREATE TABLE IF NOT EXISTS curves (
+    fit_id INTEGER NOT NULL REFERENCES fits (id),
+    point INTEGER NOT NULL,
+    frequency REAL,
+    z_prime REAL,
+    z_double_prime REAL,
+    model_z_prime REAL,
+    model_z_double_prime REAL,
+    PRIMARY KEY (fit_id, point)
+) WITHOUT ROWID;
+'''
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-256 of the contents of ``path``."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def settings_record(settings):
+    """Columns describing the :class:`osif.batch.FitSettings` of a fit."""
+    return {'area': settings.area, 'lower': settings.lower, 'upper': settings.upper,
+            'bands': json.dumps(settings.bands) if settings.bands else '', 'profile': settings.profile,
+            'kk': settings.kk or ''}
+
+
+def fit_curve(spectrum, model_z):
+    """Curve columns of a fit: the (chopped) data and the model impedance at its frequencies."""
+    return {'frequency': spectrum.frequency, 'z_prime': spectrum.z_prime, 'z_double_prime': spectrum.z_double_prime,
+            'model_z_prime': model_z.real, 'model_z_double_prime': model_z.imag}
+
+
+def _sql_value(value):
+    if isinstance(value, (bool, np.bool_)):
+        return int(value)
+    if isinstance(value, numbers.Integral):
+        return int(value)
+    if isinstance(value, numbers.Real):
+        return float(value)
+    return value
+
+
+def _sql_type(value):
+    if isinstance(value, (bool, numbers.Integral)):
+        return 'INTEGER'
+    if isinstance(value, numbers.Real):
+        return 'REAL'
+    return 'TEXT'
+
+
+def _quote(name):
+    return '"%s"' % name.replace('"', '""')
+
+
+class ResultsStore:
+    """Append-only store of fit results in the SQLite file ``path``."""
+
+    def __init__(self, path, timeout=STORE_TIMEOUT):
+        self.path = os.fspath(path)
+        # autocommit mode: transactions are opened explicitly in append()
+        self._connection = sqlite3.connect(self.path, timeout=timeout, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.executescript(_SCHEMA)
+        self._columns = self._read_columns()
+
+    def _read_columns(self):
+        return {row[1] for row in self._connection.execute('PRAGMA table_info(fits)')}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._connection.close()
+
+    def append(self, row, curve=None):
+        """Store one fit and return its id.
+
+        ``row`` maps column names to values (numbers, strings or None);
+        unknown columns are added to the table.  ``curve`` maps
+        :data:`CURVE_COLUMNS` to equally long arrays.
+        """
+        row = {name: _sql_value(value) for name, value in row.items() if value is not None and name != 'id'}
+        row.setdefault('time', time.time())
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            if set(row) - self._columns:
+                # another process may have added them since this connection last looked
+                self._columns = self._read_columns()
+                for name in sorted(set(row) - self._columns):
+                    connection.execute('ALTER TABLE fits ADD COLUMN %s %s' % (_quote(name), _sql_type(row[name])))
+            names = list(row)
+            fit_id = connection.execute('INSERT INTO fits (%s) VALUES (%s)'
+                                        % (', '.join(map(_quote, names)), ', '.join('?' * len(names))),
+                                        [row[name] for name in names]).lastrowid
+            if curve is not None:
+                columns = [np.asarray(curve[name], dtype=float) for name in CURVE_COLUMNS]
+                points = np.arange(columns[0].shape[0])
+                connection.executemany('INSERT INTO curves VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                       zip([fit_id] * points.size, points.tolist(),
+                                           *(column.tolist() for column in columns)))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            self._columns = self._read_columns()
+            raise
+        self._columns |= set(row)
+        return fit_id
+
+    def query(self, sql, params=()):
+        """Result of any SQL query as a pandas DataFrame."""
+        import pandas as pd
+
+        return pd.read_sql_query(sql, self._connection, params=params)
+
+    def fits(self, where=None, params=()):
+        """Rows of the fits table, optionally filtered by an SQL ``where`` clause with ``?`` placeholders."""
+        return self.query('SELECT * FROM fits' + (' WHERE ' + where if where else '') + ' ORDER BY id', params)
+
+    def curve(self, fit_id):
+        """Fitted data and model impedance of one fit, ordered by point."""
+        return self.query('SELECT %s FROM curves WHERE fit_id = ? ORDER BY point' % ', '.join(CURVE_COLUMNS),
+                          (int(fit_id),))
+
+    def __len__(self):
+        return self._connection.execute('SELECT COUNT(*) FROM fits').fetchone()[0]
@@ -0,0 +1,80 @@
+"""Synthetic spectra with known parameters, for benchmarks and regression checks."""
+
+import os
+
+import numpy as np
+
+from .fitting import per_cell
+from .models import EIS_MODELS, PARAM_NAMES, impedance
+from .spectrum import NEG_Z_DOUBLE_PRIME, Spectrum
+
+# Per-area ranges (the units the GUI shows) around the fits of ``example EIS data``, [low, high] for each of
+# PARAM_NAMES.  Lwire, Rcl and Qdl are drawn log-uniformly, the others uniformly.
+PARAM_RANGES = dict(Lwire=(5e-6, 3e-5), Rmem=(0.04, 0.1), Rcl=(0.05, 0.3), Qdl=(1.0, 4.0), phi=(0.88, 0.98),
+                    theta=(0.8, 1.0))
+LOG_UNIFORM = ('Lwire', 'Rcl', 'Qdl')
+
+# Frequency range and point density of the potentiostat sweeps in ``example EIS data``.
+F_MIN = 0.1
+F_MAX = 1e5
+POINTS_PER_DECADE = 10
+
+TXT_HEADER = "Index\tFrequency (Hz)\tZ' (Ω)\t%s\tZ (Ω)\t-Phase (°)\tTime (s)" % NEG_Z_DOUBLE_PRIME
+
+
+def random_params(rng, area=50.0):
+    """Per-cell parameters drawn from :data:`PARAM_RANGES` for a cell of ``area`` cm^2."""
+    params = []
+    for name in PARAM_NAMES:
+        low, high = PARAM_RANGES[name]
+        if name in LOG_UNIFORM:
+            params.append(10 ** rng.uniform(np.log10(low), np.log10(high)))
+        else:
+            params.append(rng.uniform(low, high))
+    return per_cell(params, area)
+
+
+def frequencies(n_points=None, f_min=F_MIN, f_max=F_MAX):
+    """Log-spaced frequencies from high to low, as the potentiostat sweeps them."""
+    if n_points is None:
+        n_points = int(round(np.log10(f_max / f_min) * POINTS_PER_DECADE)) + 1
+    return np.logspace(np.log10(f_max), np.log10(f_min), n_points)
+
+
+def synthetic_spectrum(model, params, frequency=None, noise=0.0, rng=None, name=''):
+    """Spectrum of ``model`` at ``params`` with optional noise.
+
+    ``noise`` is the standard deviation of complex Gaussian noise relative to
+    |Z| at each point, split evenly between Z' and Z''; ``0.005`` is typical
+    of a good measurement.
+    """
+    frequency = frequencies() if frequency is None else np.asarray(frequency, dtype=float)
+    z = impedance(model, params, frequency)
+    if noise:
+        rng = rng or np.random.default_rng()
+        z = z + noise * np.abs(z) / np.sqrt(2) * (rng.standard_normal(z.shape) + 1j * rng.standard_normal(z.shape))
+    return Spectrum(frequency, z.real.copy(), z.imag.copy(), np.abs(z), name=name)
+
+
+def synthetic_corpus(n_spectra, models=None, noise=0.0, n_points=None, area=50.0, seed=0):
+    """``n_spectra`` reproducible ``(model, true_params, spectrum)`` triples, cycling through ``models``."""
+    rng = np.random.default_rng(seed)
+    models = models or EIS_MODELS
+    frequency = frequencies(n_points)
+    corpus = []
+    for i in range(n_spectra):
+        model = models[i % len(models)]
+        params = random_params(rng, area)
+        corpus.append((model, params, synthetic_spectrum(model, params, frequency, noise, rng,
+                                                         name='synthetic_%03d' % i)))
+    return corpus
+
+
+def write_txt(spectrum, path):
+    """Write ``spectrum`` as a tab delimited file in the potentiostat export format OSIF reads."""
+    z_mod = np.hypot(spectrum.z_prime, spectrum.z_double_prime)
+    columns = np.column_stack([np.arange(1, len(spectrum) + 1), spectrum.frequency, spectrum.z_prime,
+                               -spectrum.z_double_prime, z_mod, -spectrum.phase, np.zeros(len(spectrum))])
+    np.savetxt(path, columns, delimiter='\t', header=TXT_HEADER, comments='', encoding='utf-8',
+               fmt=['%d'] + ['%.17g'] * 6)
+    return os.path.abspath(path)
@@ -0,0 +1,98 @@
+"""Per-phase timing and fit records.
+
+Every fit produces a record with the wall time of each phase (``load``,
+``kk``, ``chop``, ``rmem``, ``optimize``, ``covariance``, ``plot``, as far
+as they apply) and the optimizer counters.  Records go to every registered hook::
+
+    osif.telemetry.add_hook(print)
+
+Setting ``OSIF_TELEMETRY`` to a file name appends each record as one JSON
+line to that file, in this process and in batch worker processes
+(:func:`write_to` does the same in this process).
+"""
+
+import contextlib
+import json
+import os
+import time
+
+_hooks = []
+
+
+def add_hook(hook):
+    """Call ``hook(record)`` for every fit record."""
+    _hooks.append(hook)
+    return hook
+
+
+def remove_hook(hook):
+    _hooks.remove(hook)
+
+
+def enabled():
+    return bool(_hooks)
+
+
+def emit(record):
+    for hook in list(_hooks):
+        hook(record)
+
+
+class Timer:
+    """Accumulates the wall time of named phases."""
+
+    def __init__(self):
+        self.timings = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+
+def fit_record(result, timings=None, **extra):
+    """The record of one fit: phase timings plus the optimizer counters and diagnostics of ``result``."""
+    record = {'event': 'fit', 'time': time.time()}
+    record.update(extra)
+    record.update(model=result.model, profile=result.profile, nfev=result.nfev, njev=result.njev,
+                  status=result.status, termination=result.termination, cost=result.cost,
+                  tail_improvement=result.tail_improvement, success=result.success)
+    record['timings'] = dict(result.timings)
+    record['timings'].update(timings or {})
+    return record
+
+
+class JsonLinesWriter:
+    """Hook appending each record as one JSON line to ``path``.
+
+    Each record is written with a single ``write`` to a file opened in
+    append mode, so several processes can share the file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, record):
+        line = json.dumps(record, default=_to_json) + '\n'
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+
+def _to_json(value):
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    return str(value)
+
+
+def write_to(path):
+    """Append the records to ``path`` as JSON lines, instead of to the file of an earlier call."""
+    for hook in [hook for hook in _hooks if isinstance(hook, JsonLinesWriter)]:
+        remove_hook(hook)
+    return add_hook(JsonLinesWriter(path))
+
+
+if os.environ.get('OSIF_TELEMETRY'):
+    write_to(os.environ['OSIF_TELEMETRY'])
@@ -0,0 +1,149 @@
+"""Fitting spectra as they are written into a data directory.
+
+During long tests the potentiostat writes one file per spectrum into the data
+directory.  :func:`watch_folder` polls the directory, and every data file that
+appears or changes is fitted on a process pool through the same path as a
+batch run (:func:`osif.batch.fit_file`: load, window, Rmem estimate, fit, and
+the results store if ``settings.store`` is set).
+
+Polling works the same on every platform and on network shares, where change
+notifications are unreliable; listing a directory every half second costs
+next to nothing.  A file counts as completely written once its size and
+modification time have not changed for ``settle_time`` seconds, so a file is
+fitted at most about ``settle_time + poll_interval`` seconds after the last
+write, plus the fit itself.
+"""
+
+import os
+import signal
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from .batch import FitSettings, fit_file
+from .parallel import default_workers, process_pool, single_threaded_blas
+from .spectrum import list_data_files
+
+# Seconds between two listings of the directory.
+POLL_INTERVAL = 0.5
+
+# Seconds a file's size and modification time must stay the same before it is read.
+SETTLE_TIME = 1.0
+
+
+def _ignored(name):
+    # lock and temporary files of Excel and editors share the data extensions
+    return name.startswith(('~$', '.'))
+
+
+class DirectoryPoller:
+    """Finds the data files in ``directory`` that are new or changed and no longer being written.
+
+    Files already in the directory when the poller is created are skipped
+    unless ``include_existing`` is True.  A file is reported again when it
+    changes after it was reported.
+    """
+
+    def __init__(self, directory, settle_time=SETTLE_TIME, include_existing=False, clock=time.monotonic):
+        self.directory = os.fspath(directory)
+        self.settle_time = settle_time
+        self._clock = clock
+        # name -> (size, mtime) of the last version reported by poll()
+        self._reported = {} if include_existing else self._scan()
+        # name -> ((size, mtime), time first seen with that size and mtime)
+        self._pending = {}
+
+    def _scan(self):
+        signatures = {}
+        for name in list_data_files(self.directory):
+            if _ignored(name):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            signatures[name] = (stat.st_size, stat.st_mtime_ns)
+        return signatures
+
+    def poll(self):
+        """Paths of the files that became ready since the last call, in name order."""
+        now = self._clock()
+        current = self._scan()
+        ready = []
+        for name, signature in current.items():
+            if self._reported.get(name) == signature:
+                self._pending.pop(name, None)
+                continue
+            seen = self._pending.get(name)
+            if seen is None or seen[0] != signature:
+                self._pending[name] = (signature, now)
+            elif now - seen[1] >= self.settle_time and signature[0] > 0:
+                del self._pending[name]
+                self._reported[name] = signature
+                ready.append(os.path.join(self.directory, name))
+        # a deleted file that is written again counts as new
+        for names in (self._pending, self._reported):
+            for name in set(names) - set(current):
+                del names[name]
+        return ready
+
+
+def _init_worker():
+    # Ctrl-C stops the watching process, which then lets the running fits finish
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _start_worker():
+    """Runs on every worker at the start so that the first real fit does not pay for the imports."""
+    return os.getpid()
+
+
+def watch_folder(directory, settings=None, workers=None, poll_interval=POLL_INTERVAL, settle_time=SETTLE_TIME,
+                 include_existing=False, stop=None):
+    """Fit every data file that is written into ``directory``; yields ``(path, rows)`` as fits finish.
+
+    Parameters
+    ----------
+    directory : str
+        The data directory; subdirectories are not watched.
+    settings : FitSettings, optional
+        Fit set up of every file.  With ``settings.store`` set, every fit is
+        also appended to that results store by the worker that ran it.
+    workers : int, optional
+        Worker processes; defaults to one per core.  They are started before
+        the first file arrives.
+    poll_interval, settle_time : float
+        See :data:`POLL_INTERVAL` and :data:`SETTLE_TIME`.
+    include_existing : bool
+        Also fit the files that are in ``directory`` at the start.
+    stop : threading.Event, optional
+        Watching ends once it is set and the running fits are done; without
+        it the generator runs until it is closed.
+
+    Yields
+    ------
+    (str, list of dict)
+        The file and its summary rows, as returned by
+        :func:`osif.batch.fit_file`, in the order the fits finish.
+    """
+    settings = settings or FitSettings()
+    workers = workers or default_workers()
+    stop = stop or threading.Event()
+    poller = DirectoryPoller(directory, settle_time, include_existing)
+    running = {}
+    with single_threaded_blas(), process_pool(workers, _init_worker) as pool:
+        try:
+            wait([pool.submit(_start_worker) for _ in range(workers)])
+            while not stop.is_set() or running:
+                if not stop.is_set():
+                    for path in poller.poll():
+                        running[pool.submit(fit_file, path, settings)] = path
+                if running:
+                    done, _ = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                    for future in sorted(done, key=running.get):
+                        yield running.pop(future), future.result()
+                else:
+                    stop.wait(poll_interval)
+        finally:
+            for future in running:
+                future.cancel()
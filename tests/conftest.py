@@ -0,0 +1,5 @@
+import os
+import sys
+
+# run against the osif package of this checkout, as the benchmarks do
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
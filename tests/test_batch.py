@@ -0,0 +1,54 @@
+import importlib
+import os
+
+import numpy as np
+import pytest
+
+import osif
+from osif.batch import FitSettings, fit_files, summary_table
+from osif.synthetic import random_params, synthetic_spectrum, write_txt
+
+EXAMPLE_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'example EIS data')
+
+pytest.importorskip('pandas')
+
+
+def test_circuit_batch_summary_has_the_circuit_parameters():
+    expression = 'R-p(R,Q)-Wo'
+    paths = osif.find_data_files([EXAMPLE_DATA])[:2]
+    table = summary_table(fit_files(paths, FitSettings(model=expression, profile='fast'), workers=1))
+    names = osif.resolve_model(expression).param_names
+    assert list(table['model'].unique()) == [expression]
+    for name in names:
+        assert name in table.columns and name + '_se' in table.columns
+    fitted = table[table['error'].fillna('') == '']
+    assert len(fitted) and fitted[list(names)].notna().all().all()
+    assert 'Lwire' not in table.columns
+
+
+def test_circuit_of_the_transmission_line_reproduces_the_built_in_fit(tmp_path):
+    params = random_params(np.random.default_rng(2))
+    path = write_txt(synthetic_spectrum(osif.TRANSMISSION_LINE, params, noise=0.002, rng=np.random.default_rng(2)),
+                     str(tmp_path / 'cell.txt'))
+    expression = 'L(Lwire,theta)-R(Rmem)-TLM(Rcl,Qdl,phi)'
+    built_in = summary_table(fit_files([path], FitSettings(), workers=1))
+    circuit = summary_table(fit_files([path], FitSettings(model=expression), workers=1))
+    for name in osif.PARAM_NAMES:
+        np.testing.assert_allclose(circuit[name], built_in[name], rtol=1e-6)
+
+
+def test_batch_solves_the_kramers_kronig_test_once_per_spectrum(tmp_path, monkeypatch):
+    calls = []
+    kramers_kronig = osif.kramers_kronig
+
+    def counting(spectrum, *args, **kwargs):
+        calls.append(spectrum.frequency.size)
+        return kramers_kronig(spectrum, *args, **kwargs)
+
+    monkeypatch.setattr(osif.batch, 'kramers_kronig', counting)
+    monkeypatch.setattr(importlib.import_module('osif.kramers_kronig'), 'kramers_kronig', counting)
+    paths = osif.find_data_files([EXAMPLE_DATA])[:2]
+    settings = FitSettings(kk='trim', kk_threshold=5.0, profile='fast', store=str(tmp_path / 'fits.sqlite'))
+    rows = fit_files(paths, settings, workers=1)
+    assert len(calls) == len(rows)
+    assert all('kk_rms' in row for row in rows)
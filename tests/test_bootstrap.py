@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+import osif
+from osif.synthetic import random_params, synthetic_spectrum
+
+
+def _fitted(seed):
+    params = random_params(np.random.default_rng(seed))
+    spectrum = synthetic_spectrum(osif.TRANSMISSION_LINE, params, noise=0.005,
+                                  rng=np.random.default_rng(seed)).chop(1, 10000)
+    result = osif.fit(spectrum, osif.TRANSMISSION_LINE, params, bounds=osif.default_bounds(params[1]))
+    return params, spectrum, result
+
+
+@pytest.mark.parametrize('method', osif.bootstrap.BOOTSTRAP_METHODS)
+def test_intervals_cover_the_true_parameters(method):
+    covered = []
+    for seed in range(10):
+        params, spectrum, result = _fitted(seed)
+        boot = osif.bootstrap_fit(spectrum, result, n_samples=40, method=method, workers=1, seed=seed, profile='fast')
+        assert boot.failed == 0 and not boot.errors
+        covered.append((boot.lower <= params) & (params <= boot.upper))
+    # 95 % intervals from 40 resamples of 39 points; the residual bootstrap covers about 80 % here
+    assert np.mean(covered) >= 0.75
+
+
+def test_refit_errors_are_reported(monkeypatch):
+    def failing_fit(*args, **kwargs):
+        raise FloatingPointError('overflow in the kernel')
+
+    params, spectrum, result = _fitted(0)
+    monkeypatch.setattr(osif.bootstrap, 'fit', failing_fit)
+    with pytest.raises(RuntimeError, match='10 x FloatingPointError: overflow in the kernel'):
+        osif.bootstrap_fit(spectrum, result, n_samples=10, workers=1, seed=0)
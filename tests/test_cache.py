@@ -0,0 +1,50 @@
+import os
+
+import numpy as np
+
+import osif
+from osif import cache
+from osif.synthetic import random_params, synthetic_spectrum, write_txt
+
+
+def _entries(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith('.npz'))
+
+
+def test_rewritten_file_replaces_its_cache_entry(tmp_path, monkeypatch):
+    directory = tmp_path / 'cache'
+    monkeypatch.setenv('OSIF_CACHE_DIR', str(directory))
+    path = str(tmp_path / 'cell.txt')
+    other = write_txt(synthetic_spectrum(osif.TRANSMISSION_LINE, random_params(np.random.default_rng(1))),
+                      str(tmp_path / 'other.txt'))
+    osif.load_spectrum(other)
+    directory.joinpath('0' * 40 + '.npz').write_bytes(b'')
+
+    for i in range(3):
+        params = random_params(np.random.default_rng(i))
+        write_txt(synthetic_spectrum(osif.TRANSMISSION_LINE, params), path)
+        os.utime(path, ns=(i * 10 ** 9, i * 10 ** 9))
+        spectrum = osif.load_spectrum(path)
+        assert cache.read(path) is not None
+        assert _entries(directory) == sorted([cache.cache_key(path) + '.npz', cache.cache_key(other) + '.npz'])
+    np.testing.assert_array_equal(osif.load_spectrum(path).z_prime, spectrum.z_prime)
+
+
+def test_file_rewritten_while_it_is_parsed_is_not_cached(tmp_path, monkeypatch):
+    monkeypatch.setenv('OSIF_CACHE_DIR', str(tmp_path / 'cache'))
+    path = str(tmp_path / 'cell.txt')
+    old, new = (synthetic_spectrum(osif.TRANSMISSION_LINE, random_params(np.random.default_rng(i))) for i in (1, 2))
+    write_txt(old, path)
+    os.utime(path, ns=(10 ** 9, 10 ** 9))
+    parse = osif.spectrum._parse
+
+    def parse_then_rewrite(name):
+        sheets = parse(name)
+        write_txt(new, path)
+        os.utime(path, ns=(2 * 10 ** 9, 2 * 10 ** 9))
+        return sheets
+
+    monkeypatch.setattr(osif.spectrum, '_parse', parse_then_rewrite)
+    np.testing.assert_allclose(osif.load_spectrum(path).z_prime, old.z_prime, rtol=1e-6)
+    monkeypatch.setattr(osif.spectrum, '_parse', parse)
+    np.testing.assert_allclose(osif.load_spectrum(path).z_prime, new.z_prime, rtol=1e-6)
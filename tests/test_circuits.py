@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+import osif
+from osif.circuits import circuit_model
+from osif.synthetic import frequencies
+
+
+@pytest.mark.parametrize('expression, message', [
+    ('', 'no elements'),
+    ('R-', 'expected name, found'),
+    ('R-X(R2)', "unknown element 'X'"),
+    ('R-p(R)', r'p\(\) needs at least two branches'),
+    ('R-Q(Q1)', r'Q takes 2 parameters \(Q, phi\), got 1'),
+    ('R-p(R,Q', "expected \\), found 'the end'"),
+    ('R-Q) ', "unexpected '\\)'"),
+    ('R-R&C', "unexpected '&'"),
+    ('R(Rmem)-L(Rmem,1)', "parameter 'Rmem' is used as both"),
+    ('R(1)-C(2)', 'has no free parameters'),
+    ('p(R,C)', 'needs a resistor in series'),
+])
+def test_invalid_circuits_are_rejected(expression, message):
+    with pytest.raises(ValueError, match=message):
+        circuit_model(expression)
+
+
+def test_parameters_are_named_shared_and_fixed():
+    expression = 'R-p(R,C(Cdl))-p(R(Rct),C(Cdl))-Q(Q1,1)'
+    model = circuit_model(expression)
+    assert model.param_names == ('R1', 'R2', 'Cdl', 'Rct', 'Q1')
+    assert model.series_resistance == 0 and osif.resolve_model(expression) is model
+    f = frequencies()
+    s = 2j * np.pi * f
+    z = model.kernel(np.array([0.1, 0.2, 1e-3, 0.3, 2.0]), osif.models.log_jw(f))
+    np.testing.assert_allclose(z, 0.1 + 1 / (1 / 0.2 + 1e-3 * s) + 1 / (1 / 0.3 + 1e-3 * s) + 1 / (2.0 * s),
+                               rtol=1e-12)
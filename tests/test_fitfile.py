@@ -0,0 +1,44 @@
+import numpy as np
+
+import osif
+from osif.models import standard_bounds
+from osif.synthetic import random_params, synthetic_spectrum
+
+
+def _fit(tmp_path):
+    params = random_params(np.random.default_rng(5))
+    raw = synthetic_spectrum(osif.TRANSMISSION_LINE, params, noise=0.002, rng=np.random.default_rng(5))
+    settings = osif.FitSettings(lower=1.0, upper=1000.0, profile='fast')
+    chopped = settings.window(raw)
+    result = osif.fit(chopped, osif.TRANSMISSION_LINE, params * 1.1, bounds=standard_bounds(params[1]),
+                      profile='fast')
+    path = tmp_path / 'cell1_fit.npz'
+    osif.save_fit(path, result, chopped, settings, source_hash='abc', loading=0.4)
+    return raw, chopped, settings, result, osif.load_fit(path)
+
+
+def test_saved_fits_load_back_exactly(tmp_path):
+    raw, chopped, settings, result, saved = _fit(tmp_path)
+    for name in ('params', 'standard_error', 'covariance', 'init', 'residuals', 'jac'):
+        np.testing.assert_array_equal(getattr(saved.result, name), getattr(result, name))
+    for loaded, bound in zip(saved.result.bounds, result.bounds):
+        np.testing.assert_array_equal(loaded, bound)
+    assert (saved.result.model, saved.result.cost, saved.result.nfev, saved.result.profile) == \
+        (result.model, result.cost, result.nfev, 'fast')
+    assert saved.result.param_names == result.param_names
+    assert saved.settings == settings and saved.source_hash == 'abc' and saved.extra == {'loading': 0.4}
+    np.testing.assert_array_equal(saved.spectrum.frequency, chopped.frequency)
+    np.testing.assert_array_equal(saved.impedance(), osif.models.impedance(osif.TRANSMISSION_LINE, result.params,
+                                                                           chopped.frequency))
+    assert saved.result.as_dict() == result.as_dict()
+
+
+def test_saved_fits_recognize_their_data(tmp_path):
+    raw, chopped, settings, result, saved = _fit(tmp_path)
+    assert saved.matches(raw)
+    z_prime = raw.z_prime.copy()
+    z_prime[len(z_prime) // 2] *= 1.001
+    assert not saved.matches(osif.Spectrum(raw.frequency, z_prime, raw.z_double_prime, raw.z_mod))
+
+    refit = saved.refit()
+    assert refit.success and refit.cost <= result.cost * (1 + 1e-6)
@@ -0,0 +1,81 @@
+import dataclasses
+
+import numpy as np
+import pytest
+
+import osif
+from osif.fitting import funcCost, funcJac
+from osif.models import check_jacobian
+from osif.synthetic import frequencies, random_params, synthetic_spectrum
+
+
+def central_difference(func, params, step=1e-6):
+    columns = []
+    for i in range(params.size):
+        h = step * abs(params[i])
+        up, down = params.copy(), params.copy()
+        up[i] += h
+        down[i] -= h
+        columns.append((func(up) - func(down)) / (2 * h))
+    return np.column_stack(columns)
+
+
+@pytest.mark.parametrize('model', list(osif.MODELS))
+def test_model_jacobian_matches_finite_differences(model):
+    rng = np.random.default_rng(3)
+    for _ in range(5):
+        assert check_jacobian(model, random_params(rng), frequencies()) < 1e-5
+
+
+@pytest.mark.parametrize('model', list(osif.MODELS))
+def test_residual_jacobian_matches_finite_differences(model):
+    rng = np.random.default_rng(4)
+    params = random_params(rng)
+    spectrum = synthetic_spectrum(model, params, noise=0.01, rng=rng).chop(1, 1e4)
+    start = params * 1.05
+    osif.models.model_cache.clear()
+    analytic = funcJac(start, model, spectrum)
+    numeric = central_difference(lambda p: funcCost(p, model, spectrum), start)
+    scale = np.abs(numeric).max(axis=0)
+    assert np.max(np.abs(analytic - numeric) / scale) < 1e-5
+
+
+@pytest.mark.parametrize('model', list(osif.MODELS))
+def test_noise_free_fit_at_the_solution(model):
+    # every residual is zero, so is every row of the analytic Jacobian and J^T J is singular
+    params = random_params(np.random.default_rng(1))
+    spectrum = synthetic_spectrum(model, params).chop(1, 1e4)
+    result = osif.fit(spectrum, model, params, bounds=osif.default_bounds(params[1], model))
+    assert result.success
+    np.testing.assert_allclose(result.params, params, rtol=1e-9)
+    assert result.standard_error.shape == params.shape
+    assert result.covariance.shape == (params.size, params.size)
+
+
+def test_results_of_unregistered_models_convert_to_records():
+    model = dataclasses.replace(osif.resolve_model(osif.TRANSMISSION_LINE), name='ad hoc transmission line',
+                                param_names=('L', 'R0', 'R1', 'Q', 'a', 'b'))
+    params = random_params(np.random.default_rng(5))
+    spectrum = synthetic_spectrum(osif.TRANSMISSION_LINE, params, noise=0.002, rng=np.random.default_rng(5))
+    record = osif.fit(spectrum, model, params, profile='fast').as_dict()
+    assert record['model'] == model.name
+    assert set(model.param_names) | {name + '_se' for name in model.param_names} <= set(record)
+
+
+def test_fit_profiles_set_the_optimizer_and_report_the_termination():
+    params = random_params(np.random.default_rng(6))
+    spectrum = synthetic_spectrum(osif.TRANSMISSION_LINE, params, noise=0.002, rng=np.random.default_rng(6))
+    init = params * np.array([1.5, 1.0, 0.7, 1.3, 0.98, 0.98])
+    bounds = osif.default_bounds(params[1])
+    results = {profile: osif.fit(spectrum, osif.TRANSMISSION_LINE, init, bounds=bounds, profile=profile)
+               for profile in osif.fitting.FIT_PROFILES}
+    for profile, result in results.items():
+        assert result.profile == profile
+        assert result.termination == osif.fitting.TERMINATION[result.status]
+        assert 0 <= result.tail_improvement <= 1
+    assert results['publication'].cost <= results['default'].cost <= results['fast'].cost * (1 + 1e-9)
+
+    capped = osif.fit(spectrum, osif.TRANSMISSION_LINE, init, bounds=bounds, options={'max_nfev': 5})
+    assert capped.termination == 'max_nfev' and capped.nfev <= 6
+    with pytest.raises(ValueError, match='unknown fit profile'):
+        osif.fit(spectrum, osif.TRANSMISSION_LINE, init, profile='thorough')
@@ -0,0 +1,69 @@
+import warnings
+
+import numpy as np
+import pytest
+
+import osif
+from osif.models import COTH_ASYMPTOTE, ModelCache, coth, coth_and_csch2
+from osif.synthetic import frequencies, random_params
+
+
+def test_coth_has_a_clean_pole_at_zero():
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        c, dc = coth_and_csch2(np.array([0j, 1e-300 + 0j]))
+    assert c[0] == np.inf and dc[0] == -np.inf
+    np.testing.assert_allclose(c[1], 1e300)
+
+
+@pytest.mark.parametrize('real', [COTH_ASYMPTOTE - 0.1, COTH_ASYMPTOTE, COTH_ASYMPTOTE + 0.1])
+def test_coth_is_continuous_at_the_asymptote(real):
+    x = np.array([real + 0.3j, -real - 0.3j])
+    c, dc = coth_and_csch2(x)
+    np.testing.assert_allclose(c, 1 / np.tanh(x), rtol=1e-15)
+    np.testing.assert_allclose(dc, 1 - (1 / np.tanh(x)) ** 2, atol=1e-16)
+
+
+def test_coth_of_imaginary_arguments():
+    y = np.linspace(0.1, 3.0, 30)
+    np.testing.assert_allclose(coth(1j * y), -1j / np.tan(y), rtol=1e-13)
+    np.testing.assert_allclose(coth_and_csch2(1j * y)[1], 1 + 1 / np.tan(y) ** 2, rtol=1e-13)
+
+
+def test_model_cache_hits_on_the_same_spectrum_and_parameters():
+    cache = ModelCache(maxsize=2)
+    model = osif.resolve_model(osif.TRANSMISSION_LINE)
+    params = random_params(np.random.default_rng(0))
+    log_jw = osif.models.log_jw(frequencies())
+    z = cache.evaluate(model, params, log_jw)
+    assert cache.evaluate(model, params.copy(), log_jw) is z and (cache.hits, cache.misses) == (1, 1)
+    assert not z.flags.writeable
+    np.testing.assert_array_equal(z, model.kernel(params, log_jw))
+
+    # a different array with the same values is a different spectrum
+    cache.evaluate(model, params, log_jw.copy())
+    assert cache.misses == 2
+    cache.evaluate(model, params * 1.01, log_jw)
+    cache.evaluate(model, params, log_jw)
+    assert cache.misses == 4 and len(cache._entries) == 2
+
+
+@pytest.mark.parametrize('name', [osif.TRANSMISSION_LINE, osif.LINEAR_DIFFUSION, osif.SPHERICAL_DIFFUSION])
+def test_compiled_kernels_match_numpy(name):
+    pytest.importorskip('numba')
+    jit = osif.jit
+    numpy_model = osif.resolve_model(name)
+    log_jw = osif.models.log_jw(frequencies())
+    params = random_params(np.random.default_rng(1))
+    z_data = numpy_model.kernel(params * 1.05, log_jw)
+    try:
+        assert jit.enable() and jit.enabled()
+        compiled = osif.resolve_model(name)
+        assert compiled is not numpy_model
+        np.testing.assert_allclose(compiled.kernel(params, log_jw), numpy_model.kernel(params, log_jw), rtol=1e-12)
+        z, res = compiled.residuals(params, log_jw, z_data)
+        np.testing.assert_allclose(z, numpy_model.kernel(params, log_jw), rtol=1e-12)
+        np.testing.assert_allclose(res, np.abs(numpy_model.kernel(params, log_jw) - z_data), rtol=1e-9, atol=1e-15)
+    finally:
+        jit.disable()
+    assert not jit.enabled() and osif.resolve_model(name) is numpy_model
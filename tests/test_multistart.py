@@ -0,0 +1,64 @@
+import dataclasses
+import multiprocessing
+
+import numpy as np
+import pytest
+
+import osif
+from osif.synthetic import random_params, synthetic_spectrum
+
+
+def _spectrum_and_init(model):
+    params = random_params(np.random.default_rng(3))
+    spectrum = synthetic_spectrum(osif.TRANSMISSION_LINE, params, noise=0.002, rng=np.random.default_rng(3))
+    model = osif.resolve_model(model)
+    init = np.array([model.default_init[name] for name in model.param_names], dtype=float)
+    init[list(model.area_scaled)] /= 50
+    init[model.series_resistance] = osif.estimate_rmem(spectrum)
+    return spectrum, init
+
+
+@pytest.mark.parametrize('model', [
+    'R-p(R,Q)-Wo',
+    dataclasses.replace(osif.resolve_model(osif.TRANSMISSION_LINE), name='renamed transmission line'),
+])
+def test_worker_processes_fit_unregistered_models(model):
+    spectrum, init = _spectrum_and_init(model)
+    result = osif.multistart_fit(spectrum, model, init, n_starts=4, agree=0, workers=2, seed=1, profile='fast')
+    assert result.best.model == osif.resolve_model(model).name
+    assert result.n_failed == 0 and len(result.costs) == 4
+
+
+def test_failed_starts_are_reported(monkeypatch):
+    fit = osif.multistart.fit
+
+    def failing_fit(spectrum, model, init, **kwargs):
+        if init[4] < 0.95:
+            raise FloatingPointError('phi below 0.95')
+        return fit(spectrum, model, init, **kwargs)
+
+    monkeypatch.setattr(osif.multistart, 'fit', failing_fit)
+    spectrum, init = _spectrum_and_init(osif.TRANSMISSION_LINE)
+    init[4] = 0.95
+    result = osif.multistart_fit(spectrum, osif.TRANSMISSION_LINE, init, n_starts=8, agree=0, workers=1, seed=1,
+                                 profile='fast')
+    assert result.n_failed > 0 and len(result.costs) + result.n_failed == 8
+    assert result.errors[0] == 'FloatingPointError: phi below 0.95'
+
+    init[4] = 0.5
+    with pytest.raises(RuntimeError, match='phi below 0.95'):
+        osif.multistart_fit(spectrum, osif.TRANSMISSION_LINE, init, n_starts=8, workers=1, seed=1, profile='fast')
+
+
+def test_linear_parameters_are_sampled_around_the_initial_value():
+    init = np.array([1e-7, 1e-3, 2e-3, 2.5, 0.95, 0.95])
+    starts = osif.multistart.sample_starts(init, osif.models.standard_bounds(1e-3), 64, seed=0, spread=0.1)
+    assert np.all(np.abs(starts[:, 4:] - 0.95) <= 0.1 + 1e-12)
+
+
+def test_early_stop_cancels_the_running_starts():
+    spectrum, init = _spectrum_and_init(osif.TRANSMISSION_LINE)
+    result = osif.multistart_fit(spectrum, osif.TRANSMISSION_LINE, init, n_starts=8, agree=1, workers=2, seed=1,
+                                 profile='publication', max_nfev=None)
+    assert result.stopped_early
+    assert not multiprocessing.active_children()
@@ -0,0 +1,36 @@
+import numpy as np
+
+import osif
+from osif.synthetic import random_params, synthetic_spectrum
+
+
+def _drifting_series(n=4):
+    params = random_params(np.random.default_rng(7))
+    rng = np.random.default_rng(7)
+    spectra = []
+    for i in range(n):
+        drifted = params * np.array([1, 1 + 0.01 * i, 1 + 0.03 * i, 1 - 0.02 * i, 1, 1])
+        spectra.append(synthetic_spectrum(osif.TRANSMISSION_LINE, drifted, noise=0.002, rng=rng, name='%d' % i))
+    return spectra
+
+
+def test_series_warm_starts_from_the_previous_fit():
+    steps = list(osif.fit_series(_drifting_series()))
+    assert [step.warm for step in steps] == [False, True, True, True]
+    assert not any(step.cold_refit or step.error for step in steps)
+    for previous, step in zip(steps, steps[1:]):
+        lower, upper = step.result.bounds
+        np.testing.assert_array_equal(step.result.init, np.clip(previous.result.params, lower, upper))
+
+
+def test_residual_jump_refits_from_the_cold_start():
+    steps = list(osif.fit_series(_drifting_series(3), jump=0.0))
+    assert [step.cold_refit for step in steps] == [False, True, True]
+
+
+def test_failed_step_restarts_cold(tmp_path):
+    spectra = _drifting_series(3)
+    spectra.insert(1, str(tmp_path / 'missing.txt'))
+    steps = list(osif.fit_series(spectra))
+    assert steps[1].error.startswith('FileNotFoundError') and steps[1].result is None
+    assert [step.warm for step in steps] == [False, False, False, True]
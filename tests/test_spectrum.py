@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+import osif
+from osif.spectrum import NEG_Z_DOUBLE_PRIME, frequency_window
+from osif.synthetic import random_params, synthetic_spectrum
+
+
+def _write_workbook(path, sheets):
+    openpyxl = pytest.importorskip('openpyxl')
+    workbook = openpyxl.Workbook()
+    workbook.remove(workbook.active)
+    for title, rows in sheets.items():
+        sheet = workbook.create_sheet(title)
+        sheet.append(['Index', 'Frequency (Hz)', "Z' (Ω)", NEG_Z_DOUBLE_PRIME, 'Z (Ω)'])
+        for row in rows:
+            sheet.append(row)
+    workbook.save(path)
+    return path
+
+
+def test_workbook_gives_one_spectrum_per_non_empty_sheet(tmp_path):
+    path = _write_workbook(str(tmp_path / 'cell.xlsx'), {
+        'first': [[1, 1000.0, 0.01, 0.002, 0.0102], [2, None, None, None, None], [3, 100.0, 0.012, 0.004, 0.0126]],
+        'empty': [],
+        'second': [[1, 10.0, 0.02, 0.01, 0.0224]],
+    })
+    spectra = osif.load_spectra(path, use_cache=False)
+    assert [spectrum.sheet for spectrum in spectra] == ['first', 'second']
+    first = spectra[0]
+    assert first.frequency.dtype == np.float64
+    np.testing.assert_array_equal(first.frequency, [1000.0, 100.0])
+    # -Z'' columns are stored with the physical sign of Z''
+    np.testing.assert_array_equal(first.z_double_prime, [-0.002, -0.004])
+    np.testing.assert_array_equal(osif.import_xlsx_file(path)[0], [1000.0, 100.0])
+
+
+
+@pytest.mark.parametrize('frequency', [np.logspace(-1, 5, 61), np.logspace(5, -1, 61)])
+def test_single_band_on_sorted_data_is_a_slice_matching_the_mask(frequency):
+    index = frequency_window(frequency, [(1, 10000)])
+    assert isinstance(index, slice)
+    mask = (frequency > 1) & (frequency < 10000)
+    np.testing.assert_array_equal(frequency[index], frequency[mask])
+
+
+def test_unsorted_data_and_several_bands_use_a_mask():
+    frequency = np.array([100.0, 1.0, 5000.0, 50.0, 20000.0, 10.0])
+    np.testing.assert_array_equal(frequency[frequency_window(frequency, [(1, 10000)])], [100.0, 5000.0, 50.0, 10.0])
+    frequency = np.sort(frequency)
+    index = frequency_window(frequency, [(5, 60), (1000, 30000)])
+    assert index.dtype == bool
+    np.testing.assert_array_equal(frequency[index], [10.0, 50.0, 5000.0, 20000.0])
+
+
+def test_window_keeps_views_and_cached_arrays():
+    spectrum = synthetic_spectrum(osif.TRANSMISSION_LINE, random_params(np.random.default_rng(0)))
+    log_jw = spectrum.log_jw
+    chopped = spectrum.chop(1, 10000)
+    assert np.shares_memory(chopped.z_prime, spectrum.z_prime)
+    np.testing.assert_array_equal(chopped.log_jw, osif.models.log_jw(chopped.frequency))
+    assert np.shares_memory(chopped.log_jw, log_jw)
+    with pytest.raises(ValueError, match='no data points'):
+        spectrum.chop(1e6, 1e7)
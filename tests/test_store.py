@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from osif.store import CURVE_COLUMNS, ResultsStore
+
+pd = pytest.importorskip('pandas')
+
+
+def test_rows_and_curves_round_trip(tmp_path):
+    curve = {name: np.linspace(1, 2, 5) * (i + 1) for i, name in enumerate(CURVE_COLUMNS)}
+    with ResultsStore(tmp_path / 'fits.sqlite') as store:
+        first = store.append({'file': 'a.xlsx', 'model': 'Transmission Line', 'Rcl': 0.2, 'nfev': 12,
+                              'success': True, 'error': None}, curve=curve)
+        # a circuit with other parameter names adds its columns to the same table
+        second = store.append({'file': 'b.xlsx', 'model': 'R-p(R,Q)', 'R1': 0.05, 'id': 99})
+        assert len(store) == 2 and (first, second) == (1, 2)
+
+    with ResultsStore(tmp_path / 'fits.sqlite') as store:
+        table = store.fits()
+        assert list(table['id']) == [1, 2] and list(table['file']) == ['a.xlsx', 'b.xlsx']
+        assert table['Rcl'][0] == 0.2 and pd.isna(table['Rcl'][1])
+        assert table['R1'][1] == 0.05 and pd.isna(table['R1'][0])
+        assert table['nfev'][0] == 12 and table['success'][0] == 1 and 'error' not in table
+        assert list(store.fits('model = ?', ('R-p(R,Q)',))['id']) == [2]
+
+        stored = store.curve(first)
+        assert list(stored.columns) == list(CURVE_COLUMNS)
+        for name in CURVE_COLUMNS:
+            np.testing.assert_array_equal(stored[name], curve[name])
+        assert store.curve(second).empty
+
+
+def test_failed_append_leaves_no_row(tmp_path):
+    with ResultsStore(tmp_path / 'fits.sqlite') as store:
+        with pytest.raises(KeyError):
+            store.append({'file': 'a.xlsx', 'Rnew': 1.0}, curve={'frequency': [1.0]})
+        assert len(store) == 0
+        store.append({'file': 'b.xlsx', 'Rnew': 2.0})
+        assert list(store.fits()['Rnew']) == [2.0]
@@ -0,0 +1,36 @@
+import argparse
+import json
+
+import numpy as np
+
+import osif
+from osif import telemetry
+from osif.__main__ import enable_telemetry
+from osif.batch import FitSettings, fit_files
+from osif.synthetic import random_params, synthetic_spectrum, write_txt
+
+
+def test_fit_records_have_the_phase_timings_and_counters(tmp_path):
+    path = write_txt(synthetic_spectrum(osif.TRANSMISSION_LINE, random_params(np.random.default_rng(0)), noise=0.002,
+                                        rng=np.random.default_rng(0)), str(tmp_path / 'cell.txt'))
+    records = []
+    hook = telemetry.add_hook(records.append)
+    try:
+        rows = fit_files([path], FitSettings(kk='report'), workers=1)
+    finally:
+        telemetry.remove_hook(hook)
+    [record] = records
+    assert record['event'] == 'fit' and record['file'] == path
+    assert record['nfev'] == rows[0]['nfev'] and record['termination']
+    assert {'load', 'kk', 'chop', 'rmem', 'optimize', 'covariance'} <= set(record['timings'])
+
+
+def test_telemetry_file_gets_each_record_once(tmp_path, monkeypatch):
+    path = str(tmp_path / 'fits.jsonl')
+    monkeypatch.setattr(telemetry, '_hooks', [])
+    monkeypatch.setenv('OSIF_TELEMETRY', path)
+    telemetry.write_to(path)
+    enable_telemetry(argparse.Namespace(telemetry=path))
+    telemetry.emit({'event': 'fit', 'nfev': 1})
+    with open(path, encoding='utf-8') as f:
+        assert [json.loads(line) for line in f] == [{'event': 'fit', 'nfev': 1}]
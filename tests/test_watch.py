@@ -0,0 +1,62 @@
+import os
+
+from osif.watch import DirectoryPoller
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _write(path, text, mtime_ns):
+    path.write_text(text)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_files_are_reported_once_they_have_settled(tmp_path):
+    _write(tmp_path / 'old.txt', 'old', 1)
+    clock = FakeClock()
+    poller = DirectoryPoller(tmp_path, settle_time=1.0, clock=clock)
+
+    _write(tmp_path / 'new.txt', 'partial', 2)
+    _write(tmp_path / 'empty.txt', '', 2)
+    _write(tmp_path / '~$new.xlsx', 'lock', 2)
+    _write(tmp_path / 'notes.csv', 'not data', 2)
+    assert poller.poll() == []
+    clock.now = 0.5
+    _write(tmp_path / 'new.txt', 'partial, then more', 3)
+    assert poller.poll() == []
+    # the change restarted the settle time
+    clock.now = 1.2
+    assert poller.poll() == []
+    clock.now = 1.6
+    assert poller.poll() == [os.path.join(tmp_path, 'new.txt')]
+    clock.now = 5.0
+    assert poller.poll() == []
+
+    # rewritten after it was reported: reported again once settled
+    _write(tmp_path / 'new.txt', 'second spectrum', 4)
+    assert poller.poll() == []
+    clock.now = 6.0
+    assert poller.poll() == [os.path.join(tmp_path, 'new.txt')]
+
+
+def test_existing_files_are_included_on_request(tmp_path):
+    _write(tmp_path / 'a.txt', 'a', 1)
+    _write(tmp_path / 'b.txt', 'b', 1)
+    clock = FakeClock()
+    poller = DirectoryPoller(tmp_path, settle_time=1.0, include_existing=True, clock=clock)
+    assert poller.poll() == []
+    clock.now = 1.0
+    assert poller.poll() == [os.path.join(tmp_path, 'a.txt'), os.path.join(tmp_path, 'b.txt')]
+
+    # a deleted file that is written again counts as new
+    os.remove(tmp_path / 'a.txt')
+    assert poller.poll() == []
+    _write(tmp_path / 'a.txt', 'a', 1)
+    assert poller.poll() == []
+    clock.now = 2.0
+    assert poller.poll() == [os.path.join(tmp_path, 'a.txt')]